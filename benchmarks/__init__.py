@@ -0,0 +1 @@
+# Benchmark modülü
\ No newline at end of file
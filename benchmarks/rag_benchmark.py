@@ -0,0 +1,369 @@
+"""RAGService geri getirme kalitesi ve gecikme ölçümü (ağ bağlantısı gerektirmez).
+
+Fixture korpusu yerel vektör deposuna yüklenir, etiketli sorgular çalıştırılır;
+recall@k, MRR, embedding/arama gecikmeleri ve yükleme hızı JSON olarak yazılır.
+
+    python -m benchmarks.rag_benchmark                      # deterministik hashing embedder
+    python -m benchmarks.rag_benchmark --embedder model     # gerçek embedding modeli (RAG_EMBEDDING_* ayarları)
+    python -m benchmarks.rag_benchmark --threshold 0.4 --top-k 5 --output sonuc.json --min-recall 0.8 --min-mrr 0.9
+
+Korpus: fixtures/corpus/<uzmanlık dalı>/<doküman>.txt. Sorgular: fixtures/queries.json
+({"query", "specialty", "relevant": [korpusa göre doküman yolları]}). RAG_CHUNK_SIZE,
+RAG_SEARCH_TOP_K, RAG_SIMILARITY_THRESHOLD gibi ayarlar uygulamadaki gibi okunur;
+komut satırı seçenekleri bunları ezer.
+
+Varsayılan kapsam "all"dur: tüm korpus tek namespace'e yüklenir, diğer dalların
+dokümanları çeldirici olur. "specialty" kapsamında bir namespace'te en fazla
+birkaç doküman bulunduğundan recall@3 neredeyse her zaman 1'dir; CI eşikleri
+(--min-recall, --min-mrr) bu yüzden recall@1 ve MRR'a uygulanır.
+
+Hashing embedder'ın kosinüs skorları modelinkinden düşüktür (ilgili parça
+~0.2-0.45, en iyi çeldirici ~0.1-0.3); uygulamanın 0.5 eşiği bu ölçekte her
+şeyi eler. Bu yüzden hashing modunda --threshold verilmezse fixture skorlarına
+göre seçilmiş HASHING_SIMILARITY_THRESHOLD kullanılır.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+RECALL_AT = (1, 3, 5)
+# Hashing embedder skorlarına göre ayarlanmış eşik (fixture'larda ilgili/çeldirici skorlarının arası)
+HASHING_SIMILARITY_THRESHOLD = 0.25
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _casefold_tr(text: str) -> str:
+    return text.replace("İ", "i").replace("I", "ı").lower()
+
+
+class HashingEmbedder:
+    """Model indirmeden çalışan deterministik embedder (SentenceTransformer.encode ile aynı arayüz).
+
+    Kelimeler ve kelime içi 4'lü karakter grupları (Türkçe eklerde kökü yakalar)
+    sabit boyutlu vektöre hash'lenir ve L2 normalize edilir. Anlamsal benzerlik
+    ölçmez; chunking, eşik, top_k, paketleme ve vektör deposu değişikliklerinin
+    etkisini ağ ve model olmadan tekrarlanabilir biçimde karşılaştırmak içindir.
+    """
+
+    def __init__(self, dimension: int = 384, ngram: int = 4):
+        self.dimension = dimension
+        self.ngram = ngram
+        self._buckets: Dict[str, tuple] = {}
+
+    def _bucket(self, feature: str) -> tuple:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            bucket = (index, 1.0 if digest[4] & 1 else -1.0)
+            self._buckets[feature] = bucket
+        return bucket
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in _TOKEN_RE.findall(_casefold_tr(text)):
+            features.append("w:" + word)
+            padded = f"<{word}>"
+            features.extend("c:" + padded[i:i + self.ngram] for i in range(max(len(padded) - self.ngram + 1, 1)))
+        return features
+
+    def _encode_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in self._features(text):
+            index, sign = self._bucket(feature)
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        texts = list(sentences)
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.vstack([self._encode_one(text) for text in texts])
+
+
+class _TimedModel:
+    """encode çağrılarının süresini biriktirir; arama süresi toplam süreden ayrılabilsin diye"""
+
+    def __init__(self, model):
+        self.model = model
+        self.seconds = 0.0
+
+    def encode(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.model.encode(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def load_corpus(corpus_dir: str) -> List[dict]:
+    documents = []
+    for specialty in sorted(os.listdir(corpus_dir)):
+        specialty_dir = os.path.join(corpus_dir, specialty)
+        if not os.path.isdir(specialty_dir):
+            continue
+        for name in sorted(os.listdir(specialty_dir)):
+            if not name.endswith(".txt"):
+                continue
+            with open(os.path.join(specialty_dir, name), encoding="utf-8") as f:
+                documents.append({"filename": f"{specialty}/{name}", "specialty": specialty, "text": f.read()})
+    return documents
+
+
+def load_queries(path: str, documents: List[dict]) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        queries = json.load(f)
+    known = {document["filename"] for document in documents}
+    for query in queries:
+        missing = [filename for filename in query["relevant"] if filename not in known]
+        if missing:
+            raise ValueError(f"Sorgudaki doküman korpusta yok: {missing} ({query['query']})")
+    return queries
+
+
+def _latency_summary(samples: List[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    percentile = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    return {
+        "count": len(samples),
+        "mean": round(statistics.fmean(samples) * 1000, 3),
+        "p50": round(percentile(0.50) * 1000, 3),
+        "p95": round(percentile(0.95) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3)
+    }
+
+
+def _ranked_documents(matches) -> List[str]:
+    """Eşleşmelerden skora göre sıralı, tekrarsız doküman listesi"""
+    ranked = []
+    for match in matches:
+        filename = (match.metadata or {}).get("filename")
+        if filename and filename not in ranked:
+            ranked.append(filename)
+    return ranked
+
+
+def _apply_overrides(args, index_path: str):
+    """RAGConfig ortam değişkenlerinden okunduğu için servis oluşturulmadan önce ayarlanır"""
+    os.environ["RAG_VECTOR_BACKEND"] = "local"
+    os.environ["RAG_LOCAL_INDEX_PATH"] = index_path
+    # Her sorgu gerçekten embed edilip aransın
+    os.environ["RAG_QUERY_EMBEDDING_CACHE_SIZE"] = "0"
+    os.environ["RAG_RESULT_CACHE_SIZE"] = "0"
+    threshold = args.threshold
+    if threshold is None and args.embedder == "hashing":
+        # RAG_SIMILARITY_THRESHOLD embedding modeline göre ayarlanmıştır
+        threshold = HASHING_SIMILARITY_THRESHOLD
+    overrides = {
+        "RAG_SEARCH_TOP_K": args.top_k,
+        "RAG_SIMILARITY_THRESHOLD": threshold,
+        "RAG_CHUNK_SIZE": args.chunk_size,
+        "RAG_CHUNK_OVERLAP": args.chunk_overlap,
+        "RAG_CONTEXT_TOKEN_BUDGET": args.token_budget
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            os.environ[name] = str(value)
+
+
+def run_benchmark(args, index_path: str) -> dict:
+    _apply_overrides(args, index_path)
+    from services.rag_service import RAGService
+    from services.vector_store import create_vector_store
+
+    service = RAGService()
+    config = service.config
+    if args.embedder == "model":
+        model = config.load_embedding_model()
+        if model is None:
+            raise SystemExit("Embedding modeli yüklenemedi")
+    else:
+        model = HashingEmbedder(config.embedding_dimension)
+    timed_model = _TimedModel(model)
+    config.embedding_model = timed_model
+    config.vector_store = create_vector_store(config)
+    service.is_initialized = True
+
+    documents = load_corpus(args.corpus)
+    queries = load_queries(args.queries, documents)
+    flat = args.scope == "all"
+
+    # Yükleme: korpustaki her doküman uzmanlık dalının namespace'ine (scope=all ise varsayılana)
+    chunk_count = 0
+    started = time.perf_counter()
+    for document in documents:
+        result = service.ingest_text(
+            document["text"],
+            document["filename"],
+            specialty=None if flat else document["specialty"]
+        )
+        chunk_count += result.chunk_count
+    ingest_seconds = time.perf_counter() - started
+    ingest_embed_seconds = timed_model.seconds
+
+    # İlk sorgu ölçüme katılmaz (namespace sayıları, memory-map ve önbellek ısınması)
+    service.retrieve(queries[0]["query"], None if flat else queries[0]["specialty"])
+
+    threshold = config.similarity_threshold
+    recall_sums = {k: 0.0 for k in RECALL_AT}
+    reciprocal_ranks = []
+    relevant_scores = []
+    distractor_scores = []
+    above_threshold_hits = 0
+    context_hits = 0
+    context_tokens = []
+    embed_latencies = []
+    search_latencies = []
+    details = []
+    for query in queries:
+        specialty = None if flat else query["specialty"]
+        relevant = set(query["relevant"])
+
+        timed_model.seconds = 0.0
+        started = time.perf_counter()
+        matches = service.retrieve(query["query"], specialty)
+        total_seconds = time.perf_counter() - started
+        embed_latencies.append(timed_model.seconds)
+        search_latencies.append(total_seconds - timed_model.seconds)
+
+        ranked = _ranked_documents(matches)
+        for k in RECALL_AT:
+            recall_sums[k] += len(relevant.intersection(ranked[:k])) / len(relevant)
+        first_hit = next((rank for rank, filename in enumerate(ranked, 1) if filename in relevant), None)
+        reciprocal_ranks.append(1.0 / first_hit if first_hit else 0.0)
+        relevant_score = next((match.score for match in matches if (match.metadata or {}).get("filename") in relevant), None)
+        if relevant_score is not None:
+            relevant_scores.append(relevant_score)
+        distractor_score = next((match.score for match in matches if (match.metadata or {}).get("filename") not in relevant), None)
+        if distractor_score is not None:
+            distractor_scores.append(distractor_score)
+
+        # Uygulamadaki yol: eşiği geçen sonuçlar paketlenip prompt'a eklenir
+        above = [match for match in matches if match.score >= threshold]
+        if any((match.metadata or {}).get("filename") in relevant for match in above):
+            above_threshold_hits += 1
+        packed = service.context_packer.pack(above, query["query"])
+        in_context = any(passage.source in relevant for passage in packed.passages)
+        context_hits += in_context
+        context_tokens.append(packed.tokens)
+
+        if args.per_query:
+            details.append({
+                "query": query["query"],
+                "specialty": query["specialty"],
+                "relevant": query["relevant"],
+                "ranked": ranked[:max(RECALL_AT)],
+                "top_score": round(matches[0].score, 4) if matches else None,
+                "first_relevant_rank": first_hit,
+                "in_context": in_context,
+                "context_tokens": packed.tokens
+            })
+
+    query_count = len(queries)
+    report = {
+        "config": {
+            "embedder": args.embedder,
+            "embedding_model": config.embedding_model_name if args.embedder == "model" else "hashing",
+            "scope": args.scope,
+            "top_k": config.search_top_k,
+            "similarity_threshold": threshold,
+            "chunk_size": config.chunk_size,
+            "chunk_overlap": config.chunk_overlap,
+            "context_token_budget": config.context_token_budget,
+            "context_max_passages": config.context_max_passages
+        },
+        "corpus": {
+            "documents": len(documents),
+            "chunks": chunk_count,
+            "queries": query_count
+        },
+        "ingestion": {
+            "seconds": round(ingest_seconds, 4),
+            "embedding_seconds": round(ingest_embed_seconds, 4),
+            "documents_per_second": round(len(documents) / ingest_seconds, 2) if ingest_seconds else None,
+            "chunks_per_second": round(chunk_count / ingest_seconds, 2) if ingest_seconds else None
+        },
+        "retrieval": {
+            **{f"recall@{k}": round(recall_sums[k] / query_count, 4) for k in RECALL_AT},
+            "mrr": round(statistics.fmean(reciprocal_ranks), 4),
+            # Eşik ayarı için: ilgili dokümanın ve en iyi çeldiricinin en yüksek skorlu parçalarının ortalaması
+            "mean_relevant_score": round(statistics.fmean(relevant_scores), 4) if relevant_scores else None,
+            "mean_distractor_score": round(statistics.fmean(distractor_scores), 4) if distractor_scores else None,
+            "relevant_above_threshold": round(above_threshold_hits / query_count, 4),
+            "context_recall": round(context_hits / query_count, 4),
+            "avg_context_tokens": round(statistics.fmean(context_tokens), 1)
+        },
+        "latency_ms": {
+            "embed": _latency_summary(embed_latencies),
+            "search": _latency_summary(search_latencies)
+        }
+    }
+    if args.per_query:
+        report["queries"] = details
+    return report
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="RAGService geri getirme kalitesi ve gecikme ölçümü")
+    parser.add_argument("--embedder", choices=("hashing", "model"), default="hashing",
+                        help="hashing: deterministik, model gerektirmez; model: RAGConfig'teki embedding modeli")
+    parser.add_argument("--scope", choices=("specialty", "all"), default="all",
+                        help="all: tüm korpus tek namespace'te, diğer dallar çeldirici; specialty: uygulamadaki gibi dal namespace'lerinde")
+    parser.add_argument("--top-k", type=int, help="RAG_SEARCH_TOP_K yerine")
+    parser.add_argument("--threshold", type=float,
+                        help=f"RAG_SIMILARITY_THRESHOLD yerine (hashing modunda varsayılan {HASHING_SIMILARITY_THRESHOLD})")
+    parser.add_argument("--chunk-size", type=int, help="RAG_CHUNK_SIZE yerine")
+    parser.add_argument("--chunk-overlap", type=int, help="RAG_CHUNK_OVERLAP yerine")
+    parser.add_argument("--token-budget", type=int, help="RAG_CONTEXT_TOKEN_BUDGET yerine")
+    parser.add_argument("--corpus", default=os.path.join(FIXTURES_DIR, "corpus"))
+    parser.add_argument("--queries", default=os.path.join(FIXTURES_DIR, "queries.json"))
+    parser.add_argument("--output", help="JSON raporun yazılacağı dosya (varsayılan: stdout)")
+    parser.add_argument("--per-query", action="store_true", help="Sorgu bazında sonuçları rapora ekle")
+    parser.add_argument("--min-recall", type=float,
+                        help="recall@1 bu değerin altındaysa çıkış kodu 1 olur (CI için)")
+    parser.add_argument("--min-mrr", type=float,
+                        help="MRR bu değerin altındaysa çıkış kodu 1 olur (CI için)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # Servis günlükleri stderr'e yönlendirilir; stdout'ta yalnızca JSON rapor kalır
+    with tempfile.TemporaryDirectory(prefix="rag_benchmark_") as index_path, \
+            contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(args, index_path)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    failed = False
+    for metric, minimum in (("recall@1", args.min_recall), ("mrr", args.min_mrr)):
+        if minimum is not None and report["retrieval"][metric] < minimum:
+            print(f"{metric} {report['retrieval'][metric]} < {minimum}", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
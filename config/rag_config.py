@@ -24,12 +24,69 @@ class RAGConfig:
         self.embedding_model_name = "sentence-transformers/paraphrase-MiniLM-L6-v2"
         self.embedding_dimension = 384  # paraphrase-MiniLM-L6-v2 için
         
+        # PDF yükleme ayarları - metin parçalara bölünüp toplu halde vektöre çevrilir ve yüklenir
+        self.chunk_size = int(os.getenv("RAG_CHUNK_SIZE", "1000"))  # karakter
+        self.chunk_overlap = int(os.getenv("RAG_CHUNK_OVERLAP", "150"))  # karakter
+        self.embedding_batch_size = int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", "32"))
+        self.upsert_batch_size = int(os.getenv("RAG_UPSERT_BATCH_SIZE", "100"))
+        
+        # PDF metin çıkarma - sayfalar süreç havuzunda paralel işlenir, sınırlar aşılırsa yükleme reddedilir
+        self.pdf_extract_workers = int(os.getenv("RAG_PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.pdf_max_pages = int(os.getenv("RAG_PDF_MAX_PAGES", "1000"))
+        self.pdf_max_bytes = int(os.getenv("RAG_PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.pdf_task_timeout = float(os.getenv("RAG_PDF_TASK_TIMEOUT", "120"))  # saniye, hiçbir aralık bitmezse havuz yenilenir
+        
+        # Embedding çalışma ortamı (CPU): torch (fp32), torch-int8, onnx, onnx-int8.
+        # Optimize edilmiş model referans fp32 modelle karşılaştırılır, eşiğin altında kalırsa fp32 kullanılır
+        self.embedding_runtime = os.getenv("RAG_EMBEDDING_RUNTIME", "torch").lower()
+        self.embedding_threads = int(os.getenv("RAG_EMBEDDING_THREADS", "0"))  # 0: kütüphane varsayılanı
+        self.embedding_max_seq_length = int(os.getenv("RAG_EMBEDDING_MAX_SEQ_LENGTH", "0"))  # 0: modelin varsayılanı
+        self.embedding_parity_min_cosine = float(os.getenv("RAG_EMBEDDING_PARITY_MIN_COSINE", "0.98"))
+        self.embedding_runtime_path = os.getenv("RAG_EMBEDDING_RUNTIME_PATH", os.path.join("data", "embedding_runtime"))
+        
+        # Harici embedding servisi (python -m services.embedding_service). Tanımlıysa model API
+        # süreçlerine yüklenmez; tüm worker'ların encode istekleri serviste toplu işlenir
+        self.embedding_service_address = os.getenv("RAG_EMBEDDING_SERVICE_ADDRESS")  # "host:port" veya unix soket yolu
+        self.embedding_service_max_batch = int(os.getenv("RAG_EMBEDDING_SERVICE_MAX_BATCH", "64"))
+        self.embedding_service_max_wait_ms = float(os.getenv("RAG_EMBEDDING_SERVICE_MAX_WAIT_MS", "5"))
+        self.embedding_service_timeout = float(os.getenv("RAG_EMBEDDING_SERVICE_TIMEOUT", "30"))  # saniye, istemcinin yanıt bekleme süresi
+        
+        # Prompt'a eklenen RAG bağlamı: skor sırasıyla, örtüşen parçalar atlanarak token bütçesine sığdırılır
+        self.context_token_budget = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+        self.context_max_passages = int(os.getenv("RAG_CONTEXT_MAX_PASSAGES", "5"))
+        self.context_max_passage_tokens = int(os.getenv("RAG_CONTEXT_MAX_PASSAGE_TOKENS", "0"))  # kırpılan parça için; 0: bütçe / parça sayısı
+        self.context_dedupe_threshold = float(os.getenv("RAG_CONTEXT_DEDUPE_THRESHOLD", "0.8"))
+        self.context_chars_per_token = float(os.getenv("RAG_CONTEXT_CHARS_PER_TOKEN", "3.5"))
+        # Arama: örtüşen parçalar elenebileceği için bağlama girecek parça sayısından fazla sonuç alınır
+        self.search_top_k = int(os.getenv("RAG_SEARCH_TOP_K", str(max(self.context_max_passages, 1) * 2)))
+        self.similarity_threshold = float(os.getenv("RAG_SIMILARITY_THRESHOLD", "0.5"))  # kosinüs benzerliği
+        
+        # Sorgu önbellekleri - embedding LRU'su ve kısa ömürlü arama sonucu önbelleği (0 kapatır)
+        self.query_embedding_cache_size = int(os.getenv("RAG_QUERY_EMBEDDING_CACHE_SIZE", "512"))
+        self.result_cache_size = int(os.getenv("RAG_RESULT_CACHE_SIZE", "128"))
+        self.result_cache_ttl = float(os.getenv("RAG_RESULT_CACHE_TTL", "60"))
+        
+        # Her uzmanlık dalı kendi namespace'ine yazılır ve sadece kendi namespace'inde aranır.
+        # Namespace'ler öncesinde varsayılan namespace'e yüklenmiş dokümanlar bu dalın sorgularına eklenir
+        self.legacy_namespace_specialty = os.getenv("RAG_LEGACY_NAMESPACE_SPECIALTY", "psikoloji").lower()
+        self.namespace_cache_ttl = float(os.getenv("RAG_NAMESPACE_CACHE_TTL", "60"))
+        
+        # Vektör deposu: "pinecone" (varsayılan) veya "local" (süreç içi, diskte memory-map)
+        self.vector_backend = os.getenv("RAG_VECTOR_BACKEND", "pinecone").lower()
+        self.local_index_path = os.getenv("RAG_LOCAL_INDEX_PATH", os.path.join("data", "rag_index"))
+        
         # Pinecone client'ı başlat
         self.pinecone_client: Optional[Pinecone] = None
         self.embedding_model: Optional[SentenceTransformer] = None
+        self.embedding_runtime_info = None
+        self.vector_store = None
         
-        # RAG sistemi aktif mi kontrolü
-        self.is_rag_enabled = bool(self.pinecone_api_key and PINECONE_AVAILABLE and SENTENCE_TRANSFORMERS_AVAILABLE)
+        # RAG sistemi aktif mi kontrolü - yerel depo Pinecone, embedding servisi sentence-transformers gerektirmez
+        embeddings_available = SENTENCE_TRANSFORMERS_AVAILABLE or bool(self.embedding_service_address)
+        if self.vector_backend == "local":
+            self.is_rag_enabled = embeddings_available
+        else:
+            self.is_rag_enabled = bool(self.pinecone_api_key and PINECONE_AVAILABLE and embeddings_available)
     
     def initialize_clients(self):
         """Pinecone ve embedding model'lerini başlat"""
@@ -37,33 +94,41 @@ class RAGConfig:
             return False
             
         try:
-            if not PINECONE_AVAILABLE:
+            use_pinecone = self.vector_backend != "local"
+            
+            if use_pinecone and not PINECONE_AVAILABLE:
                 print("Pinecone kütüphanesi mevcut değil")
                 return False
                 
-            if not SENTENCE_TRANSFORMERS_AVAILABLE:
-                print("Sentence-transformers kütüphanesi mevcut değil")
-                return False
-            
             # Pinecone client'ı başlat
-            self.pinecone_client = Pinecone(api_key=self.pinecone_api_key)
+            if use_pinecone:
+                self.pinecone_client = Pinecone(api_key=self.pinecone_api_key)
             
-            # Embedding model'i yükle - hata yakalama ile
-            try:
-                self.embedding_model = SentenceTransformer(self.embedding_model_name)
-                print(f"Embedding model '{self.embedding_model_name}' başarıyla yüklendi")
-            except Exception as model_error:
-                print(f"Embedding model yüklenirken hata: {model_error}")
-                # Alternatif model dene
+            if self.embedding_service_address:
+                from services.embedding_service import RemoteEmbeddingModel
+                self.embedding_model = RemoteEmbeddingModel(
+                    self.embedding_service_address, timeout=self.embedding_service_timeout
+                )
                 try:
-                    self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-                    print("Alternatif embedding model 'all-MiniLM-L6-v2' yüklendi")
-                except Exception as alt_error:
-                    print(f"Alternatif model de yüklenemedi: {alt_error}")
+                    self.embedding_model.get_stats()
+                except Exception as service_error:
+                    # RAG kapatılmaz; servis ayağa kalkınca sonraki başlatma denemesi başarılı olur
+                    print(f"Embedding servisine ulaşılamadı: {service_error}")
+                    self.embedding_model = None
+                    return False
+                print(f"Embedding servisi kullanılıyor: {self.embedding_service_address}")
+            else:
+                self.embedding_model = self.load_embedding_model()
+                if self.embedding_model is None:
                     return False
             
             # Index'in var olup olmadığını kontrol et
-            self._ensure_index_exists()
+            if use_pinecone:
+                self._ensure_index_exists()
+            
+            from services.vector_store import create_vector_store
+            self.vector_store = create_vector_store(self)
+            print(f"Vektör deposu: {self.vector_store.name}")
             
             return True
         except Exception as e:
@@ -71,6 +136,31 @@ class RAGConfig:
             self.is_rag_enabled = False
             return False
     
+    def load_embedding_model(self):
+        """Embedding modelini bu süreçte yükler ve seçilen çalışma ortamına göre hazırlar"""
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            print("Sentence-transformers kütüphanesi mevcut değil")
+            return None
+        
+        # Embedding model'i yükle - hata yakalama ile
+        try:
+            model = SentenceTransformer(self.embedding_model_name)
+            print(f"Embedding model '{self.embedding_model_name}' başarıyla yüklendi")
+        except Exception as model_error:
+            print(f"Embedding model yüklenirken hata: {model_error}")
+            # Alternatif model dene
+            try:
+                model = SentenceTransformer('all-MiniLM-L6-v2')
+                print("Alternatif embedding model 'all-MiniLM-L6-v2' yüklendi")
+            except Exception as alt_error:
+                print(f"Alternatif model de yüklenemedi: {alt_error}")
+                return None
+        
+        # İsteğe bağlı int8/ONNX çalışma ortamı, thread sayısı ve sabit dizi uzunluğu
+        from services.embedding_runtime import EmbeddingRuntime
+        self.embedding_runtime_info = EmbeddingRuntime(self)
+        return self.embedding_runtime_info.prepare(model)
+    
     def _ensure_index_exists(self):
         """Index'in var olduğundan emin ol, yoksa oluştur"""
         if not self.pinecone_client:
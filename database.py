@@ -82,6 +82,17 @@ class TreatmentPlans(Base):
     hasta = relationship("Hastalar", foreign_keys=[hasta_id])
     doktor = relationship("Kullanicilar", foreign_keys=[doktor_id])
 
+class TreatmentPlanGenerations(Base):
+    """Arka planda hazırlanan tedavi adımlarının durumu (hazirlaniyor, hazir, basarisiz)"""
+    __tablename__ = "treatment_plan_generations"
+
+    plan_id = Column(Integer, ForeignKey("treatment_plans.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String(20), nullable=False, default="hazirlaniyor")
+    attempt = Column(Integer, nullable=False, default=1)  # Yeniden oluşturmada artar; eski görevin sonucu yazılmaz
+    error = Column(Text)
+    started_at = Column(DateTime, default=datetime.now)
+    finished_at = Column(DateTime)
+
 class RAGUploads(Base):
     __tablename__ = "rag_uploads"
     
@@ -95,6 +106,47 @@ class RAGUploads(Base):
     # İlişki
     uploader = relationship("Kullanicilar", foreign_keys=[uploaded_by])
 
+class RAGUploadChunks(Base):
+    """Bir yüklemenin vektör deposuna yazdığı parçalar; silme ve yeniden yüklemede bu id'ler temizlenir"""
+    __tablename__ = "rag_upload_chunks"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    upload_id = Column(Integer, ForeignKey("rag_uploads.id", ondelete="CASCADE"), nullable=False, index=True)
+    namespace = Column(String, nullable=False, default="")
+    vector_id = Column(String, nullable=False)
+    chunk_index = Column(Integer)
+    content_hash = Column(String(64))  # Normalleştirilmiş parça metninin SHA-256 özeti
+
+class RAGIngestJobs(Base):
+    """Arka planda işlenen PDF yükleme işleri (queued, extracting, embedding, upserting, done, failed)"""
+    __tablename__ = "rag_ingest_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    upload_id = Column(Integer, ForeignKey("rag_uploads.id", ondelete="SET NULL"))  # İş bitince oluşan yükleme kaydı
+    filename = Column(String, nullable=False)
+    description = Column(Text)
+    specialty = Column(String, default="psikoloji")
+    uploaded_by = Column(Integer, ForeignKey("kullanicilar.id"))
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    processed_chunks = Column(Integer, default=0)
+    total_chunks = Column(Integer, default=0)
+    error = Column(Text)
+    owner = Column(String)  # İşi çalıştıran worker (host:pid:açılış id'si)
+    heartbeat_at = Column(DateTime)  # Worker iş sürerken düzenli olarak günceller
+    created_at = Column(DateTime, default=datetime.now)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at = Column(DateTime)
+
+class ChatMemoryMessages(Base):
+    """Çoklu worker ortamında paylaşılan konuşma memory'si (AI_MEMORY_BACKEND=database)"""
+    __tablename__ = "chat_memory_messages"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    hasta_id = Column(Integer, ForeignKey("hastalar.id"), nullable=False, index=True)
+    rol = Column(String(10), nullable=False)  # 'human' veya 'ai'
+    icerik = Column(Text, nullable=False)
+    tarih = Column(DateTime(timezone=True), server_default=func.now())
+
 def get_db():
     """Database session dependency"""
     db = SessionLocal()
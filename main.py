@@ -2,8 +2,10 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from database import init_db
-from routers import pages, auth, patients, ai, rag, news
+from routers import pages, auth, patients, ai, rag, news, metrics, health
+from services.prompt_registry import prompt_registry
 import os
+import threading
 
 app = FastAPI(title="Yapay Zeka Asistanı - Tıbbi Tanı Sistemi", version="1.0.0")
 
@@ -29,11 +31,28 @@ app.include_router(patients.router, prefix="/api/patients", tags=["Patients"])
 app.include_router(ai.router, prefix="/api/ai", tags=["AI"])
 app.include_router(rag.router, prefix="/api/rag", tags=["RAG System"])
 app.include_router(news.router, tags=["News"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(health.router, tags=["Health"])
 
 @app.on_event("startup")
 async def startup():
     init_db()
     print("Veritabanı başlatıldı")
+    prompt_registry.compile_all()
+    print("Prompt şablonları derlendi")
+    if rag.RAG_SERVICE_AVAILABLE:
+        interrupted = rag.ingest_job_manager.mark_interrupted_jobs()
+        if interrupted:
+            print(f"{interrupted} yarım kalmış RAG yükleme işi başarısız olarak işaretlendi")
+    
+    # İsteğe bağlı RAG ısınması - model yükleme ilk kullanıcıya bırakılmaz, /ready bitene kadar 503 döner
+    if rag.RAG_SERVICE_AVAILABLE and os.getenv("RAG_WARMUP", "false").lower() in ("1", "true", "yes"):
+        if rag.rag_service.config.is_rag_enabled:
+            rag.rag_service.warmup_status = "pending"
+            threading.Thread(target=rag.rag_service.warm_up, name="rag-warmup", daemon=True).start()
+            print("RAG ısınması arka planda başlatıldı")
+        else:
+            print("RAG devre dışı olduğu için ısınma atlandı")
 
 if __name__ == "__main__":
     import uvicorn
@@ -34,4 +34,5 @@ class PatientCreate(BaseModel):
 class AIPrompt(BaseModel):
     hasta_id: int
     prompt: str
-    meslek_dali: str 
\ No newline at end of file
+    meslek_dali: str
+    no_cache: bool = False  # True ise yanıt önbelleği atlanır 
\ No newline at end of file
@@ -1,16 +1,20 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 import os
 from models import AIPrompt
 from routers.auth import verify_jwt_token
-from database import get_db, Hastalar, ConsultationHistory, TreatmentPlans, Kullanicilar, SessionLocal
+from routers.rag import verify_admin
+from database import get_db, Hastalar, ConsultationHistory, TreatmentPlans, TreatmentPlanGenerations, Kullanicilar, SessionLocal
 from dotenv import load_dotenv
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import json
+import asyncio
 try:
     from services.rag_service import rag_service
     RAG_SERVICE_AVAILABLE = True
@@ -21,13 +25,20 @@ except ImportError as e:
     class DummyRAGService:
         is_initialized = False
         def initialize(self): return False
-        def get_enhanced_context(self, query): return ""
+        def get_enhanced_context(self, query, specialty="genel"): return ""
     rag_service = DummyRAGService()
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
+from services.llm_clients import llm_registry
+from services.prompt_registry import prompt_registry
+from services.memory_store import patient_memory_store
+from services.response_cache import response_cache
+from services.metrics import consultation_stage_seconds, specialty_label
+from services.single_flight import AsyncSingleFlightGroup
+from services.consultation_repository import (
+    load_patient, format_patient_info, save_consultation, update_treatment_plan_steps,
+    mark_treatment_plan_failed, treatment_plan_status, restart_treatment_plan, get_treatment_plan_state
+)
 from langchain_core.output_parsers import StrOutputParser
-from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
 
 import tempfile
@@ -38,79 +49,45 @@ load_dotenv()
 
 router = APIRouter()
 
-patient_memories = {}
+# Aynı anahtarla eşzamanlı gelen konsültasyonlar (çift tıklama) tek LLM çağrısını ve tek kaydı paylaşır
+consultation_flights = AsyncSingleFlightGroup("Konsültasyon")
 
-
-def get_patient_memory(patient_id: int) -> ConversationBufferWindowMemory:
-    """Hasta için memory alır veya oluşturur - sadece mevcut chat oturumu için"""
-    if patient_id not in patient_memories:
-        patient_memories[patient_id] = ConversationBufferWindowMemory(
-            k=3,  # Optimal seviye: 3 mesaj sakla
-            return_messages=True,
-            memory_key="chat_history"
-        )
-    return patient_memories[patient_id]
+# Arka planda hazırlanan tedavi planı görevleri
+treatment_plan_tasks = set()
 
 def get_ai_model():
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
+    """Paylaşılan Gemini istemcisini döndürür - her istekte yeni bağlantı kurulmaz"""
+    if not os.getenv("GEMINI_API_KEY"):
         raise HTTPException(status_code=400, detail="GEMINI_API_KEY bulunamadı")
     
-    return ChatGoogleGenerativeAI(
+    return llm_registry.get_chat_model(
         model="gemini-1.5-flash",  # En güçlü model
-        google_api_key=GEMINI_API_KEY,
         temperature=0.3,  # Daha yaratıcı yanıtlar
         max_tokens=800,   # Daha uzun yanıtlar için
         convert_system_message_to_human=True  
     )
 
-def generate_treatment_steps(diagnosis_response: str, specialty: str, patient_info: str) -> str:
-    """AI'dan gelen tanı yanıtına göre tedavi adımları listesi oluşturur"""
-    try:
-        model = get_ai_model()
-        
-        treatment_prompt = f"""
-Sen bir {specialty} uzmanısın. {patient_info} için detaylı tedavi planı hazırla.
-
-TANI DEĞERLENDİRMESİ:
-{diagnosis_response[:300]}...
-
-TEDAVİ PLANI FORMAT:
-
-### 1. İlaçlı Tedavi Adımları:
-* **İlaç Adı:** Doz, kullanım şekli ve süresi
-* **İlaç 2:** Doz, kullanım şekli ve süresi
-
-### 2. İlaçsız Tedavi Adımları:
-* **Yaşam Tarzı:** Spesifik öneriler
-* **Beslenme:** Detaylı rehber
-* **Takip:** Kontrol zamanları
-
-### 3. Önemli Uyarılar:
-* Yan etkiler ve dikkat edilecek durumlar
-* Acil başvuru koşulları
-
-KURAL: Toplam 180-220 kelime, net ve uygulanabilir öneriler ver.
-"""
-        
-        from langchain_core.prompts import ChatPromptTemplate
-        from langchain_core.output_parsers import StrOutputParser
-        
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", "Sen deneyimli bir tıp uzmanısın. Hasta tedavi planları hazırlıyorsun."),
-            ("human", treatment_prompt)
-        ])
-        
-        output_parser = StrOutputParser()
-        chain = prompt_template | model | output_parser
-        
-        treatment_response = chain.invoke({})
-        
-        return treatment_response
-        
-    except Exception as e:
-        print(f"Tedavi adımları oluşturma hatası: {e}")
-        return "Tedavi adımları oluşturulamadı. Lütfen tekrar deneyiniz."
+async def generate_treatment_steps(diagnosis_response: str, specialty: str, patient_info: str) -> str:
+    """AI'dan gelen tanı yanıtına göre tedavi adımları listesi oluşturur (event loop'u bloklamaz).
+    LLM hatasında veya boş yanıtta exception fırlatır."""
+    model = get_ai_model()
+    
+    # Şablon önceden derlenmiş; burada sadece değişkenler yerleştirilir
+    prompt_template = prompt_registry.get_treatment_template()
+    
+    output_parser = StrOutputParser()
+    chain = prompt_template | model | output_parser
+    
+    with consultation_stage_seconds.time(stage="treatment_llm", specialty=specialty_label(specialty)):
+        treatment_response = await chain.ainvoke({
+            "specialty": specialty,
+            "patient_info": patient_info,
+            "diagnosis": diagnosis_response[:300]
+        })
+    
+    if not treatment_response or not treatment_response.strip():
+        raise ValueError("Model boş tedavi yanıtı döndürdü")
+    return treatment_response
 
 def format_treatment_for_email(treatment_text: str) -> str:
     """Tedavi metnini email için basit ve temiz formata çevirir"""
@@ -242,306 +219,320 @@ def send_treatment_email(patient_email: str, patient_name: str, doctor_name: str
         print(f"Email gönderme hatası: {e}")
         raise HTTPException(status_code=500, detail=f"Email gönderilemedi: {str(e)}")
 
-def get_examples(specialty):
-    examples = {
-        "noroloji": [
-            {
-                "hasta_durumu": "[Nörolojik semptomlar burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Ayrıntılı muayene öneriyorum.\n2. **[Tanı 2]**: [Açıklama]. Görüntüleme çalışmaları değerlendirilebilir.\n3. **[Tanı 3]**: [Açıklama]. Laboratuvar testleri destekleyici olabilir."
-            }
-        ],
-        "dermatoloji": [
-            {
-                "hasta_durumu": "[Dermatolojik bulgular burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Topikal tedavi önerebilirim.\n2. **[Tanı 2]**: [Açıklama]. Biopsi değerlendirilebilir.\n3. **[Tanı 3]**: [Açıklama]. Sistemik yaklaşım gerekebilir."
-            }
-        ],
-        "kardiyoloji": [
-            {
-                "hasta_durumu": "[Kardiyolojik semptomlar burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. EKG ve Ekokardiyografi değerlendirmesi öneriyorum.\n2. **[Tanı 2]**: [Açıklama]. Kardiyak enzim takibi yapılabilir.\n3. **[Tanı 3]**: [Açıklama]. İleri görüntüleme tetkikleri planlanabilir."
-            }
-        ],
-        "pediatri": [
-            {
-                "hasta_durumu": "[Pediatrik semptomlar burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Yaşa uygun tedavi planlanabilir.\n2. **[Tanı 2]**: [Açıklama]. Gelişimsel değerlendirme öneriyorum.\n3. **[Tanı 3]**: [Açıklama]. Aile eğitimi ve takip planı oluşturulabilir."
-            }
-        ],
-        "kbb": [
-            {
-                "hasta_durumu": "[KBB semptomları burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Endoskopik muayene değerlendirilebilir.\n2. **[Tanı 2]**: [Açıklama]. İşitme testi önerilebilir.\n3. **[Tanı 3]**: [Açıklama]. Medikal tedavi başlanabilir."
-            }
-        ],
-        "dahiliye": [
-            {
-                "hasta_durumu": "[Dahiliye semptomları burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Kapsamlı kan tetkikleri öneriyorum.\n2. **[Tanı 2]**: [Açıklama]. Görüntüleme çalışmaları değerlendirilebilir.\n3. **[Tanı 3]**: [Açıklama]. Yaşam tarzı değişiklikleri planlanabilir."
-            }
-        ],
-        "endokrinoloji": [
-            {
-                "hasta_durumu": "[Endokrinolojik semptomlar burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Hormon düzeyi testleri öneriyorum.\n2. **[Tanı 2]**: [Açıklama]. Görüntüleme çalışmaları değerlendirilebilir.\n3. **[Tanı 3]**: [Açıklama]. Metabolik değerlendirme yapılabilir."
-            }
-        ],
-        "ortopedi": [
-            {
-                "hasta_durumu": "[Ortopedik semptomlar burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Radyolojik inceleme öneriyorum.\n2. **[Tanı 2]**: [Açıklama]. Fizik tedavi yaklaşımı değerlendirilebilir.\n3. **[Tanı 3]**: [Açıklama]. İleri görüntüleme tetkikleri planlanabilir."
-            }
-        ],
-        "psikoloji": [
-            {
-                "hasta_durumu": "[Psikolojik semptomlar burada açıklanır]",
-                "tani_onerisi": "**Değerlendirme:**\n1. **[Tanı 1]**: [Açıklama]. Psikoterapi yaklaşımı önerilebilir.\n2. **[Tanı 2]**: [Açıklama]. Değerlendirme ölçekleri uygulanabilir.\n3. **[Tanı 3]**: [Açıklama]. Multidisipliner yaklaşım planlanabilir."
-            }
-        ]
-    }
-    return examples.get(specialty, [])
-
 def create_prompt_template_with_memory(specialty):
-    examples = get_examples(specialty)
+    """Uzmanlık dalı için önceden derlenmiş konsültasyon şablonunu döndürür (config/prompts.json)"""
+    return prompt_registry.get(specialty)
+
+async def fill_treatment_plan(plan_id: int, diagnosis_response: str, specialty: str, patient_info: str,
+                              attempt: int = 1):
+    """Tedavi adımlarını arka planda oluşturup ilgili TreatmentPlans kaydına yazar.
+    Hata durumunda plan 'basarisiz' olarak işaretlenir, tedavi_adimlari boş kalır."""
+    import time
+    start_time = time.time()
     
-    example_prompt = ChatPromptTemplate.from_messages([
-        ("human", "Hasta Durumu: {hasta_durumu}"),
-        ("ai", "{tani_onerisi}")
-    ])
+    try:
+        treatment_steps = await generate_treatment_steps(diagnosis_response, specialty, patient_info)
+    except Exception as e:
+        print(f"Tedavi adımları oluşturma hatası: {e}")
+        await run_in_threadpool(mark_treatment_plan_failed, plan_id, str(e), attempt)
+        return
     
-    few_shot_prompt = FewShotChatMessagePromptTemplate(
-        example_prompt=example_prompt,
-        examples=examples,
-    )
+    await run_in_threadpool(update_treatment_plan_steps, plan_id, treatment_steps, attempt)
+    print(f"Tedavi planı {plan_id} arka planda hazırlandı: {time.time() - start_time:.2f} saniye")
+
+def schedule_treatment_plan(plan_id: int, diagnosis_response: str, specialty: str, patient_info: str,
+                            attempt: int = 1) -> asyncio.Task:
+    """Tedavi planı görevini sürecin sahip olduğu bir task olarak başlatır.
+    İsteğin BackgroundTasks'ına bağlı değildir; istemci bağlantısı kopsa da plan doldurulur."""
+    task = asyncio.create_task(fill_treatment_plan(plan_id, diagnosis_response, specialty, patient_info, attempt))
+    # Event loop task'lara zayıf referans tutar; bitene kadar burada saklanır
+    treatment_plan_tasks.add(task)
+    task.add_done_callback(treatment_plan_tasks.discard)
+    return task
+
+async def build_enhanced_prompt(prompt: str, specialty: str) -> tuple:
+    """Uzmanlık alanının RAG bağlamı varsa prompt'a ekler; (prompt, rag_context) döndürür"""
+    # Model yükleme ve embedding CPU/IO bloklayıcı olduğu için thread pool'da çalışır
+    enhanced_prompt = prompt
+    rag_context = ""
+    if RAG_SERVICE_AVAILABLE:
+        try:
+            # RAG servisini başlat (eğer başlatılmamışsa)
+            if not rag_service.is_initialized:
+                with consultation_stage_seconds.time(stage="rag_init", specialty=specialty_label(specialty)):
+                    initialized = await run_in_threadpool(rag_service.initialize)
+                if not initialized:
+                    print("RAG sistemi başlatılamadı, normal prompt kullanılıyor")
+                    enhanced_prompt = prompt
+                else:
+                    print("RAG servisi başarıyla başlatıldı")
+            
+            # RAG servisi başlatılmışsa (ilk sorgu veya sonraki sorgular için)
+            if rag_service.is_initialized:
+                # İlgili bilgileri ara
+                rag_context = await run_in_threadpool(rag_service.get_enhanced_context, prompt, specialty.lower())
+                if rag_context and len(rag_context.strip()) > 0:
+                    enhanced_prompt = f"{rag_context}\n\nKullanıcı Sorusu: {prompt}"
+                    print(f"RAG bağlamı eklendi. Bağlam uzunluğu: {len(rag_context)} karakter")
+                else:
+                    print("RAG sisteminde ilgili bilgi bulunamadı, normal prompt kullanılıyor")
+                    enhanced_prompt = prompt
+            else:
+                print("RAG servisi başlatılamadı, normal prompt kullanılıyor")
+                enhanced_prompt = prompt
+                    
+        except Exception as rag_error:
+            print(f"RAG sistemi hatası: {rag_error}")
+            print("Normal prompt ile devam ediliyor")
+            enhanced_prompt = prompt
+            rag_context = ""
+    else:
+        print("RAG sistemi mevcut değil, normal prompt kullanılıyor")
+        enhanced_prompt = prompt
     
-    system_prompts = {
-        "noroloji": """Sen nöroloji uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Klinik bulgular ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
-
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "dermatoloji": """Sen dermatoloji uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Cilt bulguları ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
+    return enhanced_prompt, rag_context or ""
 
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "kardiyoloji": """Sen kardiyoloji uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Kardiyak bulgular ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
-
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "pediatri": """Sen pediatri uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Çocuk yaşına özgü bulgular ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
-
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "kbb": """Sen KBB uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: KBB bulguları ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
-
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "dahiliye": """Sen dahiliye uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: İç hastalık bulguları ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
-
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "endokrinoloji": """Sen endokrinoloji uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Hormon bulguları ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
-
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "ortopedi": """Sen ortopedi uzmanısın. Meslektaşına konsültasyon veriyorsun.
-
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Ortopedik bulgular ve neden bu tanıyı düşündüğün. Önerilen tetkikler. Tedavi yaklaşımı.
+def consultation_cache_key(prompt_data: AIPrompt, current_user: dict, rag_context: str, chat_history: list) -> str:
+    return response_cache.make_key(
+        f"{current_user['user_id']}:{prompt_data.hasta_id}",
+        prompt_data.meslek_dali, prompt_data.prompt, rag_context, chat_history
+    )
 
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver.""",
-        "psikoloji": """Sen psikoloji uzmanısın. Meslektaşına konsültasyon veriyorsun.
+async def prepare_consultation(prompt_data: AIPrompt, current_user: dict) -> dict:
+    """Konsültasyon zinciri, memory, RAG destekli prompt ve hasta bilgisini hazırlar"""
+    model = get_ai_model()
+    prompt_template = create_prompt_template_with_memory(prompt_data.meslek_dali.lower())
+    
+    output_parser = StrOutputParser()
+    chain = prompt_template | model | output_parser
+    
+    # RAG araması hasta verisine dokunmadığı için yetki kontrolüyle eşzamanlı başlar;
+    # sohbet geçmişi ancak hasta bu doktora aitse yüklenir. DB ve embedding işleri thread pool'da çalışır
+    rag_task = asyncio.ensure_future(build_enhanced_prompt(prompt_data.prompt, prompt_data.meslek_dali))
+    try:
+        patient = await run_in_threadpool(load_patient, prompt_data.hasta_id, current_user["user_id"])
+        if patient is None:
+            raise HTTPException(status_code=404, detail="Hasta bulunamadı")
+        
+        chat_history, (enhanced_prompt, rag_context) = await asyncio.gather(
+            run_in_threadpool(patient_memory_store.get_messages, prompt_data.hasta_id, current_user["user_id"]),
+            rag_task
+        )
+    except BaseException:
+        rag_task.cancel()
+        raise
+    
+    patient_info = format_patient_info(patient)
+    print(f"Chat history uzunluğu: {len(chat_history)} mesaj")
+    
+    # Aynı vaka metni aynı bağlam ve geçmişle tekrar gönderildiyse önbellekteki yanıt kullanılır
+    cache_key = consultation_cache_key(prompt_data, current_user, rag_context, chat_history)
+    if prompt_data.no_cache:
+        response_cache.record_bypass()
+        cached = None
+    else:
+        cached = response_cache.get(cache_key)
+        if cached:
+            print("Konsültasyon yanıtı önbellekten alındı")
+    
+    return {
+        "chain": chain,
+        "patient_info": patient_info,
+        "rag_context": rag_context,
+        "cache_key": cache_key,
+        "cached": cached,
+        "inputs": {
+            "hasta_durumu": enhanced_prompt,
+            "chat_history": chat_history
+        }
+    }
 
-RAG: "İlgili bilgiler:" varsa kullan.
-KURAL: Maksimum 3 tanı, her tanı için 3-4 cümle açıklama, toplam 200-250 kelime.
-FORMAT: 
-1. **Olası Tanı**: Psikolojik bulgular ve neden bu tanıyı düşündüğün. Önerilen değerlendirmeler. Tedavi yaklaşımı.
+async def cached_consultation_result(prompt_data: AIPrompt, current_user: dict, consultation: dict) -> dict:
+    """Önbellekteki yanıtın sonucu; memory'e ve veritabanına tekrar yazılmaz, önceki gönderimin planı döndürülür"""
+    cached = consultation["cached"]
+    plan_id = cached["plan_id"]
+    plan = await run_in_threadpool(get_treatment_plan_state, plan_id, current_user["user_id"])
+    chat_history = consultation["inputs"]["chat_history"]
+    
+    return {
+        "ai_response": cached["ai_response"],
+        "treatment_steps": plan["tedavi_adimlari"] if plan else None,
+        "treatment_plan_id": plan_id if plan else None,
+        "treatment_status": plan["status"] if plan else "olusturulamadi",
+        "from_cache": True,
+        "memory_messages_count": len(chat_history),
+        "is_first_message": len(chat_history) == 2,
+        "patient_info": consultation["patient_info"]
+    }
 
-Önceki mesajları hatırla. Meslektaş seviyesinde detaylı ama öz bilgi ver."""
+async def finalize_consultation(prompt_data: AIPrompt, current_user: dict, consultation: dict,
+                                ai_response: str) -> dict:
+    """Tanı yanıtını memory'e ve veritabanına yazar, tedavi planını arka plana bırakır"""
+    patient_info = consultation["patient_info"]
+    
+    # Memory'e ekle (paylaşılan backend'de DB yazması olabileceği için thread pool'da)
+    memory_messages = await run_in_threadpool(
+        patient_memory_store.add_exchange,
+        prompt_data.hasta_id, f"Soru: {prompt_data.prompt}", f"Cevap: {ai_response}", current_user["user_id"]
+    )
+    
+    print(f"LangChain AI yanıtı: {len(ai_response)} karakter")
+    print(f"Chat Memory'de {len(memory_messages)} mesaj var")
+    
+    # Hasta güncellemesi, geçmiş ve tedavi planı tek işlemde yazılır
+    with consultation_stage_seconds.time(stage="db_persist", specialty=specialty_label(prompt_data.meslek_dali)):
+        plan_id = await run_in_threadpool(
+            save_consultation,
+            prompt_data.hasta_id,
+            current_user["user_id"],
+            prompt_data.meslek_dali,
+            prompt_data.prompt,
+            ai_response
+        )
+    
+    if plan_id is not None and not prompt_data.no_cache:
+        cached_value = {"ai_response": ai_response, "plan_id": plan_id}
+        response_cache.set(consultation["cache_key"], cached_value)
+        # Pencere dolduysa en eski soru-cevap düşer; tekrar gönderimin üreteceği anahtar da kaydedilir
+        next_key = consultation_cache_key(prompt_data, current_user, consultation["rag_context"], memory_messages)
+        if next_key != consultation["cache_key"]:
+            response_cache.set(next_key, cached_value)
+    
+    # Tedavi adımları yanıt döndükten sonra arka planda oluşturulur,
+    # istemci /treatment-plan/{plan_id} üzerinden durumu sorgular
+    if plan_id is not None:
+        schedule_treatment_plan(plan_id, ai_response, prompt_data.meslek_dali, patient_info)
+    
+    return {
+        "ai_response": ai_response,
+        "treatment_steps": None,
+        "treatment_plan_id": plan_id,
+        "treatment_status": "hazirlaniyor" if plan_id is not None else "olusturulamadi",
+        "from_cache": False,
+        "memory_messages_count": len(memory_messages),
+        "is_first_message": len(memory_messages) == 2,  # İlk soru-cevap çifti
+        "patient_info": patient_info
     }
+
+async def generate_consultation(prompt_data: AIPrompt, current_user: dict, consultation: dict,
+                                on_token=None) -> dict:
+    """Tanı yanıtını üretip kaydeder; on_token verilirse yanıt parçaları üretildikçe iletilir"""
+    import time
+    ai_start = time.time()
     
-    final_prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompts.get(specialty, "Sen bir tıp uzmanısın.")),
-        few_shot_prompt,
-        ("human", "Chat Geçmişi: {chat_history}\n\nHasta Durumu: {hasta_durumu}\n\nLütfen yukarıdaki format ve kurallara uyarak değerlendirme yap.")
-    ])
+    # Ana tanı yanıtı - asenkron çağrı, diğer istekler beklemez
+    with consultation_stage_seconds.time(stage="diagnosis_llm", specialty=specialty_label(prompt_data.meslek_dali)):
+        if on_token is None:
+            ai_response = await consultation["chain"].ainvoke(consultation["inputs"])
+        else:
+            response_parts = []
+            async for chunk in consultation["chain"].astream(consultation["inputs"]):
+                if not chunk:
+                    continue
+                if not response_parts:
+                    print(f"İlk token süresi: {time.time() - ai_start:.2f} saniye")
+                response_parts.append(chunk)
+                on_token(chunk)
+            ai_response = "".join(response_parts)
     
-    return final_prompt
+    print(f"Tanı yanıt süresi: {time.time() - ai_start:.2f} saniye")
+    return await finalize_consultation(prompt_data, current_user, consultation, ai_response)
+
+def start_consultation(prompt_data: AIPrompt, current_user: dict, consultation: dict, on_token=None) -> tuple:
+    """Tanı görevini başlatır; aynı anahtarla süren bir konsültasyon varsa (çift tıklama) ona katılır.
+    (görev, paylaşıldı mı) döndürür. Görev isteğe ait nesne (BackgroundTasks vb.) tutmaz; ilk istemcinin
+    bağlantısı kopsa da kayıtlar ve tedavi planı tüm katılımcılar için tamamlanır."""
+    if prompt_data.no_cache:
+        return asyncio.ensure_future(
+            generate_consultation(prompt_data, current_user, consultation, on_token)
+        ), False
+    return consultation_flights.start(
+        consultation["cache_key"], generate_consultation,
+        prompt_data, current_user, consultation, on_token
+    )
 
 @router.post("/consultation")
 async def ai_konsultasyon(prompt_data: AIPrompt, current_user: dict = Depends(verify_jwt_token)):
-    import time
-    start_time = time.time()
-    
     try:
+        consultation = await prepare_consultation(prompt_data, current_user)
         
-        model = get_ai_model()
-        memory = get_patient_memory(prompt_data.hasta_id)
-        prompt_template = create_prompt_template_with_memory(prompt_data.meslek_dali.lower())
+        if consultation["cached"]:
+            return await cached_consultation_result(prompt_data, current_user, consultation)
         
-        output_parser = StrOutputParser()
-        chain = prompt_template | model | output_parser
-        
-        chat_history = memory.chat_memory.messages
-        print(f"Chat history uzunluğu: {len(chat_history)} mesaj")
-        
-        # RAG sistemi entegrasyonu (sadece psikoloji için)
-        enhanced_prompt = prompt_data.prompt
-        if prompt_data.meslek_dali.lower() == "psikoloji":
-            if RAG_SERVICE_AVAILABLE:
-                try:
-                    # RAG servisini başlat (eğer başlatılmamışsa)
-                    if not rag_service.is_initialized:
-                        if not rag_service.initialize():
-                            print("RAG sistemi başlatılamadı, normal prompt kullanılıyor")
-                            enhanced_prompt = prompt_data.prompt
-                        else:
-                            print("RAG servisi başarıyla başlatıldı")
-                    
-                    # RAG servisi başlatılmışsa (ilk sorgu veya sonraki sorgular için)
-                    if rag_service.is_initialized:
-                        # İlgili bilgileri ara
-                        rag_context = rag_service.get_enhanced_context(prompt_data.prompt)
-                        if rag_context and len(rag_context.strip()) > 0:
-                            enhanced_prompt = f"{rag_context}\n\nKullanıcı Sorusu: {prompt_data.prompt}"
-                            print(f"RAG bağlamı eklendi. Bağlam uzunluğu: {len(rag_context)} karakter")
-                        else:
-                            print("RAG sisteminde ilgili bilgi bulunamadı, normal prompt kullanılıyor")
-                            enhanced_prompt = prompt_data.prompt
-                    else:
-                        print("RAG servisi başlatılamadı, normal prompt kullanılıyor")
-                        enhanced_prompt = prompt_data.prompt
-                            
-                except Exception as rag_error:
-                    print(f"RAG sistemi hatası: {rag_error}")
-                    print("Normal prompt ile devam ediliyor")
-                    enhanced_prompt = prompt_data.prompt
-            else:
-                print("RAG sistemi mevcut değil, normal prompt kullanılıyor")
-                enhanced_prompt = prompt_data.prompt
-        
-        # Hasta bilgilerini önceden al
-        db = SessionLocal()
-        try:
-            patient_result = db.query(Hastalar).filter(
-                Hastalar.id == prompt_data.hasta_id,
-                Hastalar.doktor_id == current_user["user_id"]
-            ).first()
-            
-            if patient_result:
-                patient_info = f"Hasta: {patient_result.ad} {patient_result.soyad}, Doğum Tarihi: {patient_result.dogum_tarihi or 'Belirtilmemiş'}, Email: {patient_result.email or 'Belirtilmemiş'}"
-            else:
-                patient_info = "Hasta bilgileri bulunamadı"
-        finally:
-            db.close()
-        
-        # Paralel işleme için asyncio kullan
-        import asyncio
-        import concurrent.futures
-        
-        ai_start = time.time()
-        
-        # Ana tanı yanıtı
-        ai_response = chain.invoke({
-            "hasta_durumu": enhanced_prompt,
-            "chat_history": chat_history
-        })
-        
-        # Memory'e ekle
-        memory.chat_memory.add_user_message(f"Soru: {prompt_data.prompt}")
-        memory.chat_memory.add_ai_message(f"Cevap: {ai_response}")
-        
-        # Tedavi adımlarını paralel oluştur
-        treatment_steps = generate_treatment_steps(ai_response, prompt_data.meslek_dali, patient_info)
-        
-        ai_end = time.time()
-        print(f"Toplam AI işlem süresi: {ai_end - ai_start:.2f} saniye")
-        print(f"LangChain AI yanıtı: {len(ai_response)} karakter")
-        print(f"Chat Memory'de {len(memory.chat_memory.messages)} mesaj var")
-        
-        # Veritabanına kaydet
-        db = SessionLocal()
-        try:
-            # Hasta tablosunu güncelle
-            patient = db.query(Hastalar).filter(
-                Hastalar.id == prompt_data.hasta_id,
-                Hastalar.doktor_id == current_user["user_id"]
-            ).first()
-            
-            if patient:
-                patient.tani_bilgileri = prompt_data.prompt
-                patient.ai_onerileri = ai_response
-                # son_guncelleme otomatik güncellenecek (onupdate=func.now())
-            
-            # Konsültasyon geçmişini kaydet
-            consultation = ConsultationHistory(
-                hasta_id=prompt_data.hasta_id,
-                doktor_id=current_user["user_id"],
-                meslek_dali=prompt_data.meslek_dali,
-                soru=prompt_data.prompt,
-                cevap=ai_response
-            )
-            db.add(consultation)
-            
-            # Tedavi planını kaydet
-            try:
-                treatment_plan = TreatmentPlans(
-                    hasta_id=prompt_data.hasta_id,
-                    doktor_id=current_user["user_id"],
-                    meslek_dali=prompt_data.meslek_dali,
-                    tani_bilgisi=ai_response,
-                    tedavi_adimlari=treatment_steps
-                )
-                db.add(treatment_plan)
-                
-            except Exception as db_error:
-                print(f"Tedavi planı kaydetme hatası: {db_error}")
-            
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            print(f"Veritabanı kaydetme hatası: {e}")
-        finally:
-            db.close()
-        
-        return {
-            "ai_response": ai_response,
-            "treatment_steps": treatment_steps,
-            "memory_messages_count": len(memory.chat_memory.messages),
-            "is_first_message": len(memory.chat_memory.messages) == 2,  # İlk soru-cevap çifti
-            "patient_info": patient_info
-        }
+        task, shared = start_consultation(prompt_data, current_user, consultation)
+        # shield: istemci bağlantısı koparsa yanıt yine de kaydedilir
+        result = await asyncio.shield(task)
+        return {**result, "from_cache": True} if shared else result
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"AI konsültasyon hatası: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"AI konsültasyon hatası: {str(e)}")
 
+def format_sse(payload: dict) -> str:
+    """Server-sent events formatında tek bir olay satırı oluşturur"""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
+@router.post("/consultation/stream")
+async def ai_konsultasyon_stream(prompt_data: AIPrompt, current_user: dict = Depends(verify_jwt_token)):
+    """Tanı yanıtını üretildikçe SSE ile gönderir; kayıt işlemleri akış bitince yapılır"""
+    try:
+        consultation = await prepare_consultation(prompt_data, current_user)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"AI konsültasyon hatası: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"AI konsültasyon hatası: {str(e)}")
+    
+    async def event_stream():
+        try:
+            if consultation["cached"]:
+                # Önbellekteki yanıt tek parça halinde gönderilir
+                result = await cached_consultation_result(prompt_data, current_user, consultation)
+                yield format_sse({"type": "token", "content": result["ai_response"]})
+                yield format_sse({"type": "done", **result})
+                return
+            
+            tokens = asyncio.Queue()
+            task, shared = start_consultation(
+                prompt_data, current_user, consultation, on_token=tokens.put_nowait
+            )
+            if shared:
+                # Aynı vaka zaten üretiliyor; yanıt bitince tek parça halinde gönderilir
+                result = {**await asyncio.shield(task), "from_cache": True}
+                yield format_sse({"type": "token", "content": result["ai_response"]})
+            else:
+                # Parçalar görev bitene kadar kuyruktan okunur; bağlantı koparsa görev kaydı tamamlar.
+                # Memory, geçmiş ve tedavi planı kayıtları akış tamamlandıktan sonra yapılır
+                task.add_done_callback(lambda _: tokens.put_nowait(None))
+                while True:
+                    chunk = await tokens.get()
+                    if chunk is None:
+                        break
+                    yield format_sse({"type": "token", "content": chunk})
+                result = await asyncio.shield(task)
+            
+            yield format_sse({"type": "done", **result})
+        
+        except Exception as e:
+            print(f"AI konsültasyon akış hatası: {e}")
+            yield format_sse({"type": "error", "detail": f"AI konsültasyon hatası: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Senkron SQLAlchemy ve SMTP kullanan uç noktalar düz def'tir; FastAPI bunları thread pool'da çalıştırır
 @router.get("/history/{patient_id}")
-async def get_patient_consultation_history(patient_id: int, current_user: dict = Depends(verify_jwt_token)):
+def get_patient_consultation_history(patient_id: int, current_user: dict = Depends(verify_jwt_token)):
     try:
         print(f"DEBUG: Hasta ID: {patient_id}, Doktor ID: {current_user['user_id']}")
         
@@ -575,52 +566,68 @@ async def get_patient_consultation_history(patient_id: int, current_user: dict =
 async def clear_patient_memory(patient_id: int, current_user: dict = Depends(verify_jwt_token)):
     """Hasta memory'sini temizler"""
     try:
-        if patient_id in patient_memories:
-            del patient_memories[patient_id]
+        if await run_in_threadpool(patient_memory_store.clear, patient_id):
             return {"message": f"Hasta {patient_id} memory'si temizlendi"}
         else:
             return {"message": f"Hasta {patient_id} için memory bulunamadı"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Memory temizleme hatası: {str(e)}")
 
+@router.get("/memory-status")
+async def get_memory_store_status(current_user: dict = Depends(verify_jwt_token)):
+    """Memory deposunun boyut, isabet/ıskalama ve atma sayaçlarını gösterir"""
+    return await run_in_threadpool(patient_memory_store.get_stats)
+
 @router.get("/memory-status/{patient_id}")
 async def get_memory_status(patient_id: int, current_user: dict = Depends(verify_jwt_token)):
     """Hasta memory durumunu gösterir"""
     try:
-        if patient_id in patient_memories:
-            memory = patient_memories[patient_id]
-            return {
-                "patient_id": patient_id,
-                "message_count": len(memory.chat_memory.messages),
-                "memory_exists": True,
-                "last_messages": [msg.content for msg in memory.chat_memory.messages[-4:]] if memory.chat_memory.messages else []
-            }
-        else:
-            return {
-                "patient_id": patient_id,
-                "message_count": 0,
-                "memory_exists": False,
-                "last_messages": []
-            }
+        messages = await run_in_threadpool(patient_memory_store.peek, patient_id)
+        store_stats = await run_in_threadpool(patient_memory_store.get_stats)
+        return {
+            "patient_id": patient_id,
+            "message_count": len(messages or []),
+            "memory_exists": messages is not None,
+            "last_messages": [msg.content for msg in (messages or [])[-4:]],
+            "store": store_stats
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Memory durumu alınamadı: {str(e)}") 
     
 
+@router.get("/model-status")
+async def get_model_status(current_user: dict = Depends(verify_jwt_token)):
+    """Paylaşılan Gemini istemcilerinin kullanım istatistiklerini gösterir"""
+    return llm_registry.get_stats()
+
+@router.get("/cache-status")
+async def get_cache_status(current_user: dict = Depends(verify_jwt_token)):
+    """Konsültasyon yanıt önbelleğinin isabet oranı ve boyut bilgisini gösterir"""
+    return {**response_cache.get_stats(), "in_flight": consultation_flights.get_stats()}
+
+@router.post("/reload-prompts")
+async def reload_prompt_templates(current_user: dict = Depends(verify_admin)):
+    """Prompt şablonlarını config/prompts.json dosyasından yeniden yükler (Sadece admin)"""
+    try:
+        specialties = await run_in_threadpool(prompt_registry.reload)
+        # Şablonlar değiştiği için eski yanıtlar geçersiz
+        response_cache.clear()
+        return {"message": "Prompt şablonları yeniden yüklendi", "specialties": specialties}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prompt şablonları yüklenemedi: {str(e)}")
+
 @router.post("/speech-to-text")
 async def speech_to_text(audio: UploadFile = File(...)):
     """Gemini modeli ile ses dosyasını metne çevirir."""
     try:
-        import google.generativeai as genai
         import base64
         
-        # Gemini API key'ini al
-        GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-        if not GEMINI_API_KEY:
+        # Gemini API key'ini kontrol et
+        if not os.getenv("GEMINI_API_KEY"):
             raise HTTPException(status_code=500, detail="GEMINI_API_KEY bulunamadı")
         
-        # Gemini'yi yapılandır
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-2.5-pro')
+        # Paylaşılan Gemini modelini al (genai.configure her istekte tekrarlanmaz)
+        model = llm_registry.get_generative_model('gemini-2.5-pro')
         
         # Ses dosyasını oku
         audio_data = await audio.read()
@@ -638,8 +645,8 @@ async def speech_to_text(audio: UploadFile = File(...)):
             mime_type = "audio/ogg"
         
         try:
-            # Gemini'ye ses dosyasını gönder
-            response = model.generate_content([
+            # Gemini'ye ses dosyasını gönder - senkron HTTP çağrısı, event loop'u bloklamaması için thread pool'da
+            response = await run_in_threadpool(model.generate_content, [
                 "Bu ses dosyasını Türkçe olarak metne çevir. Sadece çevrilen metni döndür, başka açıklama ekleme.",
                 {
                     "mime_type": mime_type,
@@ -669,26 +676,31 @@ async def speech_to_text(audio: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Ses işleme sırasında beklenmeyen bir hata oluştu: {str(e)}")
 
 @router.get("/treatment-plans/{patient_id}")
-async def get_treatment_plans(patient_id: int, current_user: dict = Depends(verify_jwt_token)):
+def get_treatment_plans(patient_id: int, current_user: dict = Depends(verify_jwt_token)):
     """Hasta için bekleyen tedavi planlarını listeler"""
     try:
         db: Session = SessionLocal()
         try:
             # Tedavi planlarını al
-            plans = db.query(TreatmentPlans, Hastalar.ad, Hastalar.soyad, Hastalar.email).join(
+            plans = db.query(TreatmentPlans, TreatmentPlanGenerations, Hastalar.ad, Hastalar.soyad, Hastalar.email).join(
                 Hastalar, TreatmentPlans.hasta_id == Hastalar.id, isouter=True
+            ).join(
+                TreatmentPlanGenerations, TreatmentPlanGenerations.plan_id == TreatmentPlans.id, isouter=True
             ).filter(
                 TreatmentPlans.hasta_id == patient_id,
                 TreatmentPlans.doktor_id == current_user["user_id"]
             ).order_by(TreatmentPlans.olusturma_tarihi.desc()).all()
             
             treatment_plans = []
-            for plan, ad, soyad, email in plans:
+            for plan, generation, ad, soyad, email in plans:
+                status, error = treatment_plan_status(plan, generation)
                 treatment_plans.append({
                     "id": plan.id,
                     "hasta_id": plan.hasta_id,
                     "doktor_id": plan.doktor_id,
-                    "tedavi_adimlari": plan.tedavi_adimlari,
+                    "status": status,
+                    "hata": error,
+                    "tedavi_adimlari": plan.tedavi_adimlari if status == "hazir" else None,
                     "meslek_dali": plan.meslek_dali,
                     "tani_bilgisi": plan.tani_bilgisi,
                     "olusturma_tarihi": plan.olusturma_tarihi.isoformat() if plan.olusturma_tarihi else None,
@@ -708,8 +720,68 @@ async def get_treatment_plans(patient_id: int, current_user: dict = Depends(veri
         print(f"Tedavi planları listeleme hatası: {e}")
         raise HTTPException(status_code=500, detail=f"Tedavi planları yüklenemedi: {str(e)}")
 
+@router.get("/treatment-plan/{plan_id}")
+def get_treatment_plan_status(plan_id: int, current_user: dict = Depends(verify_jwt_token)):
+    """Arka planda hazırlanan tedavi planının durumunu döndürür (polling için)"""
+    try:
+        db: Session = SessionLocal()
+        try:
+            plan = db.query(TreatmentPlans).filter(
+                TreatmentPlans.id == plan_id,
+                TreatmentPlans.doktor_id == current_user["user_id"]
+            ).first()
+            
+            if not plan:
+                raise HTTPException(status_code=404, detail="Tedavi planı bulunamadı")
+            
+            status, error = treatment_plan_status(plan, db.get(TreatmentPlanGenerations, plan.id))
+            return {
+                "id": plan.id,
+                "hasta_id": plan.hasta_id,
+                "status": status,
+                "hata": error,
+                "tedavi_adimlari": plan.tedavi_adimlari if status == "hazir" else None,
+                "onay_durumu": plan.onay_durumu
+            }
+        finally:
+            db.close()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Tedavi planı durum hatası: {e}")
+        raise HTTPException(status_code=500, detail=f"Tedavi planı durumu alınamadı: {str(e)}")
+
+@router.post("/treatment-plan/{plan_id}/regenerate")
+async def regenerate_treatment_plan(plan_id: int, current_user: dict = Depends(verify_jwt_token)):
+    """Oluşturulamayan veya yarıda kalan tedavi planını arka planda yeniden hazırlar"""
+    try:
+        try:
+            restarted = await run_in_threadpool(restart_treatment_plan, plan_id, current_user["user_id"])
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if restarted is None:
+            raise HTTPException(status_code=404, detail="Tedavi planı bulunamadı")
+        
+        patient = await run_in_threadpool(load_patient, restarted["hasta_id"], current_user["user_id"])
+        if patient is None:
+            await run_in_threadpool(mark_treatment_plan_failed, plan_id, "Hasta bulunamadı", restarted["attempt"])
+            raise HTTPException(status_code=404, detail="Hasta bulunamadı")
+        
+        schedule_treatment_plan(
+            plan_id, restarted["tani_bilgisi"] or "", restarted["meslek_dali"],
+            format_patient_info(patient), restarted["attempt"]
+        )
+        return {"id": plan_id, "status": "hazirlaniyor"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Tedavi planı yeniden oluşturma hatası: {e}")
+        raise HTTPException(status_code=500, detail=f"Tedavi planı yeniden oluşturulamadı: {str(e)}")
+
 @router.post("/approve-treatment/{plan_id}")
-async def approve_and_send_treatment(plan_id: int, current_user: dict = Depends(verify_jwt_token)):
+def approve_and_send_treatment(plan_id: int, current_user: dict = Depends(verify_jwt_token)):
     """Tedavi planını onaylar ve hasta mailine gönderir"""
     try:
         db: Session = SessionLocal()
@@ -736,6 +808,12 @@ async def approve_and_send_treatment(plan_id: int, current_user: dict = Depends(
             
             plan, hasta_ad, hasta_soyad, hasta_email, doktor_ad, doktor_soyad = plan_query
             
+            status, _ = treatment_plan_status(plan, db.get(TreatmentPlanGenerations, plan.id))
+            if status == "hazirlaniyor":
+                raise HTTPException(status_code=409, detail="Tedavi planı henüz hazırlanıyor")
+            if status == "basarisiz":
+                raise HTTPException(status_code=409, detail="Tedavi planı oluşturulamadı, önce yeniden oluşturun")
+            
             if not hasta_email:
                 raise HTTPException(status_code=400, detail="Hasta email adresi bulunamadı")
             
@@ -775,7 +853,7 @@ async def approve_and_send_treatment(plan_id: int, current_user: dict = Depends(
         raise HTTPException(status_code=500, detail=f"Tedavi planı onaylanamadı: {str(e)}")
 
 @router.delete("/treatment-plan/{plan_id}")
-async def reject_treatment_plan(plan_id: int, current_user: dict = Depends(verify_jwt_token)):
+def reject_treatment_plan(plan_id: int, current_user: dict = Depends(verify_jwt_token)):
     """Tedavi planını reddeder"""
     try:
         db: Session = SessionLocal()
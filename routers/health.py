@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+try:
+    from services.rag_service import rag_service
+    RAG_SERVICE_AVAILABLE = True
+except ImportError as e:
+    RAG_SERVICE_AVAILABLE = False
+    print(f"RAG service yüklenemedi: {e}")
+    rag_service = None
+
+router = APIRouter()
+
+@router.get("/ready")
+async def readiness():
+    """Yük dengeleyici için hazır olma kontrolü.
+
+    RAG_WARMUP açıksa ısınma sürerken 503 döner; ısınma kapalıysa, tamamlandıysa
+    veya başarısız olduysa (RAG olmadan hizmet verilebilir) 200 döner.
+    """
+    rag_status = rag_service.get_warmup_status() if RAG_SERVICE_AVAILABLE else {"status": "disabled"}
+    ready = rag_status["status"] not in ("pending", "warming")
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "rag": rag_status}
+    )
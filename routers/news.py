@@ -4,7 +4,9 @@ import feedparser
 import asyncio
 from datetime import datetime
 import re
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from services.single_flight import AsyncSingleFlight
 
 router = APIRouter()
 
@@ -24,9 +26,30 @@ class NewsService:
         self.cache = []
         self.last_update = None
         self.cache_duration = 3600  # 1 saat cache süresi
+        # Önbellek boşken aynı anda gelen istekler tek bir RSS taramasını paylaşır;
+        # varsayılan haberlere düşülen çekmelerden sonra feed'ler backoff süresince tekrar denenmez
+        self._fetch_flight = AsyncSingleFlight("Haber çekme", is_failure=lambda result: result[1])
     
-    async def fetch_ai_health_news(self) -> List[Dict]:
-        """AI sağlık haberlerini RSS feed'lerden çeker"""
+    async def get_ai_health_news(self) -> List[Dict]:
+        """Önbellekteki haberleri döndürür, süresi dolduysa tek bir çekme işlemiyle yeniler"""
+        if self.cache and self.last_update and (datetime.now() - self.last_update).total_seconds() < self.cache_duration:
+            return self.cache
+        news, _ = await self._fetch_flight.do(self._fetch_and_cache)
+        return news
+    
+    async def _fetch_and_cache(self) -> Tuple[List[Dict], bool]:
+        """(haberler, varsayılan haberlere düşüldü mü) döndürür.
+        Varsayılan haberler önbelleğe yazılmaz; varsa süresi dolmuş gerçek haberler gösterilmeye devam eder."""
+        news, is_fallback = await self.fetch_ai_health_news()
+        if is_fallback:
+            return (self.cache or news), True
+        self.cache = news
+        self.last_update = datetime.now()
+        return news, False
+    
+    async def fetch_ai_health_news(self) -> Tuple[List[Dict], bool]:
+        """AI sağlık haberlerini RSS feed'lerden çeker.
+        (haberler, varsayılan haber eklendi mi) döndürür; feed'ler yeterli haber vermezse True olur."""
         try:
             news_items = []
             
@@ -36,7 +59,8 @@ class NewsService:
             for feed_url in AI_HEALTH_RSS_FEEDS:
                 try:
                     print(f"📡 {feed_url} kontrol ediliyor...")
-                    feed = feedparser.parse(feed_url)
+                    # feedparser ağ isteğini senkron yapar, event loop'u bloklamaması için thread pool'da
+                    feed = await run_in_threadpool(feedparser.parse, feed_url)
                     
                     if not feed.entries:
                         print(f"❌ {feed_url} boş feed")
@@ -108,11 +132,11 @@ class NewsService:
                     }
                 ]
             
-            return result
+            return result, len(english_news) < 2
             
         except Exception as e:
             print(f"Haber çekme hatası: {e}")
-            return self._get_fallback_news()
+            return self._get_fallback_news(), True
     
     def _is_ai_health_related(self, text: str) -> bool:
         """Metnin AI sağlık ile ilgili olup olmadığını kontrol eder"""
@@ -237,7 +261,7 @@ news_service = NewsService()
 async def get_ai_health_news():
     """AI sağlık haberlerini döndürür"""
     try:
-        news = await news_service.fetch_ai_health_news()
+        news = await news_service.get_ai_health_news()
         return JSONResponse(content={
             "success": True,
             "news": news,
@@ -256,7 +280,7 @@ async def refresh_news():
         news_service.cache = []
         news_service.last_update = None
         
-        news = await news_service.fetch_ai_health_news()
+        news = await news_service.get_ai_health_news()
         print(f"✅ {len(news)} haber yenilendi")
         return JSONResponse(content={
             "success": True,
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from routers.auth import verify_jwt_token, security
 from typing import List
 from database import SessionLocal, RAGUploads, Kullanicilar
 from sqlalchemy.orm import Session
+from services.prompt_registry import prompt_registry
 
 try:
     from services.rag_service import rag_service
+    from services.ingest_jobs import ingest_job_manager
+    from services.rag_documents import rag_document_manager, IngestInProgressError
     RAG_SERVICE_AVAILABLE = True
 except ImportError as e:
     RAG_SERVICE_AVAILABLE = False
@@ -20,10 +25,18 @@ except ImportError as e:
                 pinecone_api_key = None
                 index_name = "dummy-index"
                 embedding_model_name = "dummy-model"
+                pdf_max_bytes = 0
+                vector_backend = "pinecone"
+                vector_store = None
             self.config = DummyConfig()
         def initialize(self): return False
         def process_pdf_and_upload(self, *args): return False
+        def get_cache_stats(self): return {}
     rag_service = DummyRAGService()
+    ingest_job_manager = None
+    rag_document_manager = None
+    class IngestInProgressError(RuntimeError):
+        pass
 
 router = APIRouter()
 
@@ -44,9 +57,10 @@ def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
 async def upload_pdf_to_rag(
     file: UploadFile = File(...),
     description: str = Form(None),
+    specialty: str = Form("psikoloji"),
     current_user: dict = Depends(verify_admin)
 ):
-    """PDF dosyası yükle ve RAG sistemine ekle (Sadece admin)"""
+    """PDF dosyası yükle ve seçilen uzmanlık alanının RAG bölümüne ekle (Sadece admin)"""
     
     # RAG servisinin kullanılabilir olup olmadığını kontrol et
     if not RAG_SERVICE_AVAILABLE:
@@ -55,18 +69,22 @@ async def upload_pdf_to_rag(
             detail="RAG sistemi mevcut değil. Gerekli kütüphaneleri yükleyin."
         )
     
-    # RAG servisinin başlatılıp başlatılmadığını kontrol et
-    if not rag_service.is_initialized:
-        if not rag_service.initialize():
-            raise HTTPException(
-                status_code=500, 
-                detail="RAG sistemi başlatılamadı. Pinecone ayarlarını kontrol edin."
-            )
+    # Servis başlatma (model yükleme) ve işleme arka plandaki worker'da yapılır
+    if not rag_service.config.is_rag_enabled:
+        raise HTTPException(
+            status_code=500, 
+            detail="RAG sistemi devre dışı. Vektör deposu ayarlarını kontrol edin."
+        )
     
     # Dosya türü kontrolü
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Sadece PDF dosyaları kabul edilir")
     
+    # Vektörler uzmanlık alanına ait namespace'e yazılır
+    specialty = (specialty or "").strip().lower()
+    if specialty not in prompt_registry.specialties:
+        raise HTTPException(status_code=400, detail=f"Geçersiz uzmanlık alanı: {specialty}")
+    
     try:
         # PDF içeriğini oku
         pdf_content = await file.read()
@@ -74,41 +92,50 @@ async def upload_pdf_to_rag(
         if len(pdf_content) == 0:
             raise HTTPException(status_code=400, detail="Dosya boş")
         
-        # PDF'i işle ve Pinecone'a yükle
-        success = rag_service.process_pdf_and_upload(pdf_content, file.filename)
-        
-        if not success:
-            raise HTTPException(status_code=500, detail="PDF işleme ve yükleme başarısız")
+        # Aşırı büyük dosyalar kuyruğa alınmadan reddedilir (RAG_PDF_MAX_BYTES)
+        if rag_service.config.pdf_max_bytes and len(pdf_content) > rag_service.config.pdf_max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF boyutu sınırı aşıyor (en fazla {rag_service.config.pdf_max_bytes / 1_000_000:.1f} MB)"
+            )
         
-        # İsteğe bağlı: Yükleme geçmişini kaydet
-        try:
-            db: Session = SessionLocal()
-            try:
-                # Yüklemeyi kaydet
-                new_upload = RAGUploads(
-                    filename=file.filename,
-                    description=description,
-                    uploaded_by=current_user["user_id"],
-                    specialty="psikoloji"
-                )
-                db.add(new_upload)
-                db.commit()
-            finally:
-                db.close()
-            
-        except Exception as db_error:
-            print(f"Veritabanı kayıt hatası: {db_error}")
-            # Veritabanı hatası olsa bile PDF yüklenmişse başarılı say
+        # PDF işleme, embedding ve yükleme kuyruğa alınır; istek hemen döner
+        job = await run_in_threadpool(
+            ingest_job_manager.submit,
+            pdf_content,
+            file.filename,
+            description,
+            specialty,
+            current_user["user_id"]
+        )
         
-        return {
-            "message": f"'{file.filename}' dosyası başarıyla RAG sistemine eklendi",
+        return JSONResponse(status_code=202, content={
+            "message": f"'{file.filename}' dosyası işleme alındı",
             "filename": file.filename,
-            "description": description
-        }
+            "description": description,
+            "specialty": specialty,
+            "job_id": job["job_id"],
+            "status": job["status"]
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF yükleme hatası: {str(e)}")
 
+@router.get("/jobs/{job_id}")
+async def get_ingest_job(job_id: int, current_user: dict = Depends(verify_admin)):
+    """PDF yükleme işinin durumunu ve ilerlemesini getir (Sadece admin)"""
+    
+    if not RAG_SERVICE_AVAILABLE:
+        raise HTTPException(status_code=404, detail="Yükleme işi bulunamadı")
+    
+    job = await run_in_threadpool(ingest_job_manager.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Yükleme işi bulunamadı")
+    
+    return job
+
 @router.get("/upload-history")
 async def get_upload_history(current_user: dict = Depends(verify_admin)):
     """RAG sistemi yükleme geçmişini getir (Sadece admin)"""
@@ -148,43 +175,84 @@ async def get_upload_history(current_user: dict = Depends(verify_admin)):
 
 @router.delete("/delete-document/{upload_id}")
 async def delete_document(upload_id: int, current_user: dict = Depends(verify_admin)):
-    """RAG sisteminden döküman sil (Sadece admin)"""
+    """RAG sisteminden dökümanı ve vektörlerini sil (Sadece admin)"""
     
     try:
-        db: Session = SessionLocal()
-        try:
-            # Döküman bilgilerini al
-            upload = db.query(RAGUploads).filter(RAGUploads.id == upload_id).first()
-            
-            if not upload:
-                raise HTTPException(status_code=404, detail="Döküman bulunamadı")
-            
-            filename = upload.filename
-            
-            # Veritabanından sil
-            db.delete(upload)
-            db.commit()
-            
-            # Not: Pinecone'dan silme işlemi daha karmaşık olduğu için şimdilik sadece DB'den siliyoruz
-            # Gelecekte filename bazlı Pinecone vector silme özelliği eklenebilir
-            
-            return {"message": f"'{filename}' dökümanı başarıyla silindi"}
-        finally:
-            db.close()
+        if rag_document_manager is None:
+            # RAG kütüphaneleri yoksa yalnızca kayıt silinir
+            db: Session = SessionLocal()
+            try:
+                upload = db.query(RAGUploads).filter(RAGUploads.id == upload_id).first()
+                if not upload:
+                    raise HTTPException(status_code=404, detail="Döküman bulunamadı")
+                filename = upload.filename
+                db.delete(upload)
+                db.commit()
+                return {"message": f"'{filename}' dökümanı başarıyla silindi", "deleted_vectors": 0}
+            finally:
+                db.close()
         
+        # Vektör silme ağ/disk işlemi olduğu için thread pool'da çalışır
+        result = await run_in_threadpool(rag_document_manager.delete, upload_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Döküman bulunamadı")
+        
+        return {
+            "message": f"'{result['filename']}' dökümanı başarıyla silindi",
+            "deleted_vectors": result["deleted_vectors"],
+            "tracked_vectors": result["tracked_vectors"]
+        }
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Döküman silme hatası: {str(e)}")
 
+@router.post("/reconcile")
+async def reconcile_vectors(apply: bool = False, current_user: dict = Depends(verify_admin)):
+    """Vektör deposunu yükleme kayıtlarıyla uzlaştır; apply=true ise yetim vektörleri sil (Sadece admin)"""
+    
+    if rag_document_manager is None or not rag_service.config.is_rag_enabled:
+        raise HTTPException(status_code=500, detail="RAG sistemi mevcut değil veya devre dışı")
+    
+    try:
+        return await run_in_threadpool(rag_document_manager.reconcile, apply)
+    except IngestInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Uzlaştırma hatası: {str(e)}")
+
 @router.get("/rag-status")
 async def get_rag_status(current_user: dict = Depends(verify_admin)):
     """RAG sistemi durumunu kontrol et (Sadece admin)"""
     
+    vector_store = rag_service.config.vector_store
+    
+    # Harici embedding servisi kullanılıyorsa toplama istatistikleri servisten alınır
+    embedding_service = None
+    embedding_model = getattr(rag_service.config, "embedding_model", None)
+    if rag_service.is_initialized and getattr(rag_service.config, "embedding_service_address", None):
+        try:
+            embedding_service = await run_in_threadpool(embedding_model.get_stats)
+        except Exception as e:
+            embedding_service = {"error": str(e)}
+    
     status = {
         "is_initialized": rag_service.is_initialized,
         "is_enabled": rag_service.config.is_rag_enabled,
         "pinecone_configured": bool(rag_service.config.pinecone_api_key),
         "index_name": rag_service.config.index_name,
-        "embedding_model": rag_service.config.embedding_model_name
+        "embedding_model": rag_service.config.embedding_model_name,
+        "embedding_runtime": rag_service.config.embedding_runtime_info.get_stats() if getattr(rag_service.config, "embedding_runtime_info", None) else None,
+        "embedding_service": embedding_service,
+        "vector_backend": rag_service.config.vector_backend,
+        "vector_store": vector_store.get_stats() if vector_store else None,
+        # Sağlık kontrolü ağ isteği yaptığı için thread pool'da; bozuk bağlantı burada yenilenir
+        "vector_store_healthy": await run_in_threadpool(vector_store.health_check) if vector_store else None,
+        "caches": rag_service.get_cache_stats(),
+        "context_packing": rag_service.context_packer.get_stats() if hasattr(rag_service, "context_packer") else None
     }
     
     return status
\ No newline at end of file
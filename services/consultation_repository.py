@@ -0,0 +1,230 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from database import SessionLocal, Hastalar, ConsultationHistory, TreatmentPlans, TreatmentPlanGenerations
+
+# Bu süreyi aşan hazırlık yarıda kalmış sayılır (ör. görev sırasında sunucu yeniden başladı)
+TREATMENT_PLAN_TIMEOUT_SECONDS = float(os.getenv("TREATMENT_PLAN_TIMEOUT_SECONDS", "300"))
+# Önceki sürüm LLM hatasında bu metni tedavi adımı olarak kaydediyordu
+LEGACY_TREATMENT_FALLBACK = "Tedavi adımları oluşturulamadı. Lütfen tekrar deneyiniz."
+
+
+def load_patient(hasta_id: int, doktor_id: int) -> Optional[dict]:
+    """Hastayı ve doktorun bu hastaya erişim yetkisini tek sorguda getirir.
+
+    Hasta bu doktora ait değilse None döner. Senkron çalışır, async kodda
+    thread pool'da çağrılmalıdır.
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(
+            Hastalar.id, Hastalar.ad, Hastalar.soyad, Hastalar.dogum_tarihi, Hastalar.email
+        ).filter(
+            Hastalar.id == hasta_id,
+            Hastalar.doktor_id == doktor_id
+        ).first()
+    finally:
+        db.close()
+
+    if row is None:
+        return None
+
+    return {
+        "id": row.id,
+        "ad": row.ad,
+        "soyad": row.soyad,
+        "dogum_tarihi": row.dogum_tarihi,
+        "email": row.email
+    }
+
+
+def format_patient_info(patient: dict) -> str:
+    """Prompt'a eklenecek hasta özeti"""
+    return f"Hasta: {patient['ad']} {patient['soyad']}, Doğum Tarihi: {patient['dogum_tarihi'] or 'Belirtilmemiş'}, Email: {patient['email'] or 'Belirtilmemiş'}"
+
+
+def save_consultation(hasta_id: int, doktor_id: int, meslek_dali: str, soru: str, ai_response: str,
+                      treatment_steps: str = None) -> Optional[int]:
+    """Hasta güncellemesi, konsültasyon geçmişi ve tedavi planını tek kısa işlemde yazar.
+
+    Hasta satırı tekrar okunmadan UPDATE ile güncellenir. Oluşturulan tedavi
+    planının id'sini döndürür, hata olursa işlem geri alınır ve None döner.
+    """
+    db = SessionLocal()
+    try:
+        # Hasta tablosunu güncelle - son_guncelleme onupdate ile otomatik güncellenir
+        db.query(Hastalar).filter(
+            Hastalar.id == hasta_id,
+            Hastalar.doktor_id == doktor_id
+        ).update(
+            {Hastalar.tani_bilgileri: soru, Hastalar.ai_onerileri: ai_response},
+            synchronize_session=False
+        )
+
+        # Konsültasyon geçmişini kaydet
+        db.add(ConsultationHistory(
+            hasta_id=hasta_id,
+            doktor_id=doktor_id,
+            meslek_dali=meslek_dali,
+            soru=soru,
+            cevap=ai_response
+        ))
+
+        # Tedavi planı kaydı - önbellekte yoksa tedavi adımları arka planda doldurulacak
+        treatment_plan = TreatmentPlans(
+            hasta_id=hasta_id,
+            doktor_id=doktor_id,
+            meslek_dali=meslek_dali,
+            tani_bilgisi=ai_response,
+            tedavi_adimlari=treatment_steps
+        )
+        db.add(treatment_plan)
+
+        db.flush()
+        plan_id = treatment_plan.id
+        if not treatment_steps:
+            db.add(TreatmentPlanGenerations(plan_id=plan_id))
+        db.commit()
+        return plan_id
+    except Exception as e:
+        db.rollback()
+        print(f"Veritabanı kaydetme hatası: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def update_treatment_plan_steps(plan_id: int, treatment_steps: str, attempt: int = 1):
+    """Arka planda üretilen tedavi adımlarını plana yazar (plan bu arada yeniden başlatıldıysa yazmaz)"""
+    db = SessionLocal()
+    try:
+        updated = db.query(TreatmentPlanGenerations).filter(
+            TreatmentPlanGenerations.plan_id == plan_id,
+            TreatmentPlanGenerations.attempt == attempt
+        ).update(
+            {
+                TreatmentPlanGenerations.status: "hazir",
+                TreatmentPlanGenerations.error: None,
+                TreatmentPlanGenerations.finished_at: datetime.now()
+            },
+            synchronize_session=False
+        )
+        if not updated:
+            print(f"Tedavi planı {plan_id} yeniden başlatılmış, {attempt}. denemenin sonucu yazılmadı")
+            db.rollback()
+            return
+        db.query(TreatmentPlans).filter(TreatmentPlans.id == plan_id).update(
+            {TreatmentPlans.tedavi_adimlari: treatment_steps},
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Tedavi planı güncelleme hatası: {e}")
+    finally:
+        db.close()
+
+
+def mark_treatment_plan_failed(plan_id: int, error: str, attempt: int = 1):
+    """Tedavi adımları üretilemediğinde hatayı kaydeder; tedavi_adimlari boş kalır"""
+    db = SessionLocal()
+    try:
+        db.query(TreatmentPlanGenerations).filter(
+            TreatmentPlanGenerations.plan_id == plan_id,
+            TreatmentPlanGenerations.attempt == attempt
+        ).update(
+            {
+                TreatmentPlanGenerations.status: "basarisiz",
+                TreatmentPlanGenerations.error: error,
+                TreatmentPlanGenerations.finished_at: datetime.now()
+            },
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Tedavi planı durum güncelleme hatası: {e}")
+    finally:
+        db.close()
+
+
+def treatment_plan_status(plan: TreatmentPlans, generation: Optional[TreatmentPlanGenerations]) -> Tuple[str, Optional[str]]:
+    """Planın hazırlık durumu ve varsa hata mesajı: hazir, hazirlaniyor veya basarisiz"""
+    if plan.tedavi_adimlari == LEGACY_TREATMENT_FALLBACK:
+        return "basarisiz", "Tedavi adımları oluşturulamadı"
+    if plan.tedavi_adimlari:
+        return "hazir", None
+    if generation is None:
+        # Durum kaydı olmadan boş kalmış eski plan; hazırlayan görev artık yok
+        return "basarisiz", "Tedavi adımları oluşturulamadı"
+    if generation.status == "basarisiz":
+        return "basarisiz", generation.error
+    if generation.started_at and datetime.now() - generation.started_at > timedelta(seconds=TREATMENT_PLAN_TIMEOUT_SECONDS):
+        return "basarisiz", "Tedavi planı hazırlığı yarıda kaldı"
+    return "hazirlaniyor", None
+
+
+def restart_treatment_plan(plan_id: int, doktor_id: int) -> Optional[dict]:
+    """Başarısız tedavi planını yeniden hazırlanmak üzere sıfırlar.
+
+    Plan yoksa None döner; hâlâ hazırlanıyorsa, hazırsa veya onaylanıp
+    reddedildiyse ValueError fırlatır. Yeni denemenin numarasını döndürür.
+    """
+    db = SessionLocal()
+    try:
+        plan = db.query(TreatmentPlans).filter(
+            TreatmentPlans.id == plan_id,
+            TreatmentPlans.doktor_id == doktor_id
+        ).first()
+        if plan is None:
+            return None
+        if plan.onay_durumu != "beklemede":
+            raise ValueError("Onaylanmış veya reddedilmiş plan yeniden oluşturulamaz")
+
+        generation = db.get(TreatmentPlanGenerations, plan_id)
+        status, _ = treatment_plan_status(plan, generation)
+        if status != "basarisiz":
+            raise ValueError("Tedavi planı hazır" if status == "hazir" else "Tedavi planı zaten hazırlanıyor")
+
+        if generation is None:
+            generation = TreatmentPlanGenerations(plan_id=plan_id, attempt=0)
+            db.add(generation)
+        generation.attempt = (generation.attempt or 0) + 1
+        generation.status = "hazirlaniyor"
+        generation.error = None
+        generation.started_at = datetime.now()
+        generation.finished_at = None
+        plan.tedavi_adimlari = None
+        db.commit()
+        return {
+            "hasta_id": plan.hasta_id,
+            "meslek_dali": plan.meslek_dali,
+            "tani_bilgisi": plan.tani_bilgisi,
+            "attempt": generation.attempt
+        }
+    except ValueError:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def get_treatment_plan_state(plan_id: int, doktor_id: int) -> Optional[dict]:
+    """Planın hazırlık durumu ve (hazırsa) tedavi adımları; plan bu doktora ait değilse None"""
+    db = SessionLocal()
+    try:
+        plan = db.query(TreatmentPlans).filter(
+            TreatmentPlans.id == plan_id,
+            TreatmentPlans.doktor_id == doktor_id
+        ).first()
+        if plan is None:
+            return None
+        status, error = treatment_plan_status(plan, db.get(TreatmentPlanGenerations, plan_id))
+        return {
+            "status": status,
+            "error": error,
+            "tedavi_adimlari": plan.tedavi_adimlari if status == "hazir" else None
+        }
+    finally:
+        db.close()
@@ -0,0 +1,197 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+# Gemini tokenizer'ı çevrimdışı kullanılamadığı için karakter sayısından tahmin edilir;
+# Türkçe metinlerde bir token ortalama 3-4 karaktere denk gelir
+DEFAULT_CHARS_PER_TOKEN = 3.5
+SHINGLE_SIZE = 5
+# Bütçede bundan az yer kaldıysa yeni parça kırpılarak eklenmez
+MIN_PASSAGE_TOKENS = 40
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def estimate_tokens(text: str, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN) -> int:
+    if not text:
+        return 0
+    return max(int(len(text) / chars_per_token + 0.5), 1)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def _shingles(words: List[str]) -> Set[tuple]:
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+@dataclass
+class PackedPassage:
+    text: str
+    score: float
+    tokens: int
+    truncated: bool = False
+    source: Optional[str] = None
+
+
+@dataclass
+class PackedContext:
+    passages: List[PackedPassage] = field(default_factory=list)
+    duplicates_dropped: int = 0
+    over_budget_dropped: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return sum(passage.tokens for passage in self.passages)
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(passage.text for passage in self.passages)
+
+
+class ContextPacker:
+    """Vektör araması sonuçlarını token bütçesine sığan bir RAG bağlamına dönüştürür.
+
+    Sonuçlar skora göre sıralanır; daha yüksek skorlu bir parçayla büyük ölçüde
+    örtüşen parçalar (5 kelimelik shingle'ların kesişimi / küçük kümenin boyutu)
+    atlanır. Bütçeyi aşan parçalar, sorgu kelimelerini en çok içeren cümle
+    çevresinden kırpılarak eklenir; bu, tek vektörde saklanmış eski tam-PDF
+    kayıtlarının prompt'u şişirmesini önler. Kırpılan parça kalan bütçenin
+    tamamını değil en fazla max_passage_tokens kadarını alır (varsayılan:
+    bütçe / max_passages), böylece sonraki parçalara da yer kalır.
+    """
+
+    def __init__(self, token_budget: int, max_passages: int = 5, dedupe_threshold: float = 0.8,
+                 chars_per_token: float = DEFAULT_CHARS_PER_TOKEN, max_passage_tokens: int = 0):
+        self.token_budget = token_budget
+        self.max_passages = max_passages
+        self.max_passage_tokens = max(
+            max_passage_tokens or token_budget // max(max_passages, 1),
+            MIN_PASSAGE_TOKENS
+        )
+        self.dedupe_threshold = dedupe_threshold
+        self.chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+        self._stats = {
+            "queries": 0,
+            "tokens_injected": 0,
+            "passages_injected": 0,
+            "duplicates_dropped": 0,
+            "passages_truncated": 0,
+            "over_budget_dropped": 0
+        }
+
+    def _is_duplicate(self, shingles: Set[tuple], accepted: List[Set[tuple]]) -> bool:
+        if not shingles:
+            return True
+        for other in accepted:
+            overlap = len(shingles & other) / max(min(len(shingles), len(other)), 1)
+            if overlap >= self.dedupe_threshold:
+                return True
+        return False
+
+    def _best_window(self, text: str, query_words: Set[str], max_chars: int) -> str:
+        """Metnin sorguyla en ilgili cümlesinden başlayıp komşu cümlelerle max_chars'a kadar genişleyen kesit"""
+        sentences = [sentence for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+        if not sentences:
+            return text[:max_chars]
+
+        scores = [len(query_words.intersection(_words(sentence))) for sentence in sentences]
+        center = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+        start = end = center
+        length = len(sentences[center])
+        # Önce sonraki cümleler, sonra öncekiler eklenir; okuma akışı korunur
+        while True:
+            if end + 1 < len(sentences) and length + 1 + len(sentences[end + 1]) <= max_chars:
+                end += 1
+                length += 1 + len(sentences[end])
+            elif start > 0 and length + 1 + len(sentences[start - 1]) <= max_chars:
+                start -= 1
+                length += 1 + len(sentences[start])
+            else:
+                break
+
+        joined = " ".join(sentence.strip() for sentence in sentences[start:end + 1])
+        clipped = len(joined) > max_chars
+        window = joined[:max_chars].rsplit(" ", 1)[0] if clipped else joined
+        prefix = "… " if start > 0 else ""
+        suffix = " …" if clipped or end < len(sentences) - 1 else ""
+        return f"{prefix}{window}{suffix}"
+
+    def pack(self, matches, query: str = "", header: str = "İlgili Bilgi (Benzerlik: {score:.2f}): ") -> PackedContext:
+        """matches: score ve metadata['text'] içeren VectorMatch listesi"""
+        packed = PackedContext()
+        accepted_shingles: List[Set[tuple]] = []
+        query_words = {word for word in _words(query) if len(word) >= 3}
+        remaining = self.token_budget
+
+        ranked = sorted(
+            (match for match in matches if match.metadata and match.metadata.get("text")),
+            key=lambda match: match.score,
+            reverse=True
+        )
+        for match in ranked:
+            if len(packed.passages) >= self.max_passages:
+                break
+
+            text = match.metadata["text"].strip()
+            shingles = _shingles(_words(text))
+            if self._is_duplicate(shingles, accepted_shingles):
+                packed.duplicates_dropped += 1
+                continue
+
+            prefix = header.format(score=match.score)
+            tokens = estimate_tokens(prefix + text, self.chars_per_token)
+            truncated = False
+            if tokens > remaining:
+                if remaining < MIN_PASSAGE_TOKENS:
+                    packed.over_budget_dropped += 1
+                    continue
+                limit = min(remaining, self.max_passage_tokens)
+                # Kırpma işaretleri ("… ") için birkaç karakter payı bırakılır
+                max_chars = int((limit - estimate_tokens(prefix, self.chars_per_token)) * self.chars_per_token) - 4
+                text = self._best_window(text, query_words, max_chars)
+                tokens = estimate_tokens(prefix + text, self.chars_per_token)
+                truncated = True
+
+            accepted_shingles.append(shingles)
+            packed.passages.append(PackedPassage(
+                text=prefix + text,
+                score=match.score,
+                tokens=tokens,
+                truncated=truncated,
+                source=match.metadata.get("filename")
+            ))
+            remaining -= tokens
+
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["tokens_injected"] += packed.tokens
+            self._stats["passages_injected"] += len(packed.passages)
+            self._stats["duplicates_dropped"] += packed.duplicates_dropped
+            self._stats["passages_truncated"] += sum(1 for passage in packed.passages if passage.truncated)
+            self._stats["over_budget_dropped"] += packed.over_budget_dropped
+        return packed
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["token_budget"] = self.token_budget
+        stats["max_passage_tokens"] = self.max_passage_tokens
+        stats["avg_tokens_per_query"] = round(stats["tokens_injected"] / stats["queries"], 1) if stats["queries"] else 0.0
+        return stats
+
+
+def create_context_packer(config) -> ContextPacker:
+    return ContextPacker(
+        token_budget=config.context_token_budget,
+        max_passages=config.context_max_passages,
+        dedupe_threshold=config.context_dedupe_threshold,
+        chars_per_token=config.context_chars_per_token,
+        max_passage_tokens=config.context_max_passage_tokens
+    )
@@ -0,0 +1,239 @@
+import os
+import re
+import time
+from typing import List, Optional, Union
+
+import numpy as np
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+RUNTIMES = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Optimize edilmiş modelin referans fp32 modelle karşılaştırıldığı örnek metinler
+PARITY_SENTENCES = [
+    "Hasta iki haftadır uykusuzluk ve sürekli endişe hissinden yakınıyor.",
+    "Şiddetli baş ağrısı, bulantı ve ışığa hassasiyet şikayetleri var.",
+    "Panik atak sırasında çarpıntı, nefes darlığı ve ölüm korkusu yaşanabilir.",
+    "Bilişsel davranışçı terapi depresyon tedavisinde etkili bir yöntemdir.",
+    "Çocukta üç gündür süren ateş ve öksürük mevcut.",
+    "Açıklama: Klinik rehber özeti\n\nTedaviye yanıt dört ila altı hafta sonra değerlendirilmelidir."
+]
+
+
+def _cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a_norm = np.linalg.norm(a, axis=1)
+    b_norm = np.linalg.norm(b, axis=1)
+    denom = np.maximum(a_norm * b_norm, 1e-12)
+    return np.sum(a * b, axis=1) / denom
+
+
+class OnnxEmbeddingModel:
+    """SentenceTransformer modelinin ONNX Runtime ile çalışan karşılığı.
+
+    Transformer katmanı ONNX'e aktarılır; tokenizer, mean pooling ve (varsa)
+    normalizasyon Python tarafında yapılır. encode() SentenceTransformer ile
+    aynı imzaya ve dönüş biçimine sahiptir.
+    """
+
+    def __init__(self, model_path: str, tokenizer, max_seq_length: int, normalize: bool, threads: int = 0):
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [item.name for item in self.session.get_inputs()]
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.normalize = normalize
+        self.model_path = model_path
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        inputs = {name: features[name].astype(np.int64) for name in self.input_names if name in features}
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        mask = features["attention_mask"][..., np.newaxis].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings.astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Benzer uzunluktaki metinler aynı gruba düşer, padding azalır (SentenceTransformer ile aynı)
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        batch_size = max(batch_size, 1)
+        parts = [
+            self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+            for start in range(0, len(order), batch_size)
+        ]
+        embeddings = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.vstack(parts)
+        return embeddings[0] if single else embeddings
+
+
+class EmbeddingRuntime:
+    """Embedding modelini RAG_EMBEDDING_RUNTIME ayarına göre hazırlar.
+
+    torch: referans fp32 model. torch-int8: Linear katmanlarına dinamik int8
+    quantization. onnx / onnx-int8: ONNX Runtime (dışa aktarılan model diskte
+    saklanır, sonraki başlatmalarda tekrar kullanılır). Optimize edilmiş model
+    örnek metinlerde referans modelle karşılaştırılır; en düşük kosinüs
+    benzerliği eşiğin altındaysa fp32 modele geri dönülür.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.requested = config.embedding_runtime
+        self.active = "torch"
+        self.parity_min_cosine: Optional[float] = None
+        self.fallback_reason: Optional[str] = None
+        self.prepare_seconds: Optional[float] = None
+
+    def _configure_threads(self):
+        if self.config.embedding_threads > 0:
+            import torch
+            torch.set_num_threads(self.config.embedding_threads)
+
+    def _onnx_dir(self) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", self.config.embedding_model_name)
+        return os.path.join(self.config.embedding_runtime_path, safe_name)
+
+    def _export_onnx(self, reference) -> str:
+        """Transformer katmanını ONNX'e aktarır (varsa diskteki dosyayı kullanır)"""
+        import torch
+
+        model_path = os.path.join(self._onnx_dir(), "model.onnx")
+        if os.path.exists(model_path):
+            return model_path
+
+        os.makedirs(self._onnx_dir(), exist_ok=True)
+        transformer = reference[0].auto_model
+        sample = reference.tokenizer(["örnek cümle"], padding=True, return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+        tmp_path = model_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, model_path)
+        print(f"Embedding modeli ONNX'e aktarıldı: {model_path}")
+        return model_path
+
+    def _quantize_onnx(self, model_path: str) -> str:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(self._onnx_dir(), "model.int8.onnx")
+        if not os.path.exists(quantized_path):
+            tmp_path = quantized_path + ".tmp"
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+            print(f"ONNX modeli int8'e çevrildi: {quantized_path}")
+        return quantized_path
+
+    def _build_onnx(self, reference, quantized: bool) -> OnnxEmbeddingModel:
+        if not ONNXRUNTIME_AVAILABLE:
+            raise RuntimeError("onnxruntime kütüphanesi bulunamadı")
+
+        from sentence_transformers.models import Normalize
+
+        pooling = reference[1].get_config_dict()
+        if not pooling.get("pooling_mode_mean_tokens") or sum(
+            bool(value) for key, value in pooling.items() if key.startswith("pooling_mode_")
+        ) != 1:
+            raise RuntimeError("ONNX yolu yalnızca mean pooling kullanan modelleri destekler")
+
+        model_path = self._export_onnx(reference)
+        if quantized:
+            model_path = self._quantize_onnx(model_path)
+
+        return OnnxEmbeddingModel(
+            model_path,
+            reference.tokenizer,
+            max_seq_length=reference.max_seq_length,
+            normalize=any(isinstance(module, Normalize) for module in reference),
+            threads=self.config.embedding_threads
+        )
+
+    def _build(self, reference):
+        if self.requested == "torch-int8":
+            import torch
+            return torch.quantization.quantize_dynamic(reference, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.requested in ("onnx", "onnx-int8"):
+            return self._build_onnx(reference, quantized=self.requested == "onnx-int8")
+        raise ValueError(f"Bilinmeyen embedding runtime: {self.requested} (seçenekler: {', '.join(RUNTIMES)})")
+
+    def check_parity(self, reference, candidate) -> float:
+        """Örnek metinlerde referans ve aday embedding'ler arasındaki en düşük kosinüs benzerliği"""
+        expected = np.asarray(reference.encode(PARITY_SENTENCES, show_progress_bar=False), dtype=np.float32)
+        actual = np.asarray(candidate.encode(PARITY_SENTENCES, show_progress_bar=False), dtype=np.float32)
+        if expected.shape != actual.shape:
+            return 0.0
+        return float(_cosine_rows(expected, actual).min())
+
+    def prepare(self, reference):
+        """Referans SentenceTransformer modelinden kullanılacak embedding modelini döndürür"""
+        started = time.perf_counter()
+        self._configure_threads()
+        if self.config.embedding_max_seq_length > 0:
+            reference.max_seq_length = self.config.embedding_max_seq_length
+
+        model = reference
+        if self.requested != "torch":
+            try:
+                candidate = self._build(reference)
+                self.parity_min_cosine = self.check_parity(reference, candidate)
+                if self.parity_min_cosine >= self.config.embedding_parity_min_cosine:
+                    model = candidate
+                    self.active = self.requested
+                else:
+                    self.fallback_reason = (
+                        f"parite kontrolü başarısız: kosinüs {self.parity_min_cosine:.4f} < "
+                        f"{self.config.embedding_parity_min_cosine}"
+                    )
+            except Exception as e:
+                self.fallback_reason = str(e)
+
+            if self.fallback_reason:
+                print(f"Embedding runtime '{self.requested}' kullanılamadı, fp32 modele dönülüyor: {self.fallback_reason}")
+
+        self.prepare_seconds = time.perf_counter() - started
+        print(f"Embedding runtime: {self.active} (max_seq_length={reference.max_seq_length}, "
+              f"threads={self.config.embedding_threads or 'varsayılan'})")
+        return model
+
+    def get_stats(self) -> dict:
+        return {
+            "requested": self.requested,
+            "active": self.active,
+            "threads": self.config.embedding_threads or None,
+            "max_seq_length": self.config.embedding_max_seq_length or None,
+            "parity_min_cosine": round(self.parity_min_cosine, 5) if self.parity_min_cosine is not None else None,
+            "fallback_reason": self.fallback_reason,
+            "prepare_seconds": round(self.prepare_seconds, 2) if self.prepare_seconds is not None else None
+        }
@@ -0,0 +1,249 @@
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+DEFAULT_PORT = 6010
+
+
+def parse_address(address: str) -> Tuple[Union[str, tuple], str]:
+    """"host:port" -> ((host, port), "AF_INET"); dosya yolu -> (yol, "AF_UNIX")"""
+    if "/" in address:
+        return address, "AF_UNIX"
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port or DEFAULT_PORT)), "AF_INET"
+
+
+def service_authkey() -> bytes:
+    """IPC bağlantılarının kimlik doğrulama anahtarı (mesajlar pickle ile taşındığı için zorunludur)"""
+    key = os.getenv("RAG_EMBEDDING_SERVICE_AUTHKEY") or os.getenv("JWT_SECRET")
+    if not key:
+        raise RuntimeError("RAG_EMBEDDING_SERVICE_AUTHKEY (veya JWT_SECRET) tanımlı değil")
+    return key.encode("utf-8")
+
+
+class _PendingRequest:
+    __slots__ = ("texts", "batch_size", "event", "result", "error")
+
+    def __init__(self, texts: List[str], batch_size: int):
+        self.texts = texts
+        self.batch_size = batch_size
+        self.event = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[str] = None
+
+
+class EmbeddingServer:
+    """Embedding modelini tek süreçte tutan ve eşzamanlı istekleri birleştiren IPC sunucusu.
+
+    Her bağlantı kendi thread'inde okunur; gelen encode istekleri tek bir
+    kuyruğa düşer. Model thread'i ilk isteği aldıktan sonra max_wait süresince
+    gelen diğer istekleri max_batch_size metne kadar toplar ve hepsini tek
+    encode çağrısıyla işler. Böylece tüm uvicorn worker'ları tek model
+    kopyasını paylaşır ve eşzamanlı sorgular ortak forward pass'lerde işlenir.
+    """
+
+    def __init__(self, address: str, model, max_batch_size: int = 64, max_wait: float = 0.005):
+        self.address, self.family = parse_address(address)
+        self.model = model
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.started_at = time.time()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        first = self._queue.get()
+        batch = [first]
+        total = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while total < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            total += len(pending.texts)
+        return batch
+
+    def _model_loop(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for pending in batch for text in pending.texts]
+            started = time.perf_counter()
+            try:
+                embeddings = np.asarray(self.model.encode(
+                    texts,
+                    batch_size=max(pending.batch_size for pending in batch),
+                    show_progress_bar=False
+                ), dtype=np.float32)
+                offset = 0
+                for pending in batch:
+                    pending.result = embeddings[offset:offset + len(pending.texts)]
+                    offset += len(pending.texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = str(e)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += len(texts)
+                self.encode_seconds += time.perf_counter() - started
+            for pending in batch:
+                pending.event.set()
+
+    def _serve_connection(self, conn):
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                command = message[0]
+                if command == "encode":
+                    _, texts, batch_size = message
+                    pending = _PendingRequest(list(texts), batch_size)
+                    self._queue.put(pending)
+                    pending.event.wait()
+                    conn.send(("error", pending.error) if pending.error else ("ok", pending.result))
+                elif command == "stats":
+                    conn.send(("ok", self.get_stats()))
+                else:
+                    conn.send(("error", f"Bilinmeyen komut: {command}"))
+        finally:
+            conn.close()
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "avg_texts_per_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+                "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "encode_seconds": round(self.encode_seconds, 3),
+                "queued": self._queue.qsize()
+            }
+
+    def serve_forever(self):
+        if self.family == "AF_UNIX" and os.path.exists(self.address):
+            os.remove(self.address)
+
+        threading.Thread(target=self._model_loop, name="embedding-model", daemon=True).start()
+        # Tüm worker'lar aynı anda bağlanabilir; varsayılan backlog (1) bağlantıları saniyelerce bekletir
+        with Listener(self.address, family=self.family, backlog=64, authkey=service_authkey()) as listener:
+            print(f"Embedding servisi dinliyor: {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Yanlış anahtarla gelen bağlantılar burada reddedilir
+                    print(f"Embedding servisi bağlantı hatası: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), name="embedding-conn", daemon=True).start()
+
+
+class RemoteEmbeddingModel:
+    """Embedding servisine bağlanan, SentenceTransformer.encode ile aynı arayüzü sunan istemci.
+
+    Bağlantılar thread'ler arasında paylaşılmaz; boşta kalanlar bir havuzda
+    tutulup tekrar kullanılır. Bağlantı koparsa yeni bağlantıyla bir kez
+    tekrar denenir. Yanıt timeout saniye içinde gelmezse bağlantı kapatılır
+    (geç gelen yanıt sonraki isteğe karışmasın diye havuza dönmez) ve hata
+    fırlatılır; servis takılırsa API thread'leri süresiz beklemez.
+    """
+
+    def __init__(self, address: str, pool_size: int = 8, timeout: float = 30.0):
+        self.address_text = address
+        self.address, self.family = parse_address(address)
+        self.authkey = service_authkey()
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=max(pool_size, 1))
+
+    def _connect(self):
+        return Client(self.address, family=self.family, authkey=self.authkey)
+
+    def _request(self, message):
+        for attempt in range(2):
+            try:
+                # Havuzdaki bağlantı kopmuş olabilir; ikinci denemede her zaman yeni bağlantı açılır
+                conn = self._idle.get_nowait() if attempt == 0 else self._connect()
+            except queue.Empty:
+                conn = None
+            except OSError as e:
+                raise RuntimeError(f"Embedding servisine ulaşılamadı ({self.address_text}): {e}")
+
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.send(message)
+                if self.timeout and not conn.poll(self.timeout):
+                    conn.close()
+                    raise RuntimeError(f"Embedding servisi {self.timeout:g} saniyede yanıt vermedi ({self.address_text})")
+                status, payload = conn.recv()
+            except (EOFError, OSError) as e:
+                if conn is not None:
+                    conn.close()
+                if attempt == 1:
+                    raise RuntimeError(f"Embedding servisine ulaşılamadı ({self.address_text}): {e}")
+                continue
+
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+            if status != "ok":
+                raise RuntimeError(f"Embedding servisi hatası: {payload}")
+            return payload
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = self._request(("encode", texts, batch_size))
+        return embeddings[0] if single else embeddings
+
+    def get_stats(self) -> dict:
+        stats = self._request(("stats",))
+        stats["address"] = self.address_text
+        return stats
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    from config.rag_config import RAGConfig
+
+    config = RAGConfig()
+    address = config.embedding_service_address or f"127.0.0.1:{DEFAULT_PORT}"
+    model = config.load_embedding_model()
+    if model is None:
+        raise SystemExit("Embedding modeli yüklenemedi")
+
+    # İlk forward pass sunucu dinlemeye başlamadan yapılır
+    model.encode(["ısınma sorgusu"], show_progress_bar=False)
+    EmbeddingServer(
+        address,
+        model,
+        max_batch_size=config.embedding_service_max_batch,
+        max_wait=config.embedding_service_max_wait_ms / 1000.0
+    ).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, func
+
+from database import SessionLocal, RAGIngestJobs
+
+ACTIVE_STATUSES = ("queued", "extracting", "embedding", "upserting")
+
+# Worker'lar kendi aktif işlerinin heartbeat_at alanını bu aralıkla günceller;
+# bu süreden uzun güncellenmeyen aktif iş, çalıştıran süreç ölmüş sayılır
+INGEST_HEARTBEAT_SECONDS = float(os.getenv("RAG_INGEST_HEARTBEAT_SECONDS", "15"))
+INGEST_STALE_SECONDS = float(os.getenv("RAG_INGEST_STALE_SECONDS", "120"))
+
+# Bu sürecin kimliği; pid tekrar kullanılsa da açılış id'si farklıdır
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _last_seen():
+    # heartbeat_at olmayan eski satırlarda son güncelleme zamanı kullanılır
+    return func.coalesce(RAGIngestJobs.heartbeat_at, RAGIngestJobs.updated_at)
+
+
+def _stale_cutoff() -> datetime:
+    return datetime.now() - timedelta(seconds=INGEST_STALE_SECONDS)
+
+
+def running_jobs_filter():
+    """Çalıştıran worker'ı hâlâ heartbeat gönderen aktif işler"""
+    return and_(RAGIngestJobs.status.in_(ACTIVE_STATUSES), _last_seen() >= _stale_cutoff())
+
+
+def _job_to_dict(job: RAGIngestJobs) -> dict:
+    return {
+        "job_id": job.id,
+        "upload_id": job.upload_id,
+        "filename": job.filename,
+        "description": job.description,
+        "specialty": job.specialty,
+        "status": job.status,
+        "processed_chunks": job.processed_chunks or 0,
+        "total_chunks": job.total_chunks or 0,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+class IngestJobManager:
+    """PDF yüklemelerini istek dışında, sınırlı bir worker havuzunda işler.
+
+    Her yükleme bir RAGIngestJobs satırı olarak kaydedilir; durum ve ilerleme
+    bu satırda güncellenir, admin paneli /api/rag/jobs/{job_id} ile sorgular.
+    Başarılı işler için RAGUploads kaydı ve yazılan vektör id'leri iş
+    tamamlanınca kaydedilir; aynı dosyanın önceki yüklemesi yerini yenisine bırakır.
+    """
+
+    def __init__(self, rag_service, document_manager, max_workers: int = 2, progress_interval: float = 0.5):
+        self.rag_service = rag_service
+        self.document_manager = document_manager
+        self.max_workers = max_workers
+        # Aynı aşamada ilerleme güncellemeleri en fazla bu sıklıkta DB'ye yazılır
+        self.progress_interval = progress_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rag-ingest")
+                self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="rag-ingest-heartbeat", daemon=True)
+                self._heartbeat.start()
+            return self._executor
+
+    def _heartbeat_loop(self):
+        """Bu worker'ın aktif işlerini (kuyruktakiler dahil) canlı olarak işaretler"""
+        while True:
+            time.sleep(INGEST_HEARTBEAT_SECONDS)
+            db = SessionLocal()
+            try:
+                db.query(RAGIngestJobs).filter(
+                    RAGIngestJobs.owner == WORKER_ID,
+                    RAGIngestJobs.status.in_(ACTIVE_STATUSES)
+                ).update({RAGIngestJobs.heartbeat_at: datetime.now()}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Yükleme işi heartbeat hatası: {e}")
+            finally:
+                db.close()
+
+    def submit(self, file_content: bytes, filename: str, description: str, specialty: str, uploaded_by: int) -> dict:
+        """İşi kuyruğa ekler ve hemen döner"""
+        db = SessionLocal()
+        try:
+            job = RAGIngestJobs(
+                filename=filename,
+                description=description,
+                specialty=specialty,
+                uploaded_by=uploaded_by,
+                status="queued",
+                owner=WORKER_ID,
+                heartbeat_at=datetime.now()
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            job_data = _job_to_dict(job)
+        finally:
+            db.close()
+
+        self._get_executor().submit(self._run, job_data["job_id"], file_content, filename, description, specialty, uploaded_by)
+        print(f"RAG yükleme işi kuyruğa alındı: #{job_data['job_id']} ({filename})")
+        return job_data
+
+    def _update(self, job_id: int, **fields):
+        db = SessionLocal()
+        try:
+            db.query(RAGIngestJobs).filter(RAGIngestJobs.id == job_id).update(fields, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Yükleme işi güncelleme hatası (#{job_id}): {e}")
+        finally:
+            db.close()
+
+    def _run(self, job_id: int, file_content: bytes, filename: str, description: str, specialty: str, uploaded_by: int):
+        start_time = time.time()
+        last_report = {"stage": None, "time": 0.0}
+
+        def on_progress(stage: str, processed: int, total: int):
+            now = time.time()
+            if stage == last_report["stage"] and now - last_report["time"] < self.progress_interval:
+                return
+            last_report.update(stage=stage, time=now)
+            self._update(job_id, status=stage, processed_chunks=processed, total_chunks=total)
+
+        try:
+            if not self.rag_service.is_initialized and not self.rag_service.initialize():
+                raise RuntimeError("RAG sistemi başlatılamadı. Vektör deposu ayarlarını kontrol edin.")
+
+            # Önceki yüklemeyle aynı içerikteki parçalar yeniden embed edilmez
+            existing_ids = self.document_manager.existing_vector_ids(filename, specialty)
+            result = self.rag_service.ingest_pdf(
+                file_content, filename, description, progress_callback=on_progress,
+                specialty=specialty, existing_ids=existing_ids
+            )
+            chunk_count = result.chunk_count
+
+            db = SessionLocal()
+            try:
+                upload, stale = self.document_manager.record_upload(
+                    db, filename, description, specialty, uploaded_by, result
+                )
+                db.query(RAGIngestJobs).filter(RAGIngestJobs.id == job_id).update({
+                    RAGIngestJobs.upload_id: upload.id,
+                    RAGIngestJobs.status: "done",
+                    RAGIngestJobs.processed_chunks: chunk_count,
+                    RAGIngestJobs.total_chunks: chunk_count,
+                    RAGIngestJobs.finished_at: datetime.now()
+                }, synchronize_session=False)
+                db.commit()
+            finally:
+                db.close()
+
+            # Önceki yüklemeden kalan parçalar yeni kayıt commit edildikten sonra silinir
+            if stale:
+                removed = self.document_manager.delete_stale_vectors(stale)
+                print(f"RAG yükleme işi #{job_id}: önceki yüklemeden {removed} eski parça silindi")
+
+            print(f"RAG yükleme işi #{job_id} tamamlandı: {chunk_count} parça ({result.skipped_count} değişmedi), "
+                  f"{time.time() - start_time:.2f} saniye")
+
+        except Exception as e:
+            print(f"RAG yükleme işi #{job_id} başarısız: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.now())
+
+    def get(self, job_id: int) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            job = db.query(RAGIngestJobs).filter(RAGIngestJobs.id == job_id).first()
+            if job is not None and job.status in ACTIVE_STATUSES and job.owner != WORKER_ID:
+                # Başka bir worker'ın işi; o worker öldüyse iş burada başarısız olarak görünür
+                if db.query(RAGIngestJobs.id).filter(RAGIngestJobs.id == job_id, running_jobs_filter()).first() is None:
+                    self.mark_interrupted_jobs()
+                    db.refresh(job)
+            return _job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def mark_interrupted_jobs(self) -> int:
+        """Çalıştıran worker'ı ölmüş (heartbeat'i INGEST_STALE_SECONDS'tan eski) aktif
+        işleri başarısız olarak işaretler; dosya içeriği bellekte tutulduğu için bu
+        işler devam ettirilemez. Diğer worker'ların süren işlerine dokunulmaz."""
+        db = SessionLocal()
+        try:
+            count = db.query(RAGIngestJobs).filter(
+                RAGIngestJobs.status.in_(ACTIVE_STATUSES),
+                _last_seen() < _stale_cutoff()
+            ).update({
+                RAGIngestJobs.status: "failed",
+                RAGIngestJobs.error: "İşi çalıştıran sunucu süreci durduğu için iş yarıda kaldı, dosyayı tekrar yükleyin",
+                RAGIngestJobs.finished_at: datetime.now()
+            }, synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+
+def create_ingest_job_manager() -> IngestJobManager:
+    from services.rag_service import rag_service
+    from services.rag_documents import rag_document_manager
+    return IngestJobManager(rag_service, rag_document_manager, max_workers=int(os.getenv("RAG_INGEST_WORKERS", "2")))
+
+
+# Global yükleme işi yöneticisi
+ingest_job_manager = create_ingest_job_manager()
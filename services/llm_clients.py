@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from typing import Dict, Tuple, Any
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from services.single_flight import SingleFlight
+
+
+class LLMClientRegistry:
+    """Süreç genelinde paylaşılan Gemini istemcileri.
+
+    ChatGoogleGenerativeAI her oluşturulduğunda genai.configure() çağırıp
+    gRPC kanalını ve TLS oturumunu sıfırlar. Bu registry istemcileri model adı
+    ve üretim parametrelerine göre bir kez oluşturur ve tekrar kullanır.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, Any] = {}
+        self._client_stats: Dict[Tuple, Dict[str, Any]] = {}
+        self._generative_models: Dict[str, Any] = {}
+        self._flights: Dict[Tuple, SingleFlight] = {}
+        self._configured_api_key = None
+        self.hits = 0
+        self.misses = 0
+        self.configure_count = 0
+
+    def _get_api_key(self) -> str:
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY bulunamadı")
+        return api_key
+
+    def _lookup(self, key: Tuple):
+        """Önbellekteki istemciyi döndürür ve istatistikleri günceller (kilit altında çağrılır)"""
+        client = self._clients.get(key)
+        if client is not None:
+            self.hits += 1
+            stats = self._client_stats[key]
+            stats["hits"] += 1
+            stats["last_used"] = time.time()
+        return client
+
+    def _register(self, key: Tuple, client: Any):
+        """Yeni istemciyi kaydeder (kilit altında çağrılır)"""
+        self.misses += 1
+        self._clients[key] = client
+        self._client_stats[key] = {
+            "hits": 0,
+            "created_at": time.time(),
+            "last_used": time.time()
+        }
+
+    def get_chat_model(self, model: str = "gemini-1.5-flash", temperature: float = 0.3,
+                       max_tokens: int = 800, **kwargs) -> ChatGoogleGenerativeAI:
+        """LangChain sohbet modelini döndürür, yoksa oluşturur"""
+        api_key = self._get_api_key()
+        key = ("chat", model, temperature, max_tokens, tuple(sorted(kwargs.items())), api_key)
+
+        with self._lock:
+            client = self._lookup(key)
+            if client is not None:
+                return client
+
+            # API anahtarı değiştiyse eski istemciler geçersizdir
+            if self._configured_api_key not in (None, api_key):
+                self._reset_locked()
+
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = SingleFlight(f"Gemini istemcisi ({model})")
+                self._flights[key] = flight
+
+        # Aynı anahtar için eşzamanlı istekler tek bir oluşturmayı bekler; kilit dışında
+        # çalıştığı için farklı modellerin oluşturulması birbirini bekletmez
+        return flight.do(self._create_chat_model, key, model, api_key, temperature, max_tokens, kwargs)
+
+    def _create_chat_model(self, key: Tuple, model: str, api_key: str, temperature: float,
+                           max_tokens: int, kwargs: dict) -> ChatGoogleGenerativeAI:
+        with self._lock:
+            client = self._lookup(key)
+            if client is not None:
+                return client
+
+        client = ChatGoogleGenerativeAI(
+            model=model,
+            google_api_key=api_key,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+
+        with self._lock:
+            self._configured_api_key = api_key
+            self.configure_count += 1
+            self._register(key, client)
+        print(f"Gemini istemcisi oluşturuldu: {model} (temperature={temperature}, max_tokens={max_tokens})")
+        return client
+
+    def get_generative_model(self, model_name: str):
+        """google.generativeai GenerativeModel nesnesini döndürür (ses tanıma gibi doğrudan kullanımlar için)"""
+        import google.generativeai as genai
+
+        api_key = self._get_api_key()
+        key = ("genai", model_name, api_key)
+
+        with self._lock:
+            client = self._lookup(key)
+            if client is not None:
+                return client
+
+            if self._configured_api_key != api_key:
+                if self._configured_api_key is not None:
+                    self._reset_locked()
+                genai.configure(api_key=api_key)
+                self._configured_api_key = api_key
+                self.configure_count += 1
+
+            client = genai.GenerativeModel(model_name)
+            self._register(key, client)
+            print(f"Gemini modeli oluşturuldu: {model_name}")
+            return client
+
+    def _reset_locked(self):
+        self._clients.clear()
+        self._client_stats.clear()
+        self._flights.clear()
+        self._configured_api_key = None
+
+    def reset(self):
+        """Tüm istemcileri bırakır (API anahtarı değişimi veya testler için)"""
+        with self._lock:
+            self._reset_locked()
+
+    def get_stats(self) -> dict:
+        """İstemci sayısı, isabet oranı ve istemci bazlı kullanım bilgisi"""
+        with self._lock:
+            total = self.hits + self.misses
+            clients = []
+            for key, stats in self._client_stats.items():
+                clients.append({
+                    "type": key[0],
+                    "model": key[1],
+                    "params": {"temperature": key[2], "max_tokens": key[3]} if key[0] == "chat" else {},
+                    "hits": stats["hits"],
+                    "age_seconds": round(time.time() - stats["created_at"], 1),
+                    "idle_seconds": round(time.time() - stats["last_used"], 1)
+                })
+
+            return {
+                "client_count": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "configure_count": self.configure_count,
+                "clients": clients
+            }
+
+
+# Global istemci registry instance'ı
+llm_registry = LLMClientRegistry()
@@ -0,0 +1,393 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, List, Sequence
+
+from langchain.memory import ConversationBufferWindowMemory
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain.schema import BaseMessage, HumanMessage, AIMessage
+
+from database import SessionLocal, ConsultationHistory, ChatMemoryMessages
+
+
+class MemoryBackend:
+    """Hasta konuşma memory'si için backend arayüzü.
+
+    get_patient_memory bu arayüz üzerinden çalışır; varsayılan backend süreç içi
+    sözlüktür, birden fazla uvicorn worker'ı için paylaşılan bir backend seçilebilir.
+    Metotlar DB erişimi yapabilir, async kodda thread pool'da çağrılmalıdır.
+    """
+
+    name = "base"
+
+    def get(self, patient_id: int, doktor_id: Optional[int] = None) -> ConversationBufferWindowMemory:
+        raise NotImplementedError
+
+    def get_messages(self, patient_id: int, doktor_id: Optional[int] = None) -> List[BaseMessage]:
+        """Prompt'a verilecek sohbet geçmişinin kopyasını döndürür"""
+        return list(self.get(patient_id, doktor_id).chat_memory.messages)
+
+    def add_exchange(self, patient_id: int, user_message: str, ai_message: str,
+                     doktor_id: Optional[int] = None) -> List[BaseMessage]:
+        """Soru-cevap çiftini ekler, güncel pencereyi döndürür"""
+        raise NotImplementedError
+
+    def peek(self, patient_id: int) -> Optional[List[BaseMessage]]:
+        """Kayıt varsa mesajlarını döndürür, yeniden oluşturma yapmaz"""
+        raise NotImplementedError
+
+    def clear(self, patient_id: int) -> bool:
+        raise NotImplementedError
+
+    def get_stats(self) -> dict:
+        raise NotImplementedError
+
+
+class PatientMemoryStore(MemoryBackend):
+    """Hasta bazlı konuşma memory'si için sınırlı, LRU + boşta kalma süresi (TTL) ile temizlenen depo.
+
+    Limitler aşıldığında en uzun süredir kullanılmayan kayıt atılır. Atılmış bir
+    hastanın penceresi tekrar istendiğinde ConsultationHistory tablosundan son
+    `window_k` soru-cevap çifti ile yeniden oluşturulur.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 20_000_000,
+                 idle_ttl: float = 3600, window_k: int = 3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.window_k = window_k
+
+        self._lock = threading.RLock()
+        # patient_id -> {"memory", "last_access", "size"}; sıralama = erişim sırası (LRU)
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        # /clear-memory sonrası geçmişten yeniden yükleme yapılmaması için temizleme zamanları
+        self._cleared_at: "OrderedDict[int, datetime]" = OrderedDict()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.evictions = {"lru": 0, "ttl": 0, "bytes": 0}
+
+    def _new_memory(self) -> ConversationBufferWindowMemory:
+        return ConversationBufferWindowMemory(
+            k=self.window_k,  # Optimal seviye: 3 mesaj sakla
+            return_messages=True,
+            memory_key="chat_history"
+        )
+
+    @staticmethod
+    def _memory_size(memory: ConversationBufferWindowMemory) -> int:
+        return sum(len(str(message.content).encode("utf-8")) for message in memory.chat_memory.messages)
+
+    def _trim(self, memory: ConversationBufferWindowMemory):
+        """Mesaj listesini pencere boyutuna indirir (k soru-cevap çifti)"""
+        max_messages = self.window_k * 2
+        messages = memory.chat_memory.messages
+        if len(messages) > max_messages:
+            del messages[:-max_messages]
+
+    def _remove(self, patient_id: int, reason: Optional[str] = None):
+        entry = self._entries.pop(patient_id)
+        self._total_bytes -= entry["size"]
+        if reason:
+            self.evictions[reason] += 1
+
+    def _evict(self, now: float):
+        """Süresi dolan ve limitleri aşan kayıtları en eskiden başlayarak atar"""
+        while self._entries:
+            patient_id, entry = next(iter(self._entries.items()))
+            if now - entry["last_access"] > self.idle_ttl:
+                self._remove(patient_id, "ttl")
+            elif len(self._entries) > self.max_entries:
+                self._remove(patient_id, "lru")
+            elif self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(patient_id, "bytes")
+            else:
+                break
+
+    def _load_from_history(self, patient_id: int, doktor_id: Optional[int]) -> ConversationBufferWindowMemory:
+        """Atılmış bir hastanın penceresini konsültasyon geçmişinden yeniden oluşturur"""
+        memory = self._new_memory()
+        db = SessionLocal()
+        try:
+            query = db.query(ConsultationHistory.soru, ConsultationHistory.cevap).filter(
+                ConsultationHistory.hasta_id == patient_id
+            )
+            if doktor_id is not None:
+                query = query.filter(ConsultationHistory.doktor_id == doktor_id)
+            cleared_at = self._cleared_at.get(patient_id)
+            if cleared_at is not None:
+                query = query.filter(ConsultationHistory.tarih > cleared_at)
+
+            rows = query.order_by(ConsultationHistory.tarih.desc(), ConsultationHistory.id.desc()).limit(self.window_k).all()
+        finally:
+            db.close()
+
+        for soru, cevap in reversed(rows):
+            memory.chat_memory.add_user_message(f"Soru: {soru}")
+            memory.chat_memory.add_ai_message(f"Cevap: {cevap}")
+
+        if rows:
+            self.rebuilds += 1
+            print(f"Hasta {patient_id} memory'si geçmişten yeniden oluşturuldu: {len(rows)} soru-cevap")
+        return memory
+
+    def get(self, patient_id: int, doktor_id: Optional[int] = None) -> ConversationBufferWindowMemory:
+        """Hasta memory'sini döndürür; yoksa geçmişten yeniden oluşturur (DB erişimi olabilir)"""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(patient_id)
+            if entry is not None:
+                self.hits += 1
+                entry["last_access"] = now
+                self._entries.move_to_end(patient_id)
+                return entry["memory"]
+            self.misses += 1
+
+        memory = self._load_from_history(patient_id, doktor_id)
+
+        with self._lock:
+            # Aynı anda başka bir istek oluşturduysa onu kullan
+            entry = self._entries.get(patient_id)
+            if entry is not None:
+                entry["last_access"] = now
+                self._entries.move_to_end(patient_id)
+                return entry["memory"]
+
+            size = self._memory_size(memory)
+            self._entries[patient_id] = {"memory": memory, "last_access": now, "size": size}
+            self._total_bytes += size
+            self._evict(now)
+            return memory
+
+    def add_exchange(self, patient_id: int, user_message: str, ai_message: str,
+                     doktor_id: Optional[int] = None) -> List[BaseMessage]:
+        """Soru-cevap çiftini memory'e ekler, pencereyi ve boyut sayaçlarını günceller.
+
+        Kayıt get_messages'tan sonra atıldıysa önceki soru-cevaplar kaybolmasın
+        diye pencere get ile aynı şekilde geçmişten yeniden oluşturulur.
+        """
+        rebuilt = None
+        while True:
+            now = time.time()
+            with self._lock:
+                entry = self._entries.get(patient_id)
+                if entry is None and rebuilt is not None:
+                    entry = {"memory": rebuilt, "last_access": now, "size": self._memory_size(rebuilt)}
+                    self._entries[patient_id] = entry
+                    self._total_bytes += entry["size"]
+
+                if entry is not None:
+                    memory = entry["memory"]
+                    memory.chat_memory.add_user_message(user_message)
+                    memory.chat_memory.add_ai_message(ai_message)
+                    self._trim(memory)
+
+                    size = self._memory_size(memory)
+                    self._total_bytes += size - entry["size"]
+                    entry["size"] = size
+                    entry["last_access"] = now
+                    self._entries.move_to_end(patient_id)
+                    self._evict(now)
+                    return list(memory.chat_memory.messages)
+                self.misses += 1
+
+            # DB okuması kilit dışında yapılır
+            rebuilt = self._load_from_history(patient_id, doktor_id)
+
+    def peek(self, patient_id: int) -> Optional[List[BaseMessage]]:
+        """Sayaçları ve LRU sırasını değiştirmeden mevcut mesajları döndürür"""
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            return list(entry["memory"].chat_memory.messages) if entry is not None else None
+
+    def clear(self, patient_id: int) -> bool:
+        """Hasta memory'sini siler; geçmiş konsültasyonlar tekrar yüklenmez"""
+        with self._lock:
+            self._cleared_at[patient_id] = datetime.now(timezone.utc)
+            self._cleared_at.move_to_end(patient_id)
+            while len(self._cleared_at) > self.max_entries * 10:
+                self._cleared_at.popitem(last=False)
+
+            if patient_id in self._entries:
+                self._remove(patient_id)
+                return True
+            return False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._evict(time.time())
+            total = self.hits + self.misses
+            return {
+                "backend": self.name,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "rebuilds": self.rebuilds,
+                "evictions": dict(self.evictions)
+            }
+
+
+class DatabaseChatMessageHistory(BaseChatMessageHistory):
+    """chat_memory_messages tablosunda tutulan, son `max_messages` mesajla sınırlı sohbet geçmişi"""
+
+    def __init__(self, patient_id: int, max_messages: int, backend: "DatabaseMemoryBackend"):
+        self.patient_id = patient_id
+        self.max_messages = max_messages
+        self._backend = backend
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        self._backend.reads += 1
+        db = SessionLocal()
+        try:
+            rows = db.query(ChatMemoryMessages.rol, ChatMemoryMessages.icerik).filter(
+                ChatMemoryMessages.hasta_id == self.patient_id
+            ).order_by(ChatMemoryMessages.id.desc()).limit(self.max_messages).all()
+        finally:
+            db.close()
+
+        return [
+            HumanMessage(content=icerik) if rol == "human" else AIMessage(content=icerik)
+            for rol, icerik in reversed(rows)
+        ]
+
+    def add_message(self, message: BaseMessage) -> None:
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """Mesajları ekler ve pencere dışında kalan eski kayıtları aynı işlemde siler"""
+        self._backend.writes += 1
+        db = SessionLocal()
+        try:
+            for message in messages:
+                db.add(ChatMemoryMessages(
+                    hasta_id=self.patient_id,
+                    rol="human" if message.type == "human" else "ai",
+                    icerik=str(message.content)
+                ))
+            db.flush()
+
+            keep_ids = db.query(ChatMemoryMessages.id).filter(
+                ChatMemoryMessages.hasta_id == self.patient_id
+            ).order_by(ChatMemoryMessages.id.desc()).limit(self.max_messages).subquery()
+            db.query(ChatMemoryMessages).filter(
+                ChatMemoryMessages.hasta_id == self.patient_id,
+                ChatMemoryMessages.id.notin_(db.query(keep_ids.c.id))
+            ).delete(synchronize_session=False)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def clear(self) -> None:
+        self._backend.writes += 1
+        db = SessionLocal()
+        try:
+            db.query(ChatMemoryMessages).filter(
+                ChatMemoryMessages.hasta_id == self.patient_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+class DatabaseMemoryBackend(MemoryBackend):
+    """Mevcut SQLAlchemy veritabanını kullanan, tüm worker'ların paylaştığı memory backend'i"""
+
+    name = "database"
+
+    def __init__(self, window_k: int = 3):
+        self.window_k = window_k
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, patient_id: int, doktor_id: Optional[int] = None) -> ConversationBufferWindowMemory:
+        return ConversationBufferWindowMemory(
+            k=self.window_k,
+            return_messages=True,
+            memory_key="chat_history",
+            chat_memory=DatabaseChatMessageHistory(patient_id, self.window_k * 2, self)
+        )
+
+    def add_exchange(self, patient_id: int, user_message: str, ai_message: str,
+                     doktor_id: Optional[int] = None) -> List[BaseMessage]:
+        chat_memory = self.get(patient_id).chat_memory
+        chat_memory.add_messages([HumanMessage(content=user_message), AIMessage(content=ai_message)])
+        return chat_memory.messages
+
+    def peek(self, patient_id: int) -> Optional[List[BaseMessage]]:
+        messages = self.get(patient_id).chat_memory.messages
+        return messages or None
+
+    def clear(self, patient_id: int) -> bool:
+        db = SessionLocal()
+        try:
+            exists = db.query(ChatMemoryMessages.id).filter(
+                ChatMemoryMessages.hasta_id == patient_id
+            ).first() is not None
+        finally:
+            db.close()
+
+        self.get(patient_id).chat_memory.clear()
+        return exists
+
+    def get_stats(self) -> dict:
+        from sqlalchemy import func
+
+        db = SessionLocal()
+        try:
+            entries, messages = db.query(
+                func.count(func.distinct(ChatMemoryMessages.hasta_id)),
+                func.count(ChatMemoryMessages.id)
+            ).one()
+        finally:
+            db.close()
+
+        return {
+            "backend": self.name,
+            "entries": entries,
+            "messages": messages,
+            "window_k": self.window_k,
+            "reads": self.reads,
+            "writes": self.writes
+        }
+
+
+def create_memory_backend() -> MemoryBackend:
+    """AI_MEMORY_BACKEND ortam değişkenine göre memory backend'ini oluşturur (memory | database)"""
+    backend = os.getenv("AI_MEMORY_BACKEND", "memory").lower()
+    window_k = int(os.getenv("AI_MEMORY_WINDOW", "3"))
+
+    if backend == "database":
+        print("Konuşma memory'si veritabanında tutuluyor (paylaşılan backend)")
+        return DatabaseMemoryBackend(window_k=window_k)
+
+    if backend != "memory":
+        print(f"Bilinmeyen AI_MEMORY_BACKEND '{backend}', süreç içi memory kullanılıyor")
+
+    return PatientMemoryStore(
+        max_entries=int(os.getenv("AI_MEMORY_MAX_ENTRIES", "500")),
+        max_bytes=int(os.getenv("AI_MEMORY_MAX_BYTES", "20000000")),
+        idle_ttl=float(os.getenv("AI_MEMORY_IDLE_TTL", "3600")),
+        window_k=window_k
+    )
+
+
+# Global memory backend'i
+patient_memory_store = create_memory_backend()
@@ -0,0 +1,155 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Saniye cinsinden histogram sınırları - embedding (ms) ile LLM çağrıları (saniyeler) arasını kapsar
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Prometheus uyumlu, etiketli kümülatif histogram.
+
+    Her etiket kombinasyonu için bucket sayaçları, toplam ve gözlem sayısı
+    tutulur. p50/p95/p99 değerleri Prometheus tarafında histogram_quantile()
+    ile hesaplanır.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # etiket değerleri -> {"counts": [...], "sum": float, "count": int}
+        self._series: Dict[Tuple[str, ...], dict] = {}
+
+    def _label_values(self, labels: dict) -> Tuple[str, ...]:
+        missing = set(self.label_names) - set(labels)
+        if missing:
+            raise ValueError(f"{self.name} için eksik etiket: {sorted(missing)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Blok süresini ölçer; blok hata fırlatsa da süre kaydedilir"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram"
+        ]
+        with self._lock:
+            series_items = sorted(
+                (key, list(series["counts"]), series["sum"], series["count"])
+                for key, series in self._series.items()
+            )
+
+        for key, counts, total, count in series_items:
+            labels = ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = f'{labels},le="{_format_value(bound)}"' if labels else f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Uygulama metriklerini tutar ve Prometheus text formatında dışa aktarır"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Histogram] = {}
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Aynı isimle tekrar çağrılırsa mevcut histogramı döndürür"""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Histogram(name, documentation, label_names, buckets)
+                self._metrics[name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global metrik registry'si
+metrics_registry = MetricsRegistry()
+
+# Bilinmeyen uzmanlık dalları tek seride toplanır; istemciden gelen değer seri sayısını büyütemez
+OTHER_SPECIALTY_LABEL = "other"
+
+
+def specialty_label(specialty: Optional[str]) -> str:
+    """Metrik etiketi için uzmanlık dalı: prompts.json dallarından biri, genel (dal yoksa) veya other"""
+    from services.prompt_registry import prompt_registry
+
+    if not specialty:
+        return "genel"
+    key = specialty.strip().lower()
+    return key if key in prompt_registry.specialties else OTHER_SPECIALTY_LABEL
+
+
+# Konsültasyon akışının aşama süreleri:
+# rag_init, query_embedding, vector_search, diagnosis_llm, treatment_llm, db_persist
+consultation_stage_seconds = metrics_registry.histogram(
+    "consultation_stage_duration_seconds",
+    "Konsültasyon akışındaki aşamaların süresi (saniye)",
+    ("stage", "specialty")
+)
+
+# PDF yüklemede sayfa başına metin çıkarma süresi
+pdf_page_extract_seconds = metrics_registry.histogram(
+    "rag_pdf_page_extract_duration_seconds",
+    "PDF yüklemede sayfa başına metin çıkarma süresi (saniye)",
+    ()
+)
+
+# Konsültasyon başına prompt'a eklenen RAG bağlamının tahmini token sayısı
+rag_context_tokens = metrics_registry.histogram(
+    "rag_context_tokens",
+    "Sorgu başına prompt'a eklenen RAG bağlamının tahmini token sayısı",
+    ("specialty",),
+    buckets=(0, 100, 250, 500, 1000, 1500, 2000, 4000, 8000, 16000)
+)
@@ -0,0 +1,189 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+# Bu sayının altındaki PDF'ler süreç havuzu maliyetine değmez, aynı süreçte çıkarılır
+MIN_PAGES_FOR_POOL = 8
+MIN_PAGES_PER_TASK = 4
+
+
+class PDFLimitError(ValueError):
+    """PDF sayfa veya boyut sınırını aştığında fırlatılır"""
+
+
+class PDFExtractionTimeout(RuntimeError):
+    """Süreç havuzundaki sayfa çıkarma görevleri zaman aşımına uğradığında fırlatılır"""
+
+
+@dataclass
+class PDFExtractionResult:
+    pages: List[str]
+    page_timings: List[float] = field(default_factory=list)  # saniye, sayfa sırasıyla
+    total_seconds: float = 0.0
+    parallel: bool = False
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages) + "\n" if self.pages else ""
+
+    def slowest_pages(self, count: int = 3) -> List[Tuple[int, float]]:
+        """(1 tabanlı sayfa numarası, süre) çiftleri, en yavaştan başlayarak"""
+        ranked = sorted(enumerate(self.page_timings, start=1), key=lambda item: item[1], reverse=True)
+        return ranked[:count]
+
+
+# Worker süreçte son açılan PDF: (dosya yolu, reader); aynı dosyanın sonraki aralıkları tekrar ayrıştırılmaz
+_worker_reader = None
+
+
+def _extract_page_range(source, start: int, end: int) -> List[Tuple[int, str, float]]:
+    """[start, end) aralığındaki sayfaların metnini çıkarır.
+
+    Worker süreçlerde source geçici dosyanın yoludur, böylece PDF içeriği her
+    görevle birlikte kopyalanmaz; aynı süreçte çalışırken bytes verilir.
+    """
+    global _worker_reader
+    import PyPDF2
+
+    if isinstance(source, str):
+        if _worker_reader is None or _worker_reader[0] != source:
+            _worker_reader = (source, PyPDF2.PdfReader(source))
+        reader = _worker_reader[1]
+    else:
+        reader = PyPDF2.PdfReader(io.BytesIO(source))
+    results = []
+    for page_num in range(start, end):
+        page_start = time.perf_counter()
+        text = reader.pages[page_num].extract_text() or ""
+        results.append((page_num, text, time.perf_counter() - page_start))
+    return results
+
+
+class PDFTextExtractor:
+    """PDF sayfalarını süreç havuzunda paralel olarak metne çevirir.
+
+    Sayfalar aralıklara bölünüp worker süreçlere dağıtılır, sonuçlar sayfa
+    sırasına göre birleştirilir. PDF bir kez geçici dosyaya yazılır, görevlere
+    yalnızca dosya yolu gönderilir. Boyut ve sayfa sınırları aşılırsa işlem
+    başlamadan PDFLimitError fırlatılır. task_timeout saniye boyunca hiçbir
+    aralık tamamlanmazsa worker süreçleri sonlandırılır, havuz yeniden
+    oluşturulur ve PDFExtractionTimeout fırlatılır. Havuz "spawn" ile
+    oluşturulur; ana süreçteki thread'ler (torch, uvicorn) fork sırasında kopyalanmaz.
+    """
+
+    def __init__(self, max_workers: int, max_pages: int, max_bytes: int, task_timeout: float = 120.0):
+        self.max_workers = max(max_workers, 1)
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.task_timeout = task_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _reset_pool(self, terminate: bool = False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        if terminate:
+            # shutdown() çalışan görevi durduramaz; takılan worker'lar sonlandırılır
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _extract_parallel(self, file_content: bytes, page_count: int) -> List[Tuple[int, str, float]]:
+        # Benzersiz ad: worker'lardaki reader önbelleği eski bir dosyayla karışmaz
+        fd, path = tempfile.mkstemp(prefix=f"rag-{uuid.uuid4().hex}-", suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(file_content)
+
+            pool = self._get_pool()
+            pending = {
+                pool.submit(_extract_page_range, path, start, end)
+                for start, end in self._page_ranges(page_count)
+            }
+            results = []
+            while pending:
+                done, pending = wait(pending, timeout=self.task_timeout or None, return_when=FIRST_COMPLETED)
+                if not done:
+                    self._reset_pool(terminate=True)
+                    raise PDFExtractionTimeout(
+                        f"PDF metin çıkarma {self.task_timeout:.0f} saniyede ilerlemedi, havuz yeniden başlatıldı"
+                    )
+                for future in done:
+                    results.extend(future.result())
+            return results
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def check_size(self, size: int):
+        if self.max_bytes and size > self.max_bytes:
+            raise PDFLimitError(
+                f"PDF boyutu sınırı aşıyor: {size / 1_000_000:.1f} MB (en fazla {self.max_bytes / 1_000_000:.1f} MB)"
+            )
+
+    def _page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        # Her worker'a birden fazla aralık düşecek şekilde böl; yavaş sayfalar tek worker'ı tıkamaz
+        task_count = self.max_workers * 2
+        pages_per_task = max(MIN_PAGES_PER_TASK, -(-page_count // task_count))
+        return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+    def extract(self, file_content: bytes) -> PDFExtractionResult:
+        import PyPDF2
+
+        self.check_size(len(file_content))
+        started = time.perf_counter()
+
+        page_count = len(PyPDF2.PdfReader(io.BytesIO(file_content)).pages)
+        if self.max_pages and page_count > self.max_pages:
+            raise PDFLimitError(f"PDF sayfa sayısı sınırı aşıyor: {page_count} sayfa (en fazla {self.max_pages})")
+
+        results = None
+        parallel = self.max_workers > 1 and page_count >= MIN_PAGES_FOR_POOL
+        if parallel:
+            try:
+                results = self._extract_parallel(file_content, page_count)
+            except BrokenProcessPool as e:
+                print(f"PDF çıkarma havuzu çöktü, aynı süreçte devam ediliyor: {e}")
+                self._reset_pool()
+                parallel = False
+
+        if results is None:
+            results = _extract_page_range(file_content, 0, page_count)
+
+        results.sort(key=lambda item: item[0])
+        return PDFExtractionResult(
+            pages=[text for _, text, _ in results],
+            page_timings=[seconds for _, _, seconds in results],
+            total_seconds=time.perf_counter() - started,
+            parallel=parallel
+        )
+
+
+def create_pdf_extractor(config) -> PDFTextExtractor:
+    return PDFTextExtractor(
+        max_workers=config.pdf_extract_workers,
+        max_pages=config.pdf_max_pages,
+        max_bytes=config.pdf_max_bytes,
+        task_timeout=config.pdf_task_timeout
+    )
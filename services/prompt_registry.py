@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Optional
+
+from langchain_core.prompts import ChatPromptTemplate, FewShotChatMessagePromptTemplate
+
+PROMPTS_PATH = os.getenv(
+    "AI_PROMPTS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "prompts.json")
+)
+
+DEFAULT_TEMPLATE_KEY = "__default__"
+
+
+class PromptTemplateRegistry:
+    """Uzmanlık dalı bazlı derlenmiş prompt şablonları.
+
+    Şablonlar config/prompts.json dosyasından okunur ve her uzmanlık dalı için
+    ilk kullanımda bir kez derlenir. İstek başına yalnızca değişken yerleştirme
+    yapılır. Derlenmiş şablonlar salt okunur bir mapping'de tutulur, reload()
+    dosyayı yeniden okuyup tüm şablonları tek seferde değiştirir.
+    """
+
+    def __init__(self, path: str = PROMPTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load_data()
+        self._templates = MappingProxyType({})
+        self._treatment_template: Optional[ChatPromptTemplate] = None
+
+    def _load_data(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if "specialties" not in data:
+            raise ValueError(f"Prompt dosyasında 'specialties' bulunamadı: {self.path}")
+        return data
+
+    @property
+    def specialties(self) -> list:
+        return list(self._data["specialties"].keys())
+
+    def _compile(self, data: dict, key: str) -> ChatPromptTemplate:
+        """Tek bir uzmanlık dalının sistem mesajı, few-shot örnekleri ve insan mesajını derler"""
+        specialty_data = data["specialties"].get(key, {})
+        example_messages = data["example_prompt"]
+
+        example_prompt = ChatPromptTemplate.from_messages([
+            ("human", example_messages["human"]),
+            ("ai", example_messages["ai"])
+        ])
+
+        few_shot_prompt = FewShotChatMessagePromptTemplate(
+            example_prompt=example_prompt,
+            examples=specialty_data.get("examples", []),
+        )
+
+        return ChatPromptTemplate.from_messages([
+            ("system", specialty_data.get("system_prompt", data["default_system_prompt"])),
+            few_shot_prompt,
+            ("human", data["consultation_human_template"])
+        ])
+
+    def get(self, specialty: str) -> ChatPromptTemplate:
+        """Uzmanlık dalının derlenmiş konsültasyon şablonunu döndürür"""
+        key = specialty if specialty in self._data["specialties"] else DEFAULT_TEMPLATE_KEY
+        template = self._templates.get(key)
+        if template is not None:
+            return template
+
+        with self._lock:
+            template = self._templates.get(key)
+            if template is None:
+                template = self._compile(self._data, key)
+                templates = dict(self._templates)
+                templates[key] = template
+                self._templates = MappingProxyType(templates)
+            return template
+
+    def get_treatment_template(self) -> ChatPromptTemplate:
+        """Tedavi planı şablonunu döndürür (specialty, patient_info, diagnosis değişkenleri)"""
+        template = self._treatment_template
+        if template is None:
+            with self._lock:
+                if self._treatment_template is None:
+                    treatment = self._data["treatment"]
+                    self._treatment_template = ChatPromptTemplate.from_messages([
+                        ("system", treatment["system_prompt"]),
+                        ("human", treatment["human_template"])
+                    ])
+                template = self._treatment_template
+        return template
+
+    def compile_all(self):
+        """Tüm şablonları önceden derler (uygulama başlangıcında çağrılır)"""
+        for specialty in self.specialties:
+            self.get(specialty)
+        self.get(DEFAULT_TEMPLATE_KEY)
+        self.get_treatment_template()
+
+    def reload(self) -> list:
+        """Prompt dosyasını yeniden okur ve şablonları yeniden derler"""
+        data = self._load_data()
+        templates = {key: self._compile(data, key) for key in data["specialties"]}
+        templates[DEFAULT_TEMPLATE_KEY] = self._compile(data, DEFAULT_TEMPLATE_KEY)
+        treatment_template = ChatPromptTemplate.from_messages([
+            ("system", data["treatment"]["system_prompt"]),
+            ("human", data["treatment"]["human_template"])
+        ])
+
+        with self._lock:
+            self._data = data
+            self._templates = MappingProxyType(templates)
+            self._treatment_template = treatment_template
+
+        print(f"Prompt şablonları yeniden yüklendi: {len(data['specialties'])} uzmanlık dalı")
+        return list(data["specialties"].keys())
+
+
+# Global prompt registry instance'ı
+prompt_registry = PromptTemplateRegistry()
@@ -0,0 +1,286 @@
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from database import SessionLocal, RAGUploads, RAGUploadChunks, RAGIngestJobs
+
+ORPHAN_SAMPLE_SIZE = 20
+
+
+class IngestInProgressError(RuntimeError):
+    """Devam eden yükleme işi varken vektör silen uzlaştırma başlatılamaz"""
+
+
+def _group_by_namespace(rows: Iterable[Tuple[str, str]]) -> Dict[str, List[str]]:
+    grouped = defaultdict(list)
+    for namespace, vector_id in rows:
+        grouped[namespace or ""].append(vector_id)
+    return dict(grouped)
+
+
+class RAGDocumentManager:
+    """RAG dokümanlarının yaşam döngüsü: yükleme kaydı, silme ve uzlaştırma.
+
+    Her yüklemenin yazdığı vektör id'leri RAGUploadChunks tablosunda tutulur.
+    Silme ve aynı dosyanın yeniden yüklenmesi yalnızca bu id'leri toplu olarak
+    kaldırır. Uzlaştırma (reconcile) depodaki id'leri bu kayıtlarla karşılaştırıp
+    hiçbir yüklemeye ait olmayan vektörleri bulur ve temizler.
+    """
+
+    def __init__(self, rag_service):
+        self.rag_service = rag_service
+
+    def _vector_store(self):
+        if not self.rag_service.is_initialized and not self.rag_service.initialize():
+            raise RuntimeError("RAG sistemi başlatılamadı. Vektör deposu ayarlarını kontrol edin.")
+        return self.rag_service.config.vector_store
+
+    def _delete_vectors(self, ids_by_namespace: Dict[str, List[str]]) -> int:
+        vector_store = self._vector_store()
+        deleted = 0
+        for namespace, ids in ids_by_namespace.items():
+            if ids:
+                vector_store.delete(ids, namespace=namespace)
+                deleted += len(ids)
+        if deleted:
+            self.rag_service.invalidate_search_caches()
+        return deleted
+
+    @staticmethod
+    def _remove_upload_rows(db, upload_ids: List[int]):
+        db.query(RAGUploadChunks).filter(RAGUploadChunks.upload_id.in_(upload_ids)).delete(synchronize_session=False)
+        db.query(RAGIngestJobs).filter(RAGIngestJobs.upload_id.in_(upload_ids)).update(
+            {RAGIngestJobs.upload_id: None}, synchronize_session=False
+        )
+        db.query(RAGUploads).filter(RAGUploads.id.in_(upload_ids)).delete(synchronize_session=False)
+
+    def existing_vector_ids(self, filename: str, specialty: str) -> Set[str]:
+        """Aynı dalda aynı isimli önceki yüklemenin, dalın namespace'indeki vektör id'leri"""
+        namespace = self.rag_service.namespace_for(specialty)
+        db = SessionLocal()
+        try:
+            rows = db.query(RAGUploadChunks.vector_id).join(
+                RAGUploads, RAGUploads.id == RAGUploadChunks.upload_id
+            ).filter(
+                RAGUploads.filename == filename,
+                RAGUploads.specialty == specialty,
+                RAGUploadChunks.namespace == namespace
+            )
+            return {row.vector_id for row in rows}
+        finally:
+            db.close()
+
+    def record_upload(self, db, filename: str, description: Optional[str], specialty: str,
+                      uploaded_by: int, result) -> Tuple[RAGUploads, Dict[str, List[str]]]:
+        """Yüklemeyi ve vektör id'lerini kaydeder; aynı dalda aynı isimli önceki yüklemelerin yerini alır.
+
+        Commit çağırana bırakılır. Önceki yüklemelerden kalıp yeni yüklemede
+        bulunmayan id'ler namespace'e göre döndürülür, commit sonrası
+        delete_stale_vectors() ile silinmelidir.
+        """
+        previous_ids = [
+            row.id for row in db.query(RAGUploads.id).filter(
+                RAGUploads.filename == filename,
+                RAGUploads.specialty == specialty
+            )
+        ]
+
+        stale = {}
+        if previous_ids:
+            new_ids = set(result.vector_ids)
+            rows = db.query(RAGUploadChunks.namespace, RAGUploadChunks.vector_id).filter(
+                RAGUploadChunks.upload_id.in_(previous_ids)
+            ).all()
+            stale = _group_by_namespace(
+                (namespace, vector_id) for namespace, vector_id in rows
+                if not (namespace == result.namespace and vector_id in new_ids)
+            )
+            self._remove_upload_rows(db, previous_ids)
+
+        upload = RAGUploads(
+            filename=filename,
+            description=description,
+            uploaded_by=uploaded_by,
+            specialty=specialty
+        )
+        db.add(upload)
+        db.flush()
+
+        db.bulk_insert_mappings(RAGUploadChunks, [
+            {
+                "upload_id": upload.id,
+                "namespace": result.namespace,
+                "vector_id": vector_id,
+                "chunk_index": chunk_index,
+                "content_hash": chunk_hash
+            }
+            for chunk_index, (vector_id, chunk_hash) in enumerate(zip(result.vector_ids, result.content_hashes))
+        ])
+        return upload, stale
+
+    def delete_stale_vectors(self, stale: Dict[str, List[str]]) -> int:
+        """Yeniden yüklemede geride kalan vektörleri siler; hata olursa uzlaştırmaya bırakır"""
+        try:
+            return self._delete_vectors(stale)
+        except Exception as e:
+            print(f"Eski vektörler silinemedi, uzlaştırma ile temizlenecek: {e}")
+            return 0
+
+    def delete(self, upload_id: int) -> Optional[dict]:
+        """Yüklemeyi ve vektörlerini siler; yükleme yoksa None döndürür.
+
+        Önce vektörler silinir: depo hatası olursa kayıt korunur ve silme tekrar
+        denenebilir. RAG devre dışıysa yalnızca kayıt silinir, vektörler sonraki
+        uzlaştırmada temizlenir.
+        """
+        db = SessionLocal()
+        try:
+            upload = db.query(RAGUploads).filter(RAGUploads.id == upload_id).first()
+            if not upload:
+                return None
+
+            filename = upload.filename
+            rows = db.query(RAGUploadChunks.namespace, RAGUploadChunks.vector_id).filter(
+                RAGUploadChunks.upload_id == upload_id
+            ).all()
+
+            deleted = 0
+            if rows and self.rag_service.config.is_rag_enabled:
+                deleted = self._delete_vectors(_group_by_namespace(rows))
+
+            self._remove_upload_rows(db, [upload_id])
+            db.commit()
+
+            return {
+                "filename": filename,
+                "tracked_vectors": len(rows),
+                "deleted_vectors": deleted
+            }
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def reconcile(self, apply: bool = False) -> dict:
+        """Depodaki vektörleri yükleme kayıtlarıyla karşılaştırır.
+
+        Kaydı olmayan vektörler, parça kaydı tutulmadan önce yüklenmiş ve hâlâ
+        duran bir dokümana aitse (metadata'daki dosya adı ve namespace eşleşirse)
+        o yüklemeye bağlanır; diğerleri yetimdir. apply=False yalnızca rapor
+        üretir, apply=True yetim vektörleri siler ve eşleşenleri kaydeder.
+        """
+        from services.ingest_jobs import running_jobs_filter
+
+        vector_store = self._vector_store()
+
+        db = SessionLocal()
+        try:
+            if apply and db.query(RAGIngestJobs.id).filter(running_jobs_filter()).first():
+                # İşlenen dokümanın vektörleri kaydedilmeden önce depoya yazılır, yetim sanılıp silinmemeli
+                # (heartbeat'i kesilmiş, yani worker'ı ölmüş işler beklenmez)
+                raise IngestInProgressError("Devam eden yükleme işleri var, bitmelerini bekleyin")
+
+            tracked = defaultdict(set)
+            for namespace, vector_id in db.query(RAGUploadChunks.namespace, RAGUploadChunks.vector_id):
+                tracked[namespace or ""].add(vector_id)
+
+            # Parça kaydı olmayan eski yüklemeler: (namespace, dosya adı) -> upload_id
+            legacy = {}
+            tracked_upload_ids = select(RAGUploadChunks.upload_id).distinct()
+            for upload in db.query(RAGUploads).filter(~RAGUploads.id.in_(tracked_upload_ids)):
+                for namespace in self.rag_service.search_namespaces(upload.specialty):
+                    legacy.setdefault((namespace, upload.filename), upload.id)
+        finally:
+            db.close()
+
+        report = {
+            "dry_run": not apply,
+            "scanned_vectors": 0,
+            "orphaned_vectors": 0,
+            "adopted_vectors": 0,
+            "deleted_vectors": 0,
+            "missing_vectors": 0,
+            "namespaces": {},
+            "orphan_samples": []
+        }
+        orphans: Dict[str, List[str]] = defaultdict(list)
+        adopted_rows = []
+
+        for namespace in sorted(vector_store.list_namespaces()):
+            known = tracked.get(namespace, set())
+            scanned = present = 0
+            namespace_orphans = []
+            for page in vector_store.list_ids(namespace):
+                scanned += len(page)
+                untracked = [vector_id for vector_id in page if vector_id not in known]
+                present += len(page) - len(untracked)
+                if not untracked:
+                    continue
+
+                has_legacy = any(key[0] == namespace for key in legacy)
+                metadata = vector_store.fetch_metadata(untracked, namespace=namespace) if has_legacy else {}
+                for vector_id in untracked:
+                    meta = metadata.get(vector_id, {})
+                    upload_id = legacy.get((namespace, meta.get("filename")))
+                    if upload_id is not None:
+                        adopted_rows.append({
+                            "upload_id": upload_id,
+                            "namespace": namespace,
+                            "vector_id": vector_id,
+                            "chunk_index": meta.get("chunk_index")
+                        })
+                    else:
+                        namespace_orphans.append(vector_id)
+
+            report["scanned_vectors"] += scanned
+            # Kaydı olup depoda bulunmayan vektörler (yalnızca raporlanır)
+            report["missing_vectors"] += len(known) - present
+            report["namespaces"][namespace] = {"scanned": scanned, "orphaned": len(namespace_orphans)}
+            orphans[namespace].extend(namespace_orphans)
+
+        # Hiç vektörü kalmamış namespace'lerdeki kayıtlar da eksik sayılır
+        report["missing_vectors"] += sum(
+            len(ids) for namespace, ids in tracked.items() if namespace not in report["namespaces"]
+        )
+
+        report["orphaned_vectors"] = sum(len(ids) for ids in orphans.values())
+        report["adopted_vectors"] = len(adopted_rows)
+        report["orphan_samples"] = [
+            {"namespace": namespace, "vector_id": vector_id}
+            for namespace, ids in orphans.items() for vector_id in ids
+        ][:ORPHAN_SAMPLE_SIZE]
+
+        if apply:
+            if adopted_rows:
+                db = SessionLocal()
+                try:
+                    db.bulk_insert_mappings(RAGUploadChunks, adopted_rows)
+                    db.commit()
+                finally:
+                    db.close()
+            report["deleted_vectors"] = self._delete_vectors(orphans)
+
+        print(f"RAG uzlaştırma: {report['scanned_vectors']} vektör tarandı, {report['orphaned_vectors']} yetim, "
+              f"{report['adopted_vectors']} eski yüklemeye bağlandı, {report['deleted_vectors']} silindi")
+        return report
+
+
+def create_rag_document_manager() -> RAGDocumentManager:
+    from services.rag_service import rag_service
+    return RAGDocumentManager(rag_service)
+
+
+# Global doküman yöneticisi
+rag_document_manager = create_rag_document_manager()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="RAG vektör deposunu yükleme kayıtlarıyla uzlaştırır")
+    parser.add_argument("--apply", action="store_true", help="Yetim vektörleri sil (varsayılan: yalnızca rapor)")
+    args = parser.parse_args()
+    print(json.dumps(rag_document_manager.reconcile(apply=args.apply), ensure_ascii=False, indent=2))
@@ -1,6 +1,45 @@
+import hashlib
 import os
-from typing import Optional, List
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Optional, List, Callable, Set
 from config.rag_config import RAGConfig
+from services.context_packer import create_context_packer, estimate_tokens
+from services.metrics import consultation_stage_seconds, pdf_page_extract_seconds, rag_context_tokens, specialty_label
+from services.pdf_extractor import create_pdf_extractor
+from services.query_cache import QueryCache
+from services.single_flight import SingleFlight
+from services.response_cache import normalize_prompt
+from services.vector_store import VectorMatch
+
+def content_hash(text: str) -> str:
+    """Parça metninin SHA-256 özeti; Unicode biçimi ve boşluk farkları aynı içerik sayılır"""
+    normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def document_id_prefix(filename: str) -> str:
+    """Dokümanın tüm vektör id'lerinde ortak önek (dosya adından türetilir, süreçten bağımsızdır)"""
+    return "doc_" + hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class IngestResult:
+    """Bir PDF yüklemesinin vektör deposundaki parçaları (değişmediği için atlananlar dahil)"""
+    namespace: str
+    vector_ids: List[str] = field(default_factory=list)
+    content_hashes: List[str] = field(default_factory=list)
+    embedded_count: int = 0
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.vector_ids)
+
+    @property
+    def skipped_count(self) -> int:
+        return self.chunk_count - self.embedded_count
+
 
 class RAGService:
     """RAG (Retrieval-Augmented Generation) servisi"""
@@ -8,9 +47,31 @@ class RAGService:
     def __init__(self):
         self.config = RAGConfig()
         self.is_initialized = False
+        # Aynı sorgu metni için transformer tekrar çalıştırılmaz; arama sonuçları kısa süre saklanır
+        self.embedding_cache = QueryCache(max_size=self.config.query_embedding_cache_size)
+        self.result_cache = QueryCache(
+            max_size=self.config.result_cache_size,
+            ttl=self.config.result_cache_ttl
+        )
+        self.pdf_extractor = create_pdf_extractor(self.config)
+        self.context_packer = create_context_packer(self.config)
+        self._namespace_counts = None  # (zaman, {namespace: vektör sayısı})
+        # Eşzamanlı ilk istekler modeli tek seferde yükler; başarısızlıkta tekrar deneme aralığı artar
+        self._init_flight = SingleFlight("RAG servisi başlatma", is_failure=lambda success: not success)
+        # Başlangıç ısınması durumu: disabled, pending, warming, warm, failed
+        self.warmup_status = "disabled"
+        self.warmup_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
         
     def initialize(self) -> bool:
-        """RAG servisini başlat"""
+        """RAG servisini başlat - aynı anda gelen çağrılar tek bir başlatmayı bekler"""
+        if self.is_initialized:
+            return True
+        return self._init_flight.do(self._initialize)
+    
+    def _initialize(self) -> bool:
+        if self.is_initialized:
+            return True
         try:
             if not self.config.is_rag_enabled:
                 print("RAG sistemi devre dışı")
@@ -29,101 +90,303 @@ class RAGService:
             print(f"RAG servisi başlatma hatası: {e}")
             return False
     
-    def get_enhanced_context(self, query: str) -> str:
-        """Sorgu için geliştirilmiş bağlam getir"""
+    def warm_up(self) -> bool:
+        """Modeli yükler, örnek bir encode ve vektör araması yaparak ilk isteğin gecikmesini önler.
+
+        Uygulama başlangıcında arka plan thread'inde çalıştırılır (RAG_WARMUP=true).
+        """
+        import time
+        start_time = time.time()
+        self.warmup_status = "warming"
+        self.warmup_error = None
+        
+        try:
+            if not self.is_initialized and not self.initialize():
+                raise RuntimeError("RAG servisi başlatılamadı")
+            
+            # İlk forward pass çekirdekleri ve tokenizer önbelleklerini hazırlar
+            embedding = self.config.embedding_model.encode("ısınma sorgusu").tolist()
+            # Vektör deposu bağlantısını da açar (Pinecone için HTTP bağlantı havuzu)
+            self.config.vector_store.query(embedding, top_k=1)
+            self._populated_namespaces()
+            
+            self.warmup_status = "warm"
+            self.warmup_seconds = round(time.time() - start_time, 2)
+            print(f"RAG ısınması tamamlandı: {self.warmup_seconds} saniye")
+            return True
+        
+        except Exception as e:
+            self.warmup_status = "failed"
+            self.warmup_error = str(e)
+            self.warmup_seconds = round(time.time() - start_time, 2)
+            print(f"RAG ısınma hatası: {e}")
+            return False
+    
+    def get_warmup_status(self) -> dict:
+        return {
+            "status": self.warmup_status,
+            "initialized": self.is_initialized,
+            "initialization": self._init_flight.get_stats(),
+            "seconds": self.warmup_seconds,
+            "error": self.warmup_error
+        }
+    
+    @staticmethod
+    def namespace_for(specialty: Optional[str]) -> str:
+        """Uzmanlık dalının vektör namespace'i (dal verilmezse varsayılan namespace)"""
+        return (specialty or "").strip().lower()
+    
+    def search_namespaces(self, specialty: Optional[str]) -> List[str]:
+        """Uzmanlık dalı için aranacak namespace'ler (eski yüklemeler için varsayılan namespace dahil)"""
+        namespace = self.namespace_for(specialty)
+        namespaces = [namespace]
+        if namespace and namespace == self.config.legacy_namespace_specialty:
+            namespaces.append("")
+        return namespaces
+    
+    def _populated_namespaces(self) -> dict:
+        """Vektör içeren namespace'ler; depo her sorguda sorgulanmasın diye kısa süre saklanır"""
+        import time
+        cached = self._namespace_counts
+        if cached is not None and time.time() - cached[0] < self.config.namespace_cache_ttl:
+            return cached[1]
+        counts = self.config.vector_store.list_namespaces()
+        self._namespace_counts = (time.time(), counts)
+        return counts
+    
+    def retrieve(self, query: str, specialty: str = None, top_k: Optional[int] = None,
+                 namespaces: Optional[List[str]] = None) -> List[VectorMatch]:
+        """Sorguya en benzer parçalar, skora göre azalan sırada (eşik uygulanmaz)"""
+        metric_label = specialty_label(specialty)
+        top_k = top_k or self.config.search_top_k
+        
+        # Dokümanı olmayan dallar için embedding ve arama yapılmaz
+        populated = self._populated_namespaces()
+        namespaces = [namespace for namespace in (namespaces or self.search_namespaces(specialty)) if populated.get(namespace)]
+        if not namespaces:
+            return []
+        
+        # Sorguyu vektöre çevir - model büyük/küçük harf duyarsız olduğu için normalleştirilmiş metin anahtar
+        with consultation_stage_seconds.time(stage="query_embedding", specialty=metric_label):
+            normalized = normalize_prompt(query)
+            query_embedding = self.embedding_cache.get(normalized)
+            if query_embedding is None:
+                query_embedding = self.config.embedding_model.encode(query).tolist()
+                self.embedding_cache.set(normalized, query_embedding)
+        
+        # Vektör deposunda (Pinecone veya yerel) sadece ilgili namespace'lerde ara
+        with consultation_stage_seconds.time(stage="vector_search", specialty=metric_label):
+            matches = []
+            for namespace in namespaces:
+                matches.extend(self.config.vector_store.query(query_embedding, top_k=top_k, namespace=namespace))
+        return sorted(matches, key=lambda match: match.score, reverse=True)[:top_k]
+    
+    def get_enhanced_context(self, query: str, specialty: str = None) -> str:
+        """Sorgu için geliştirilmiş bağlam getir - sadece uzmanlık dalının namespace'inde arar"""
         if not self.is_initialized:
             print("RAG servisi başlatılmamış")
             return ""
-            
+        
+        metric_label = specialty_label(specialty)
+        namespaces = self.search_namespaces(specialty)
+        cache_key = (tuple(namespaces), normalize_prompt(query))
+        cached_context = self.result_cache.get(cache_key)
+        if cached_context is not None:
+            print("RAG bağlamı önbellekten alındı")
+            rag_context_tokens.observe(estimate_tokens(cached_context, self.config.context_chars_per_token), specialty=metric_label)
+            return cached_context
+        
         try:
-            # Sorguyu vektöre çevir
-            query_embedding = self.config.embedding_model.encode(query).tolist()
-            
-            # Pinecone'da benzer vektörleri ara
-            index = self.config.pinecone_client.Index(self.config.index_name)
-            results = index.query(
-                vector=query_embedding,
-                top_k=5,  # Daha fazla sonuç al, sonra filtrele
-                include_metadata=True
-            )
-            
-            # Benzerlik skoru eşiği (0.5 = %50 benzerlik)
-            similarity_threshold = 0.5
+            matches = self.retrieve(query, specialty, namespaces=namespaces)
             
-            # Sonuçları filtrele ve birleştir
-            context_parts = []
-            for match in results.matches:
-                # Benzerlik skorunu kontrol et
-                if match.score >= similarity_threshold:
-                    if match.metadata and 'text' in match.metadata:
-                        context_parts.append(f"İlgili Bilgi (Benzerlik: {match.score:.2f}): {match.metadata['text']}")
-                        print(f"RAG sonucu bulundu - Benzerlik skoru: {match.score:.2f}")
-                else:
-                    print(f"Düşük benzerlik skoru: {match.score:.2f} - Bu sonuç kullanılmıyor")
+            similarity_threshold = self.config.similarity_threshold
+            relevant = [match for match in matches if match.score >= similarity_threshold]
+            if len(relevant) < len(matches):
+                print(f"Düşük benzerlik skorlu {len(matches) - len(relevant)} sonuç kullanılmıyor")
             
-            if context_parts:
-                return "\n\n".join(context_parts)
+            # Skor sırasıyla, tekrar eden parçalar atlanarak token bütçesine sığdırılır
+            packed = self.context_packer.pack(relevant, query)
+            if packed.passages:
+                context = packed.text
+                print(f"RAG bağlamı: {len(packed.passages)} parça, ~{packed.tokens} token "
+                      f"({packed.duplicates_dropped} tekrar atlandı, bütçe {self.config.context_token_budget})")
             else:
                 print("Benzerlik eşiğini geçen sonuç bulunamadı")
-                return ""
+                context = ""
+            
+            rag_context_tokens.observe(packed.tokens, specialty=metric_label)
+            self.result_cache.set(cache_key, context)
+            return context
                 
         except Exception as e:
             print(f"RAG bağlam getirme hatası: {e}")
             return ""
     
-    def process_pdf_and_upload(self, file_content: bytes, filename: str, description: str = None) -> bool:
-        """PDF dosyasını işle ve Pinecone'a yükle"""
+    def split_into_chunks(self, text: str) -> List[str]:
+        """Metni RAG_CHUNK_SIZE / RAG_CHUNK_OVERLAP ayarlarına göre örtüşen parçalara böler.
+
+        Bölme önce paragraf, sonra satır, cümle ve kelime sınırlarında yapılır.
+        """
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        
+        chunk_size = max(self.config.chunk_size, 1)
+        chunk_overlap = min(max(self.config.chunk_overlap, 0), chunk_size - 1)
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+        return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+    
+    def ingest_pdf(self, file_content: bytes, filename: str, description: str = None,
+                   progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                   specialty: str = None, existing_ids: Optional[Set[str]] = None) -> IngestResult:
+        """PDF dosyasından metni çıkarır ve ingest_text ile uzmanlık dalının namespace'ine yükler.
+
+        Hata durumunda exception fırlatır; dokümanın vektör id'lerini döndürür.
+        progress_callback(stage, processed, total) her aşama değişiminde çağrılır;
+        stage: extracting, embedding, upserting.
+        """
         if not self.is_initialized:
-            print("RAG servisi başlatılmamış")
-            return False
-            
-        try:
-            # PyPDF2 ile PDF'den metin çıkar
-            import PyPDF2
-            import io
-            
-            # PDF dosyasını oku
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            
-            # Tüm sayfalardan metin çıkar
-            text_content = ""
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text_content += page.extract_text() + "\n"
-            
-            # Eğer açıklama varsa ekle
+            raise RuntimeError("RAG servisi başlatılmamış")
+        
+        if progress_callback:
+            progress_callback("extracting", 0, 0)
+        
+        # Sayfalar süreç havuzunda paralel çıkarılır ve sırasıyla birleştirilir
+        extraction = self.pdf_extractor.extract(file_content)
+        for seconds in extraction.page_timings:
+            pdf_page_extract_seconds.observe(seconds)
+        slowest = ", ".join(f"s.{page}: {seconds:.2f}s" for page, seconds in extraction.slowest_pages())
+        print(f"PDF '{filename}': {len(extraction.pages)} sayfa {extraction.total_seconds:.2f} saniyede çıkarıldı "
+              f"({'paralel' if extraction.parallel else 'tek süreç'}; en yavaş: {slowest or '-'})")
+        text_content = extraction.text
+        
+        # Eğer açıklama varsa ekle
+        if description:
+            text_content = f"Açıklama: {description}\n\n" + text_content
+        
+        # PDF'den metin çıkarılamadıysa fallback
+        if not text_content.strip():
+            text_content = f"PDF içeriği: {filename}"
             if description:
-                text_content = f"Açıklama: {description}\n\n" + text_content
-            
-            # PDF'den metin çıkarılamadıysa fallback
-            if not text_content.strip():
-                text_content = f"PDF içeriği: {filename}"
-                if description:
-                    text_content += f"\nAçıklama: {description}"
-            
-            # Metni vektöre çevir
-            embedding = self.config.embedding_model.encode(text_content).tolist()
+                text_content += f"\nAçıklama: {description}"
+        
+        return self.ingest_text(text_content, filename, description, progress_callback, specialty, existing_ids)
+    
+    def ingest_text(self, text_content: str, filename: str, description: str = None,
+                    progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                    specialty: str = None, existing_ids: Optional[Set[str]] = None) -> IngestResult:
+        """Metni parçalara böl, toplu halde vektöre çevir ve uzmanlık dalının namespace'ine yükle.
+
+        Vektör id'si doküman öneki ve parça içeriğinin özetinden oluşur; aynı
+        içerik her süreçte aynı id'yi üretir. existing_ids (önceki yüklemenin
+        id'leri) içinde olup depoda hâlâ bulunan parçalar yeniden embed edilmez.
+        """
+        if not self.is_initialized:
+            raise RuntimeError("RAG servisi başlatılmamış")
+        
+        def report(stage: str, processed: int = 0, total: int = 0):
+            if progress_callback:
+                progress_callback(stage, processed, total)
+        
+        chunks = self.split_into_chunks(text_content)
+        chunk_count = len(chunks)
+        print(f"PDF '{filename}' {chunk_count} parçaya bölündü")
+        
+        vector_store = self.config.vector_store
+        namespace = self.namespace_for(specialty)
+        prefix = document_id_prefix(filename)
+        
+        # Aynı metne sahip parçalar tek vektör olarak tutulur: (chunk_index, metin, özet, id)
+        entries = []
+        seen_ids = set()
+        for chunk_index, chunk in enumerate(chunks):
+            chunk_hash = content_hash(chunk)
+            vector_id = f"{prefix}#{chunk_hash}"
+            if vector_id not in seen_ids:
+                seen_ids.add(vector_id)
+                entries.append((chunk_index, chunk, chunk_hash, vector_id))
+        
+        # Önceki yüklemede olan ve depoda duran parçalar atlanır
+        unchanged = set()
+        candidates = [vector_id for _, _, _, vector_id in entries if existing_ids and vector_id in existing_ids]
+        if candidates:
+            unchanged = set(vector_store.fetch_metadata(candidates, namespace=namespace))
+        pending = [entry for entry in entries if entry[3] not in unchanged]
+        if unchanged:
+            print(f"PDF '{filename}': {len(unchanged)} parça değişmediği için atlandı, {len(pending)} parça işlenecek")
+        
+        upsert_batch_size = max(self.config.upsert_batch_size, 1)
+        pending_count = len(pending)
+        
+        # Her yükleme grubu kendi içinde toplu encode edilir; tüm doküman belleğe vektör olarak alınmaz
+        for start in range(0, pending_count, upsert_batch_size):
+            batch = pending[start:start + upsert_batch_size]
+            report("embedding", start, pending_count)
+            embeddings = self.config.embedding_model.encode(
+                [chunk for _, chunk, _, _ in batch],
+                batch_size=max(self.config.embedding_batch_size, 1),
+                show_progress_bar=False
+            )
             
-            # Pinecone'a yükle
-            index = self.config.pinecone_client.Index(self.config.index_name)
-            index.upsert(
-                vectors=[{
-                    'id': f"doc_{filename}_{hash(text_content)}",
-                    'values': embedding,
+            vectors = []
+            for (chunk_index, chunk, chunk_hash, vector_id), embedding in zip(batch, embeddings):
+                vectors.append({
+                    'id': vector_id,
+                    'values': embedding.tolist(),
                     'metadata': {
-                        'text': text_content,
+                        'text': chunk,
                         'filename': filename,
-                        'description': description or ""
+                        'description': description or "",
+                        'chunk_index': chunk_index,
+                        'chunk_count': chunk_count,
+                        'content_hash': chunk_hash,
+                        'specialty': namespace
                     }
-                }]
-            )
+                })
             
-            print(f"PDF '{filename}' başarıyla RAG sistemine yüklendi")
+            report("upserting", start, pending_count)
+            vector_store.upsert(vectors, namespace=namespace)
+            print(f"PDF '{filename}': {start + len(batch)}/{pending_count} parça yüklendi")
+        
+        # Yeni doküman eski arama sonuçlarını ve namespace listesini geçersiz kılar
+        self.invalidate_search_caches()
+        
+        print(f"PDF '{filename}' başarıyla RAG sistemine yüklendi")
+        return IngestResult(
+            namespace=namespace,
+            vector_ids=[vector_id for _, _, _, vector_id in entries],
+            content_hashes=[chunk_hash for _, _, chunk_hash, _ in entries],
+            embedded_count=pending_count
+        )
+    
+    def process_pdf_and_upload(self, file_content: bytes, filename: str, description: str = None,
+                               progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                               specialty: str = None) -> bool:
+        """PDF dosyasını işle ve vektör deposuna yükle; başarı durumunu döndürür"""
+        if not self.is_initialized:
+            print("RAG servisi başlatılmamış")
+            return False
+        
+        try:
+            self.ingest_pdf(file_content, filename, description, progress_callback, specialty)
             return True
-            
         except Exception as e:
             print(f"PDF yükleme hatası: {e}")
             return False
+    
+    def invalidate_search_caches(self):
+        """Doküman eklenip silindiğinde saklanan arama sonuçlarını ve namespace sayılarını temizler"""
+        self.result_cache.clear()
+        self._namespace_counts = None
+    
+    def get_cache_stats(self) -> dict:
+        """Sorgu embedding ve arama sonucu önbelleklerinin sayaçları"""
+        return {
+            "query_embedding_cache": self.embedding_cache.get_stats(),
+            "result_cache": self.result_cache.get_stats()
+        }
 
 # Global RAG servisi instance'ı
 rag_service = RAGService() 
\ No newline at end of file
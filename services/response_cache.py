@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, List
+
+
+def _fingerprint(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Büyük/küçük harf ve boşluk farklarını yok sayan normalleştirme"""
+    return re.sub(r"\s+", " ", prompt).strip().lower()
+
+
+class ConsultationResponseCache:
+    """Konsültasyon yanıtları için TTL ve boyut sınırlı LRU önbellek.
+
+    Anahtar; hasta, uzmanlık dalı, normalleştirilmiş prompt, RAG bağlamının
+    özeti ve sohbet geçmişinin özetinden oluşur. Aynı vaka metni tekrar
+    gönderildiğinde (sayfa yenileme, çift tıklama) Gemini çağrısı ve yeni
+    kayıtlar atlanır; önceki gönderimin tedavi planı döndürülür.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 10_000_000, ttl: float = 600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # key -> {"value", "expires_at", "size"}
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def _history_before_repeat(prompt: str, chat_history: List) -> List:
+        """Geçmiş bu prompt'un soru-cevabıyla bitiyorsa o çift çıkarılır.
+
+        Her gönderim memory'e eklendiği için aksi halde aynı vakanın tekrar
+        gönderilmesi hiçbir zaman ilk gönderimin anahtarını üretmezdi.
+        """
+        if len(chat_history) >= 2 and chat_history[-2].type == "human":
+            question = re.sub(r"^soru:\s*", "", normalize_prompt(str(chat_history[-2].content)))
+            if question == normalize_prompt(prompt):
+                return chat_history[:-2]
+        return chat_history
+
+    @classmethod
+    def make_key(cls, scope: str, specialty: str, prompt: str, rag_context: str, chat_history: List) -> str:
+        """scope: yanıtın ve kayıtlarının ait olduğu hasta/doktor (ör. "doktor_id:hasta_id")"""
+        history = json.dumps(
+            [[message.type, str(message.content)] for message in cls._history_before_repeat(prompt, chat_history)],
+            ensure_ascii=False
+        )
+        parts = [
+            scope,
+            specialty.lower(),
+            normalize_prompt(prompt),
+            _fingerprint(rag_context or ""),
+            _fingerprint(history)
+        ]
+        return _fingerprint("\x1f".join(parts))
+
+    @staticmethod
+    def _size(value: dict) -> int:
+        return sum(len(str(item).encode("utf-8")) for item in value.values())
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry["size"]
+
+    def _evict(self, now: float):
+        """Süresi dolanları ve limit aşımını en eskiden başlayarak temizler"""
+        for key in [key for key, entry in self._entries.items() if entry["expires_at"] <= now]:
+            self._remove(key)
+            self.evictions += 1
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires_at"] <= now:
+                if entry is not None:
+                    self._remove(key)
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return dict(entry["value"])
+
+    def set(self, key: str, value: dict):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            size = self._size(value)
+            self._entries[key] = {"value": dict(value), "expires_at": now + self.ttl, "size": size}
+            self._total_bytes += size
+            self._evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Global yanıt önbelleği
+response_cache = ConsultationResponseCache(
+    max_entries=int(os.getenv("AI_RESPONSE_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("AI_RESPONSE_CACHE_MAX_BYTES", "10000000")),
+    ttl=float(os.getenv("AI_RESPONSE_CACHE_TTL", "600"))
+)
@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _FlightState:
+    """Başarısız denemeler sonrası üstel bekleme (backoff) durumu"""
+
+    def __init__(self, name: str, backoff_base: float, backoff_max: float,
+                 is_failure: Optional[Callable[[Any], bool]]):
+        self.name = name
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.is_failure = is_failure or (lambda result: False)
+        self.failures = 0
+        self.retry_at = 0.0
+        self.last_error: Optional[BaseException] = None
+        self.last_result: Any = None
+        self.calls = 0
+        self.shared = 0
+
+    def in_backoff(self) -> bool:
+        return self.failures > 0 and time.monotonic() < self.retry_at
+
+    def backoff_outcome(self):
+        """Bekleme süresi dolmadan gelen çağrılara son başarısız sonucu döndürür"""
+        if self.last_error is not None:
+            raise self.last_error
+        return self.last_result
+
+    def record(self, result: Any = None, error: Optional[BaseException] = None):
+        if error is None and not self.is_failure(result):
+            self.failures = 0
+            self.retry_at = 0.0
+            self.last_error = None
+            self.last_result = None
+            return
+
+        self.failures += 1
+        delay = min(self.backoff_base * (2 ** (self.failures - 1)), self.backoff_max)
+        self.retry_at = time.monotonic() + delay
+        self.last_error = error
+        self.last_result = result
+        print(f"{self.name} başarısız ({self.failures}. deneme), {delay:.1f} saniye sonra tekrar denenecek")
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "shared": self.shared,
+            "consecutive_failures": self.failures,
+            "retry_in_seconds": round(max(self.retry_at - time.monotonic(), 0.0), 1) if self.failures else 0.0
+        }
+
+
+class SingleFlight:
+    """Aynı anda gelen çağrılardan yalnızca birini çalıştırır (thread'ler için).
+
+    İlk çağıran fonksiyonu çalıştırır, diğerleri aynı sonucu (veya hatayı)
+    bekler. Başarısızlıktan sonra backoff süresi dolana kadar gelen çağrılar
+    fonksiyonu tekrar çalıştırmadan son başarısız sonucu alır; süre her ardışık
+    hatada ikiye katlanır. is_failure, hata fırlatmak yerine False gibi bir
+    değer döndüren başlatıcılar için başarısızlığı tanımlar.
+    """
+
+    def __init__(self, name: str, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 is_failure: Optional[Callable[[Any], bool]] = None):
+        self._state = _FlightState(name, backoff_base, backoff_max, is_failure)
+        self._lock = threading.Lock()
+        self._current: Optional[dict] = None
+
+    def do(self, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self._state.calls += 1
+            if self._current is None and self._state.in_backoff():
+                return self._state.backoff_outcome()
+
+            call = self._current
+            leader = call is None
+            if leader:
+                call = {"event": threading.Event(), "result": None, "error": None}
+                self._current = call
+            else:
+                self._state.shared += 1
+
+        if not leader:
+            call["event"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn(*args, **kwargs)
+        except BaseException as e:
+            call["error"] = e
+        finally:
+            with self._lock:
+                self._state.record(call["result"], call["error"])
+                self._current = None
+            call["event"].set()
+
+        if call["error"] is not None:
+            raise call["error"]
+        return call["result"]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return self._state.get_stats()
+
+
+class AsyncSingleFlight:
+    """SingleFlight'ın event loop içindeki coroutine'ler için karşılığı"""
+
+    def __init__(self, name: str, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 is_failure: Optional[Callable[[Any], bool]] = None):
+        self._state = _FlightState(name, backoff_base, backoff_max, is_failure)
+        self._current: Optional[asyncio.Future] = None  # yalnızca event loop thread'inden erişilir
+
+    async def do(self, coro_fn: Callable, *args, **kwargs):
+        self._state.calls += 1
+        task = self._current
+        if task is None:
+            if self._state.in_backoff():
+                return self._state.backoff_outcome()
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            task.add_done_callback(self._finish)
+            self._current = task
+        else:
+            self._state.shared += 1
+
+        # shield: bekleyen bir istemcinin bağlantısı koparsa ortak çağrı iptal edilmez
+        return await asyncio.shield(task)
+
+    def _finish(self, task: asyncio.Future):
+        self._current = None
+        if task.cancelled():
+            self._state.record(error=asyncio.CancelledError())
+            return
+        error = task.exception()
+        self._state.record(None if error is not None else task.result(), error)
+
+    def get_stats(self) -> dict:
+        return self._state.get_stats()
+
+
+class AsyncSingleFlightGroup:
+    """Anahtar bazında tekilleştirme: aynı anahtarla eşzamanlı gelen coroutine'ler tek çağrıyı paylaşır.
+
+    AsyncSingleFlight'tan farklı olarak backoff uygulanmaz; çağrı bitince
+    anahtar silinir ve sonraki istek yeni bir çağrı başlatır.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._current: Dict[Hashable, asyncio.Future] = {}  # yalnızca event loop thread'inden erişilir
+        self.calls = 0
+        self.shared = 0
+
+    def start(self, key: Hashable, coro_fn: Callable, *args, **kwargs) -> Tuple[asyncio.Future, bool]:
+        """Anahtar için süren görevi veya yeni başlatılanı döndürür: (görev, paylaşıldı mı).
+
+        Senkron çalışır; kontrol ile kayıt arasında başka bir coroutine araya giremez.
+        """
+        self.calls += 1
+        task = self._current.get(key)
+        if task is not None:
+            self.shared += 1
+            return task, True
+
+        task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+        self._current[key] = task
+        task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return task, False
+
+    async def do(self, key: Hashable, coro_fn: Callable, *args, **kwargs):
+        task, _ = self.start(key, coro_fn, *args, **kwargs)
+        # shield: bekleyen bir istemcinin bağlantısı koparsa ortak çağrı iptal edilmez
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._current.get(key) is task:
+            del self._current[key]
+        if not task.cancelled():
+            # Tüm bekleyenler ayrıldıysa "exception was never retrieved" uyarısı verilmez
+            task.exception()
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._current)
+        }
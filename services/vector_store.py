@@ -0,0 +1,641 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: yazmalar yalnızca süreç içinde kilitlenir
+    fcntl = None
+
+# Pinecone tek istekte en fazla 1000 id siler / getirir
+PINECONE_ID_BATCH_SIZE = 1000
+# Metadata ve değer istenmeyen sorgularda Pinecone'un izin verdiği en büyük top_k
+PINECONE_QUERY_TOP_K_LIMIT = 10000
+
+# Yerel depoda bir namespace'in segment listesi
+LOCAL_MANIFEST_FILE = "manifest.json"
+# Bu sayıyı aşan segmentler tek dosyada birleştirilir
+LOCAL_MAX_SEGMENTS = 32
+
+
+@dataclass
+class VectorMatch:
+    """Vektör aramasında dönen tek sonuç (score: kosinüs benzerliği)"""
+    id: str
+    score: float
+    metadata: dict = field(default_factory=dict)
+
+
+def _field(obj, name: str, default=None):
+    """Pinecone yanıt nesnelerinden (dict veya model) alan okur"""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+class VectorStore:
+    """RAG vektör deposu arayüzü.
+
+    upsert() kayıtları Pinecone ile aynı biçimde alır:
+    {'id': str, 'values': List[float], 'metadata': dict}
+    namespace verilmezse varsayılan namespace kullanılır.
+    """
+
+    name = "base"
+
+    def upsert(self, vectors: List[dict], namespace: Optional[str] = None):
+        raise NotImplementedError
+
+    def query(self, vector: List[float], top_k: int = 5, namespace: Optional[str] = None) -> List[VectorMatch]:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        raise NotImplementedError
+
+    def list_namespaces(self) -> Dict[str, int]:
+        """Vektör içeren namespace'ler ve vektör sayıları (varsayılan namespace: "")"""
+        raise NotImplementedError
+
+    def list_ids(self, namespace: Optional[str] = None) -> Iterator[List[str]]:
+        """Namespace'deki tüm vektör id'lerini sayfa sayfa döndürür (uzlaştırma için)"""
+        raise NotImplementedError
+
+    def fetch_metadata(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, dict]:
+        """Verilen id'lerin metadata'sı; bulunamayan id'ler sonuçta yer almaz"""
+        raise NotImplementedError
+
+    def health_check(self) -> bool:
+        return True
+
+    def get_stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class PineconeVectorStore(VectorStore):
+    """Pinecone üzerinde barındırılan index.
+
+    Index handle'ı bir kez oluşturulup saklanır; handle içindeki HTTP bağlantı
+    havuzu keep-alive ile tekrar kullanılır, her sorgu yalnızca kendi isteğini
+    yapar. Bir çağrı bağlantı hatasıyla düşerse handle yeniden oluşturulur ve
+    çağrı bir kez tekrarlanır.
+    """
+
+    name = "pinecone"
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._handle = None
+        self._created_at: Optional[float] = None
+        self._last_success: Optional[float] = None
+        self.reconnects = 0
+
+    def _index(self):
+        handle = self._handle
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            if self._handle is None:
+                handle = self.config.get_index()
+                if handle is None:
+                    raise RuntimeError("Pinecone client başlatılmamış")
+                self._handle = handle
+                self._created_at = time.time()
+            return self._handle
+
+    def _reconnect(self, stale_handle):
+        with self._lock:
+            # Başka bir thread zaten yenilediyse tekrar oluşturma
+            if self._handle is stale_handle:
+                self._handle = None
+                self.reconnects += 1
+        return self._index()
+
+    def _call(self, operation):
+        handle = self._index()
+        try:
+            result = operation(handle)
+        except Exception as e:
+            print(f"Pinecone çağrısı başarısız, bağlantı yenileniyor: {e}")
+            result = operation(self._reconnect(handle))
+        self._last_success = time.time()
+        return result
+
+    def upsert(self, vectors: List[dict], namespace: Optional[str] = None):
+        self._call(lambda index: index.upsert(vectors=vectors, namespace=namespace or ""))
+
+    def query(self, vector: List[float], top_k: int = 5, namespace: Optional[str] = None) -> List[VectorMatch]:
+        results = self._call(lambda index: index.query(
+            vector=vector,
+            top_k=top_k,
+            namespace=namespace or "",
+            include_metadata=True
+        ))
+        return [
+            VectorMatch(id=match.id, score=match.score, metadata=match.metadata or {})
+            for match in results.matches
+        ]
+
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        ids = list(ids)
+        for start in range(0, len(ids), PINECONE_ID_BATCH_SIZE):
+            batch = ids[start:start + PINECONE_ID_BATCH_SIZE]
+            self._call(lambda index: index.delete(ids=batch, namespace=namespace or ""))
+
+    def list_ids(self, namespace: Optional[str] = None) -> Iterator[List[str]]:
+        """Namespace'deki id'ler.
+
+        index.list() yalnızca pinecone-client 3.1+ ve serverless index'lerde
+        çalışır. Desteklenmiyorsa (pod tabanlı index) namespace'in tüm vektörleri
+        tek bir sorguyla döndürülür; bu yol namespace başına en fazla
+        PINECONE_QUERY_TOP_K_LIMIT vektörü kapsar, daha büyük namespace'lerde
+        NotImplementedError fırlatılır.
+        """
+        index = self._index()
+        pages = index.list(namespace=namespace or "") if hasattr(index, "list") else None
+        if pages is not None:
+            try:
+                first_page = next(pages, None)
+            except Exception as e:
+                print(f"Pinecone id listeleme desteklenmiyor, sorgu ile taranacak: {e}")
+                pages = None
+            else:
+                if first_page is not None:
+                    yield list(first_page)
+                    for page in pages:
+                        yield list(page)
+                return
+
+        yield self._query_all_ids(namespace)
+
+    def _query_all_ids(self, namespace: Optional[str]) -> List[str]:
+        count = self.list_namespaces().get(namespace or "", 0)
+        if not count:
+            return []
+        if count > PINECONE_QUERY_TOP_K_LIMIT:
+            raise NotImplementedError(
+                f"'{namespace or ''}' namespace'inde {count} vektör var; pod tabanlı index'lerde sorgu ile en fazla "
+                f"{PINECONE_QUERY_TOP_K_LIMIT} id listelenebilir (id listeleme için serverless index gerekir)"
+            )
+
+        # top_k vektör sayısından büyük olduğundan sorgu yönünden bağımsız olarak tüm vektörler döner
+        dimension = self.config.embedding_dimension
+        vector = [1.0 / dimension ** 0.5] * dimension
+        results = self._call(lambda index: index.query(
+            vector=vector,
+            top_k=PINECONE_QUERY_TOP_K_LIMIT,
+            namespace=namespace or "",
+            include_metadata=False,
+            include_values=False
+        ))
+        return [match.id for match in results.matches]
+
+    def fetch_metadata(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, dict]:
+        ids = list(ids)
+        metadata = {}
+        for start in range(0, len(ids), PINECONE_ID_BATCH_SIZE):
+            batch = ids[start:start + PINECONE_ID_BATCH_SIZE]
+            response = self._call(lambda index: index.fetch(ids=batch, namespace=namespace or ""))
+            for vector_id, vector in (_field(response, "vectors") or {}).items():
+                metadata[vector_id] = _field(vector, "metadata") or {}
+        return metadata
+
+    def list_namespaces(self) -> Dict[str, int]:
+        stats = self._call(lambda index: index.describe_index_stats())
+        namespaces = _field(stats, "namespaces") or {}
+        counts = {name: int(_field(info, "vector_count", 0) or 0) for name, info in namespaces.items()}
+        return {name: count for name, count in counts.items() if count}
+
+    def health_check(self) -> bool:
+        """Index'e hafif bir istek atar; başarısızsa handle yeniden oluşturulur"""
+        try:
+            self._call(lambda index: index.describe_index_stats())
+            return True
+        except Exception as e:
+            print(f"Pinecone sağlık kontrolü başarısız: {e}")
+            return False
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        return {
+            "backend": self.name,
+            "index_name": self.config.index_name,
+            "connected": self._handle is not None,
+            "handle_age_seconds": round(now - self._created_at, 1) if self._handle is not None and self._created_at else None,
+            "last_success_seconds_ago": round(now - self._last_success, 1) if self._last_success else None,
+            "reconnects": self.reconnects
+        }
+
+
+class _LocalSegment:
+    """Diskteki değişmez bir vektör dosyası (seg-<n>.npy + seg-<n>.json)"""
+
+    def __init__(self, name: str, matrix: np.ndarray, ids: list, metadata: list):
+        self.name = name
+        self.matrix = matrix
+        self.ids = ids
+        self.metadata = metadata
+
+
+class _PartitionSnapshot:
+    """Bölümün o anki görünümü; okumalar kilitsiz kullanır, yazmalar yenisini oluşturur.
+
+    Aynı id sonraki bir segmentte tekrar yazılmışsa eski satır alive maskesinde
+    kapatılır; positions her id'nin geçerli (segment, satır) konumunu tutar.
+    """
+
+    def __init__(self, segments: List[_LocalSegment] = None, alive: List[np.ndarray] = None, positions: dict = None):
+        self.segments = segments or []
+        self.alive = alive or []
+        self.positions = positions or {}
+
+    def extended(self, segments: List[_LocalSegment]) -> "_PartitionSnapshot":
+        """Yeni segmentler eklenmiş kopya; yalnızca satırı geçersizleşen segmentlerin maskesi kopyalanır"""
+        all_segments = self.segments + segments
+        alive = list(self.alive)
+        positions = dict(self.positions)
+        copied = set()
+
+        for segment in segments:
+            index = len(alive)
+            alive.append(np.ones(len(segment.ids), dtype=bool))
+            for row, vector_id in enumerate(segment.ids):
+                previous = positions.get(vector_id)
+                if previous is not None:
+                    if previous[0] not in copied:
+                        alive[previous[0]] = alive[previous[0]].copy()
+                        copied.add(previous[0])
+                    alive[previous[0]][previous[1]] = False
+                positions[vector_id] = (index, row)
+            copied.add(index)
+
+        return _PartitionSnapshot(all_segments, alive, positions)
+
+    def rows(self, exclude: set = frozenset()):
+        """Geçerli satırlar: (matris, id listesi, metadata listesi)"""
+        matrices, ids, metadata = [], [], []
+        for segment, alive in zip(self.segments, self.alive):
+            keep = [row for row in np.flatnonzero(alive) if segment.ids[row] not in exclude]
+            if keep:
+                matrices.append(np.asarray(segment.matrix[keep], dtype=np.float32))
+                ids.extend(segment.ids[row] for row in keep)
+                metadata.extend(segment.metadata[row] for row in keep)
+        return matrices, ids, metadata
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Aynı klasörü kullanan worker süreçleri arasında yazma kilidi"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class _LocalPartition:
+    """Yerel depodaki tek bir namespace'in vektörleri.
+
+    Her upsert yeni bir segment dosyası (seg-<n>.npy normalize embedding'ler,
+    seg-<n>.json id ve metadata) ekler; mevcut dosyalar yeniden yazılmaz.
+    Segment listesi manifest.json'dadır ve atomik olarak değiştirilir. Segment
+    sayısı LOCAL_MAX_SEGMENTS'i aşınca veya silmede geçerli satırlar tek
+    segmentte birleştirilir. Yazmalar klasördeki .lock dosyası ile süreçler
+    arasında sıralanır; okumalar manifest değişmişse yalnızca yeni segmentleri
+    memory-map ile açar, böylece diğer worker'ların yazdıkları da görülür.
+    """
+
+    def __init__(self, path: str, dimension: int, namespace: str = ""):
+        self.path = path
+        self.dimension = dimension
+        self.namespace = namespace
+        self.manifest_path = os.path.join(path, LOCAL_MANIFEST_FILE)
+        self.lock_path = os.path.join(path, ".lock")
+        self._lock = threading.Lock()
+        self._manifest_key = None
+        self._snapshot = _PartitionSnapshot()
+        self._migrate_legacy()
+        self._refresh()
+        if self._snapshot.positions:
+            print(f"Yerel vektör deposu yüklendi: {len(self._snapshot.positions)} vektör ({self.path})")
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, LOCAL_MANIFEST_FILE)) or os.path.exists(os.path.join(path, "vectors.npy"))
+
+    def _migrate_legacy(self):
+        """Eski tek dosyalı biçimi (vectors.npy + meta.json) ilk segment olarak devralır"""
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        meta_path = os.path.join(self.path, "meta.json")
+        if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+            return
+
+        with self._lock, _file_lock(self.lock_path):
+            if os.path.exists(self.manifest_path) or not os.path.exists(vectors_path):
+                return
+            name = self._segment_name(0)
+            os.replace(vectors_path, os.path.join(self.path, name + ".npy"))
+            os.replace(meta_path, os.path.join(self.path, name + ".json"))
+            self._write_manifest([name], 1)
+            print(f"Yerel vektör deposu segment biçimine taşındı ({self.path})")
+
+    @staticmethod
+    def _segment_name(number: int) -> str:
+        return f"seg-{number:06d}"
+
+    def _read_manifest(self):
+        """(manifest, dosya anahtarı); dosya yoksa boş manifest"""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                stat = os.fstat(f.fileno())
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "next_segment": 0}, None
+
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if manifest.get("dimension") != self.dimension:
+            print(f"Yerel vektör deposu boyutu uyuşmuyor ({manifest.get('dimension')}), boş depo ile başlanıyor")
+            return {"segments": [], "next_segment": manifest.get("next_segment", 0)}, key
+        return manifest, key
+
+    def _manifest_changed(self) -> bool:
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return self._manifest_key is not None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._manifest_key
+
+    def _load_segment(self, name: str) -> _LocalSegment:
+        with open(os.path.join(self.path, name + ".json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(os.path.join(self.path, name + ".npy"), mmap_mode="r")
+        ids, metadata = meta.get("ids", []), meta.get("metadata", [])
+
+        if matrix.ndim != 2 or matrix.shape[1] != self.dimension:
+            print(f"Yerel vektör segmenti boyutu uyuşmuyor ({name}: {matrix.shape}), atlanıyor")
+            return _LocalSegment(name, np.zeros((0, self.dimension), dtype=np.float32), [], [])
+
+        rows = min(len(ids), len(metadata), matrix.shape[0])
+        if rows != matrix.shape[0] or rows != len(ids):
+            print(f"Yerel vektör segmenti tutarsız ({name}), ilk {rows} kayıt kullanılıyor")
+        return _LocalSegment(name, matrix[:rows], ids[:rows], metadata[:rows])
+
+    def _reload(self) -> dict:
+        """Manifest değiştiyse görünümü yeniler (kilit altında çağrılır); güncel manifesti döndürür"""
+        manifest, key = self._read_manifest()
+        if key == self._manifest_key and key is not None:
+            return manifest
+
+        names = manifest.get("segments", [])
+        loaded = [segment.name for segment in self._snapshot.segments]
+        try:
+            if names[:len(loaded)] == loaded:
+                # Yalnızca sona eklenen segmentler açılır
+                self._snapshot = self._snapshot.extended([self._load_segment(name) for name in names[len(loaded):]])
+            else:
+                # Birleştirme olmuş - tüm görünüm yeniden kurulur
+                self._snapshot = _PartitionSnapshot().extended([self._load_segment(name) for name in names])
+        except FileNotFoundError:
+            # Okuma sırasında başka bir worker birleştirme yaptı; bir sonraki çağrıda tekrar denenir
+            return manifest
+
+        self._manifest_key = key
+        return manifest
+
+    def _refresh(self) -> _PartitionSnapshot:
+        if self._manifest_changed():
+            with self._lock:
+                self._reload()
+        return self._snapshot
+
+    def _write_manifest(self, segments: List[str], next_segment: int):
+        manifest_tmp = self.manifest_path + ".tmp"
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "dimension": self.dimension,
+                "namespace": self.namespace,
+                "next_segment": next_segment,
+                "segments": segments
+            }, f, ensure_ascii=False)
+        os.replace(manifest_tmp, self.manifest_path)
+
+    def _write_segment(self, number: int, matrix: np.ndarray, ids: list, metadata: list) -> str:
+        name = self._segment_name(number)
+        vectors_path = os.path.join(self.path, name + ".npy")
+        np.save(vectors_path + ".tmp.npy", matrix)
+        os.replace(vectors_path + ".tmp.npy", vectors_path)
+        meta_path = os.path.join(self.path, name + ".json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": ids, "metadata": metadata}, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+        return name
+
+    def _compact(self, manifest: dict, exclude: set = frozenset()):
+        """Geçerli satırları tek segmentte birleştirir, eski segment dosyalarını siler (kilitler altında)"""
+        matrices, ids, metadata = self._snapshot.rows(exclude)
+        number = manifest.get("next_segment", 0)
+        segments = []
+        if ids:
+            segments.append(self._write_segment(number, np.vstack(matrices), ids, metadata))
+        self._write_manifest(segments, number + 1)
+
+        for name in manifest.get("segments", []):
+            for suffix in (".npy", ".json"):
+                try:
+                    os.remove(os.path.join(self.path, name + suffix))
+                except OSError:
+                    # Windows'ta başka bir süreç memory-map ile açık tutuyor olabilir
+                    pass
+        self._reload()
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, vectors: List[dict]):
+        if not vectors:
+            return
+
+        # Aynı id birden fazla gelirse son kayıt geçerlidir
+        vectors = list({vector["id"]: vector for vector in vectors}.values())
+        new_matrix = self._normalize(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+        if new_matrix.shape[1] != self.dimension:
+            raise ValueError(f"Vektör boyutu {new_matrix.shape[1]}, beklenen {self.dimension}")
+
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, _file_lock(self.lock_path):
+            manifest = self._reload()
+            number = manifest.get("next_segment", 0)
+            name = self._write_segment(
+                number,
+                new_matrix,
+                [vector["id"] for vector in vectors],
+                [vector.get("metadata", {}) for vector in vectors]
+            )
+            segments = manifest.get("segments", []) + [name]
+            self._write_manifest(segments, number + 1)
+            manifest = self._reload()
+
+            if len(segments) > LOCAL_MAX_SEGMENTS:
+                self._compact(manifest)
+
+    def query(self, vector: List[float], top_k: int = 5) -> List[VectorMatch]:
+        snapshot = self._refresh()
+        if not snapshot.positions or top_k <= 0:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        scores = []
+        for segment, alive in zip(snapshot.segments, snapshot.alive):
+            segment_scores = np.asarray(segment.matrix @ query, dtype=np.float32)
+            segment_scores[~alive] = -np.inf
+            scores.append(segment_scores)
+        scores = np.concatenate(scores)
+        offsets = np.cumsum([0] + [len(segment.ids) for segment in snapshot.segments])
+
+        k = min(top_k, len(snapshot.positions))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for position in top:
+            index = int(np.searchsorted(offsets, position, side="right")) - 1
+            segment, row = snapshot.segments[index], int(position - offsets[index])
+            matches.append(VectorMatch(id=segment.ids[row], score=float(scores[position]), metadata=segment.metadata[row]))
+        return matches
+
+    def delete(self, ids: List[str]):
+        targets = set(ids)
+        if not targets or not os.path.isdir(self.path):
+            return
+
+        with self._lock, _file_lock(self.lock_path):
+            manifest = self._reload()
+            if not targets.intersection(self._snapshot.positions):
+                return
+            self._compact(manifest, exclude=targets)
+
+    def count(self) -> int:
+        return len(self._refresh().positions)
+
+    def ids(self) -> List[str]:
+        return list(self._refresh().positions)
+
+    def fetch_metadata(self, ids: List[str]) -> Dict[str, dict]:
+        snapshot = self._refresh()
+        metadata = {}
+        for vector_id in ids:
+            position = snapshot.positions.get(vector_id)
+            if position is not None:
+                metadata[vector_id] = snapshot.segments[position[0]].metadata[position[1]]
+        return metadata
+
+
+class LocalVectorStore(VectorStore):
+    """Süreç içi vektör deposu, her namespace ayrı bir bölüm (alt klasör) olarak tutulur.
+
+    Varsayılan namespace kök klasörü kullanır; diğerleri <path>/<klasör adı>/
+    altındadır. Klasör adı namespace'ten birebir türetilir (_dir_name) ve
+    list_namespaces() her zaman ham namespace adlarını döndürür. Sorgu yalnızca
+    ilgili namespace'in segmentlerini tarar.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str, dimension: int):
+        self.path = path
+        self.dimension = dimension
+        self._lock = threading.Lock()
+        self._partitions = {}
+        self._discover()
+
+    @staticmethod
+    def _dir_name(namespace: Optional[str]) -> str:
+        return quote(namespace or "", safe="")
+
+    def _discover(self):
+        """Diskte (bu veya başka bir worker tarafından) oluşturulmuş namespace'leri açar"""
+        self._partition(None)
+        if not os.path.isdir(self.path):
+            return
+        for entry in sorted(os.listdir(self.path)):
+            if _LocalPartition.exists(os.path.join(self.path, entry)):
+                self._partition(unquote(entry))
+
+    def _partition(self, namespace: Optional[str], create: bool = True) -> Optional[_LocalPartition]:
+        key = namespace or ""
+        partition = self._partitions.get(key)
+        if partition is None:
+            path = os.path.join(self.path, self._dir_name(key)) if key else self.path
+            if not create and not _LocalPartition.exists(path):
+                return None
+            with self._lock:
+                partition = self._partitions.get(key)
+                if partition is None:
+                    partition = _LocalPartition(path, self.dimension, key)
+                    self._partitions[key] = partition
+        return partition
+
+    def upsert(self, vectors: List[dict], namespace: Optional[str] = None):
+        self._partition(namespace).upsert(vectors)
+
+    def query(self, vector: List[float], top_k: int = 5, namespace: Optional[str] = None) -> List[VectorMatch]:
+        partition = self._partition(namespace, create=False)
+        if partition is None:
+            return []
+        return partition.query(vector, top_k)
+
+    def delete(self, ids: List[str], namespace: Optional[str] = None):
+        partition = self._partition(namespace, create=False)
+        if partition is not None:
+            partition.delete(ids)
+
+    def list_namespaces(self) -> Dict[str, int]:
+        self._discover()
+        counts = {key: partition.count() for key, partition in list(self._partitions.items())}
+        return {key: count for key, count in counts.items() if count}
+
+    def list_ids(self, namespace: Optional[str] = None) -> Iterator[List[str]]:
+        partition = self._partition(namespace, create=False)
+        if partition is not None and partition.count():
+            yield partition.ids()
+
+    def fetch_metadata(self, ids: List[str], namespace: Optional[str] = None) -> Dict[str, dict]:
+        partition = self._partition(namespace, create=False)
+        return partition.fetch_metadata(ids) if partition is not None else {}
+
+    def get_stats(self) -> dict:
+        namespaces = self.list_namespaces()
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "vector_count": sum(namespaces.values()),
+            "namespaces": namespaces
+        }
+
+
+def create_vector_store(config) -> Optional[VectorStore]:
+    """RAG_VECTOR_BACKEND ayarına göre vektör deposunu oluşturur (pinecone | local)"""
+    if config.vector_backend == LocalVectorStore.name:
+        return LocalVectorStore(config.local_index_path, config.embedding_dimension)
+    return PineconeVectorStore(config)
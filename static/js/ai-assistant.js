@@ -169,7 +169,7 @@ async function sendPrompt() {
     
     try {
         const token = getAuthToken();
-                    const response = await fetch(`${window.location.protocol}//${window.location.host}/api/ai/consultation`, {
+        const response = await fetch(`${window.location.protocol}//${window.location.host}/api/ai/consultation/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -182,21 +182,33 @@ async function sendPrompt() {
             })
         });
         
-        const data = await response.json();
+        if (!response.ok) {
+            const errorData = await response.json();
+            throw new Error(errorData.detail || 'AI yanıtı alınamadı');
+        }
         
-        if (response.ok) {
-            let formattedResponse = formatAIResponse(data.ai_response);
-            
-            addMessage(formattedResponse);
-            
-            // Tedavi adımları varsa göster
-            if (data.treatment_steps) {
-                addTreatmentStepsMessage(data.treatment_steps);
-            }
-            
+        // Yanıt üretildikçe aynı mesaj balonunu güncelle
+        addMessage('⏳');
+        const messageContent = document.querySelector('#chatContainer .message.ai:last-child .message-content');
+        let aiResponse = '';
+        
+        const data = await readConsultationStream(response, (chunk) => {
+            aiResponse += chunk;
+            messageContent.innerHTML = formatAIResponse(aiResponse);
+            scrollToBottom();
+        });
+        
+        messageContent.innerHTML = formatAIResponse(data.ai_response);
+        
+        // Tedavi adımları varsa göster, yoksa arka planda hazırlanmasını bekle
+        if (data.treatment_steps) {
+            addTreatmentStepsMessage(data.treatment_steps);
             showAlert('AI yanıtı ve tedavi önerileri alındı!', 'success');
+        } else if (data.treatment_plan_id) {
+            waitForTreatmentPlan(data.treatment_plan_id);
+            showAlert('AI yanıtı alındı, tedavi önerileri hazırlanıyor...', 'success');
         } else {
-            throw new Error(data.detail || 'AI yanıtı alınamadı');
+            showAlert('AI yanıtı alındı!', 'success');
         }
     } catch (error) {
         console.error('AI consultation error:', error);
@@ -207,6 +219,37 @@ async function sendPrompt() {
     }
 }
 
+// SSE akışını okur; her token için onToken çağrılır, "done" olayının verisi döndürülür
+async function readConsultationStream(response, onToken) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder('utf-8');
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const event of events) {
+            if (!event.startsWith('data: ')) continue;
+            const payload = JSON.parse(event.slice(6));
+            
+            if (payload.type === 'token') {
+                onToken(payload.content);
+            } else if (payload.type === 'done') {
+                return payload;
+            } else if (payload.type === 'error') {
+                throw new Error(payload.detail || 'AI yanıtı alınamadı');
+            }
+        }
+    }
+    
+    throw new Error('AI yanıt akışı beklenmedik şekilde sonlandı');
+}
+
 document.getElementById('promptInput').addEventListener('keydown', function(e) {
     if (e.key === 'Enter' && !e.shiftKey) {
         e.preventDefault();
@@ -355,6 +398,87 @@ function addTreatmentStepsMessage(treatmentSteps) {
     scrollToBottom();
 }
 
+// Arka planda hazırlanan tedavi planını belirli aralıklarla sorgular
+async function waitForTreatmentPlan(planId, intervalMs = 2000, maxAttempts = 60) {
+    const chatContainer = document.getElementById('chatContainer');
+    const pendingDiv = document.createElement('div');
+    pendingDiv.className = 'message ai treatment-message';
+    pendingDiv.innerHTML = `
+        <div class="message-header">💊 Tedavi Önerileri</div>
+        <div class="message-content">⏳ Tedavi önerileri hazırlanıyor...</div>
+    `;
+    chatContainer.appendChild(pendingDiv);
+    scrollToBottom();
+    
+    for (let attempt = 0; attempt < maxAttempts; attempt++) {
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+        
+        try {
+            const token = getAuthToken();
+            const response = await fetch(`/api/ai/treatment-plan/${planId}`, {
+                method: 'GET',
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+            
+            const data = await response.json();
+            
+            if (!response.ok) {
+                throw new Error(data.detail || 'Tedavi planı durumu alınamadı');
+            }
+            
+            if (data.status === 'hazir') {
+                pendingDiv.remove();
+                addTreatmentStepsMessage(data.tedavi_adimlari);
+                return;
+            }
+            
+            if (data.status === 'basarisiz') {
+                pendingDiv.querySelector('.message-content').innerHTML = `
+                    ❌ Tedavi önerileri oluşturulamadı.
+                    <button class="btn btn-secondary" style="margin-left: 10px;"
+                            onclick="this.closest('.treatment-message').remove(); regenerateTreatmentPlan(${planId});">
+                        🔄 Tekrar Dene
+                    </button>
+                `;
+                return;
+            }
+        } catch (error) {
+            console.error('Tedavi planı durum hatası:', error);
+            break;
+        }
+    }
+    
+    pendingDiv.querySelector('.message-content').textContent =
+        'Tedavi önerileri henüz hazır değil. "Tedavi Planları" listesinden daha sonra kontrol edebilirsiniz.';
+}
+
+// Oluşturulamayan tedavi planını yeniden hazırlatır ve hazır olmasını bekler
+async function regenerateTreatmentPlan(planId) {
+    try {
+        const token = getAuthToken();
+        const response = await fetch(`/api/ai/treatment-plan/${planId}/regenerate`, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+        
+        const data = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(data.detail || 'Tedavi planı yeniden oluşturulamadı');
+        }
+        
+        closeTreatmentModal();
+        waitForTreatmentPlan(planId);
+    } catch (error) {
+        console.error('Tedavi planı yeniden oluşturma hatası:', error);
+        showAlert('Tedavi planı yeniden oluşturulamadı: ' + error.message);
+    }
+}
+
 function formatTreatmentSteps(treatmentSteps) {
     if (!treatmentSteps) return '';
 
@@ -430,11 +554,20 @@ function showTreatmentPlansModal(treatmentPlans) {
                                     
                                     <h6>💊 Tedavi Adımları:</h6>
                                     <div style="background: #f8f9fa; padding: 10px; border-radius: 5px; margin-bottom: 15px; max-height: 150px; overflow-y: auto;">
-                                        ${formatTreatmentSteps(plan.tedavi_adimlari)}
+                                        ${plan.status === 'hazir' ? formatTreatmentSteps(plan.tedavi_adimlari) : plan.status === 'basarisiz' ? '❌ Tedavi adımları oluşturulamadı.' : '⏳ Tedavi adımları hazırlanıyor...'}
                                     </div>
                                 </div>
                                 
-                                ${plan.onay_durumu === 'beklemede' ? `
+                                ${plan.onay_durumu === 'beklemede' && plan.status === 'basarisiz' ? `
+                                    <div class="plan-actions" style="display: flex; gap: 10px;">
+                                        <button class="btn btn-secondary" onclick="regenerateTreatmentPlan(${plan.id})" style="flex: 1;">
+                                            🔄 Yeniden Oluştur
+                                        </button>
+                                        <button class="btn btn-danger" onclick="rejectTreatmentPlan(${plan.id})" style="flex: 1;">
+                                            ❌ Reddet
+                                        </button>
+                                    </div>
+                                ` : plan.onay_durumu === 'beklemede' && plan.status === 'hazir' ? `
                                     <div class="plan-actions" style="display: flex; gap: 10px;">
                                         <button class="btn btn-success" onclick="approveTreatmentPlan(${plan.id})" style="flex: 1;">
                                             ✅ Onayla ve Hasta Mailine Gönder